@@ -21,3 +21,4 @@
 ##############################################################################
 
 from . import models
+from . import wizard
@@ -22,7 +22,7 @@
 
 {
     'name': 'CRM Action',
-    'version': '8.0.1.1.0',
+    'version': '8.0.1.5.0',
     'author': 'Savoir-faire Linux,Odoo Community Association (OCA)',
     'license': 'AGPL-3',
     'category': 'Others',
@@ -40,6 +40,7 @@
         'views/crm_lead_view.xml',
         'views/crm_action_view.xml',
         'views/crm_action_type_view.xml',
+        'wizard/crm_action_schedule_view.xml',
     ],
     'installable': False,
     'application': True,
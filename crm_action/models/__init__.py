@@ -22,6 +22,7 @@
 
 from . import (
     crm_action,
+    crm_action_agenda,
     crm_action_type,
     crm_lead,
 )
@@ -20,16 +20,60 @@
 #
 ##############################################################################
 
-from openerp import models, fields, api
+import logging
+import time
+from datetime import timedelta
+
+from openerp import models, fields, api, exceptions, SUPERUSER_ID, _
+
+_logger = logging.getLogger(__name__)
+
+# Number of days after today counted as upcoming by the agenda counters
+AGENDA_DAYS = 7
 
 
 class CrmAction(models.Model):
     _name = 'crm.action'
     _description = 'CRM Action'
 
+    def init(self, cr):
+        for name, columns in [
+                # Serves the action counters and the keyset pages of the
+                # lead action timeline
+                ('crm_action_lead_id_date_id_index',
+                 'lead_id, date DESC, id DESC'),
+                # Covers the agenda ranges and counters of a user
+                ('crm_action_user_id_state_date_index',
+                 'user_id, state, date'),
+        ]:
+            cr.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s", (name,))
+            if not cr.fetchone():
+                cr.execute("CREATE INDEX %s ON crm_action (%s)" % (
+                    name, columns))
+
+    def _auto_init(self, cr, context=None):
+        cr.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'crm_action' "
+            "AND column_name = 'lead_user_id'")
+        new_column = not cr.fetchone()
+        res = super(CrmAction, self)._auto_init(cr, context=context)
+        if new_column:
+            cr.execute(
+                "UPDATE crm_action a SET lead_user_id = l.user_id "
+                "FROM crm_lead l "
+                "WHERE a.lead_id = l.id AND l.user_id IS NOT NULL")
+        return res
+
     lead_id = fields.Many2one(
         'crm.lead', string='Lead', ondelete='cascade')
 
+    # Copy of lead_id.user_id, kept up to date by crm.lead, so the
+    # personal action rule does not need to join crm_lead
+    lead_user_id = fields.Many2one(
+        'res.users', string='Lead Salesperson', readonly=True, index=True)
+
     @api.onchange('lead_id')
     def check_change(self):
         lead = self.lead_id
@@ -68,6 +112,24 @@ class CrmAction(models.Model):
         ], string='Status', required=True,
         default="draft")
 
+    @api.model
+    def create(self, vals):
+        if 'lead_id' not in vals:
+            # the lead may come from the context or the default values; it
+            # is resolved here so the record rules see lead_user_id
+            vals = dict(vals, **self.default_get(['lead_id']))
+        if vals.get('lead_id'):
+            vals = dict(vals, lead_user_id=self.env['crm.lead'].browse(
+                vals['lead_id']).sudo().user_id.id)
+        return super(CrmAction, self).create(vals)
+
+    @api.multi
+    def write(self, vals):
+        if 'lead_id' in vals:
+            vals = dict(vals, lead_user_id=self.env['crm.lead'].browse(
+                vals['lead_id']).sudo().user_id.id)
+        return super(CrmAction, self).write(vals)
+
     @api.multi
     def button_confirm(self):
         self.write({'state': 'done'})
@@ -75,3 +137,158 @@ class CrmAction(models.Model):
     @api.multi
     def button_set_to_draft(self):
         self.write({'state': 'draft'})
+
+    @api.model
+    def _get_agenda_actions(self, date_from=None, date_to=None,
+                            user_id=None):
+        """Return the pending actions of a user, by date
+
+        :param date_from: first date included, unbounded if empty
+        :param date_to: last date included, unbounded if empty
+        :param user_id: defaults to the current user
+        """
+        user_id = user_id or self.env.uid
+        domain = [('user_id', '=', user_id), ('state', '=', 'draft')]
+        if date_from:
+            domain.append(('date', '>=', date_from))
+        if date_to:
+            domain.append(('date', '<=', date_to))
+        return self.search(domain, order='date, id')
+
+    @api.model
+    def get_agenda(self, date_from=None, date_to=None, user_id=None):
+        """RPC friendly agenda of a user
+
+        :return: dict with the read pending actions and the counters of
+                 get_agenda_counters
+        """
+        user_id = user_id or self.env.uid
+        actions = self._get_agenda_actions(
+            date_from=date_from, date_to=date_to, user_id=user_id)
+        res = {
+            'actions': actions.read(
+                ['lead_id', 'partner_id', 'date', 'action_type', 'details']),
+        }
+        res.update(self.get_agenda_counters([user_id])[user_id])
+        return res
+
+    @api.model
+    def get_agenda_counters(self, user_ids=None):
+        """Count the overdue and upcoming pending actions of users
+
+        All the users are counted with one query on the agenda index.
+
+        :param user_ids: defaults to the current user
+        :return: dict of user id to a dict with the overdue, today and
+                 next_7_days counts, the latter from tomorrow on
+        """
+        user_ids = user_ids or [self.env.uid]
+        today = fields.Date.context_today(self)
+        end = fields.Date.to_string(
+            fields.Date.from_string(today) + timedelta(days=AGENDA_DAYS + 1))
+        self.check_access_rights('read')
+        query = self._where_calc([
+            ('user_id', 'in', user_ids),
+            ('state', '=', 'draft'),
+            ('date', '<', end),
+        ])
+        if self.env.uid != SUPERUSER_ID:
+            self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+        self.env.cr.execute("""
+            SELECT crm_action.user_id,
+                   sum(CASE WHEN crm_action.date < %s THEN 1 ELSE 0 END),
+                   sum(CASE WHEN crm_action.date = %s THEN 1 ELSE 0 END),
+                   sum(CASE WHEN crm_action.date > %s THEN 1 ELSE 0 END)
+            FROM """ + from_clause + """
+            WHERE """ + where_clause + """
+            GROUP BY crm_action.user_id
+        """, [today, today, today] + where_params)
+        res = {}
+        for user_id in user_ids:
+            res[user_id] = {'overdue': 0, 'today': 0, 'next_7_days': 0}
+        for user_id, overdue, due_today, upcoming in self.env.cr.fetchall():
+            res[user_id] = {
+                'overdue': int(overdue),
+                'today': int(due_today),
+                'next_7_days': int(upcoming),
+            }
+        return res
+
+    @api.model
+    def schedule_for_leads(self, lead_ids, date=None, action_type=None,
+                           user_id=None, use_lead_user=False, details=None,
+                           chunk_size=1000):
+        """Create one pending action for each of a set of leads
+
+        Defaults are resolved once and the actions are inserted in chunks
+        of chunk_size with one statement each, copying the customer and
+        the salesperson of the leads in SQL. Overrides of create are not
+        called.
+
+        :param date: defaults to today
+        :param action_type: crm.action.type id, defaults to the first
+                            active type
+        :param user_id: defaults to the current user
+        :param use_lead_user: assign the actions to the salesperson of
+                              their lead when it has one
+        :return: dict with the ids of the created actions, their count,
+                 the duration in seconds and the throughput in actions
+                 per second
+        """
+        start = time.time()
+        self.check_access_rights('create')
+        date = date or fields.Date.context_today(self)
+        action_type = action_type or self.default_action_type()
+        if not action_type:
+            raise exceptions.Warning(_('There is no active action type.'))
+        user_id = user_id or self.env.uid
+        action_ids = []
+        lead_ids = list(lead_ids)
+        for index in range(0, len(lead_ids), chunk_size):
+            # leads the user cannot read are skipped
+            chunk = self.env['crm.lead'].search(
+                [('id', 'in', lead_ids[index:index + chunk_size])]).ids
+            if not chunk:
+                continue
+            self.env.cr.execute("""
+                INSERT INTO crm_action (
+                    create_uid, create_date, write_uid, write_date,
+                    lead_id, partner_id, lead_user_id, user_id,
+                    date, action_type, details, state)
+                SELECT %(uid)s, now() AT TIME ZONE 'UTC',
+                       %(uid)s, now() AT TIME ZONE 'UTC',
+                       l.id, l.partner_id, l.user_id,
+                       CASE WHEN %(use_lead_user)s
+                            THEN coalesce(l.user_id, %(user_id)s)
+                            ELSE %(user_id)s END,
+                       %(date)s, %(action_type)s, %(details)s, 'draft'
+                FROM crm_lead l
+                WHERE l.id IN %(lead_ids)s
+                ORDER BY l.id
+                RETURNING id
+            """, {
+                'uid': self.env.uid,
+                'use_lead_user': bool(use_lead_user),
+                'user_id': user_id,
+                'date': date,
+                'action_type': action_type,
+                'details': details or None,
+                'lead_ids': tuple(chunk),
+            })
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            self.browse(ids).check_access_rule('create')
+            action_ids += ids
+            elapsed = time.time() - start
+            _logger.info(
+                'Action scheduling: %d/%d leads, %d actions, %.1f actions/s',
+                min(index + chunk_size, len(lead_ids)), len(lead_ids),
+                len(action_ids), len(action_ids) / (elapsed or 1))
+        self.invalidate_cache()
+        duration = time.time() - start
+        return {
+            'action_ids': action_ids,
+            'created': len(action_ids),
+            'duration': duration,
+            'actions_per_second': len(action_ids) / (duration or 1),
+        }
@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2015 Savoir-faire Linux
+#    (<http://www.savoirfairelinux.com>).
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp import models, fields, api, _
+
+
+class CrmActionAgenda(models.TransientModel):
+    _name = 'crm.action.agenda'
+    _description = 'CRM Action Agenda'
+
+    user_id = fields.Many2one(
+        'res.users', string='User', required=True,
+        default=lambda self: self.env.user)
+
+    @api.multi
+    @api.depends('user_id')
+    def _compute_counters(self):
+        counters = self.env['crm.action'].get_agenda_counters(
+            list(set(self.mapped('user_id').ids)) or None)
+        for agenda in self:
+            counts = counters.get(agenda.user_id.id, {})
+            agenda.overdue_count = counts.get('overdue', 0)
+            agenda.today_count = counts.get('today', 0)
+            agenda.next_7_days_count = counts.get('next_7_days', 0)
+
+    overdue_count = fields.Integer(compute='_compute_counters')
+    today_count = fields.Integer(compute='_compute_counters')
+    next_7_days_count = fields.Integer(compute='_compute_counters')
+
+    def _open_actions(self, name, filter_name):
+        self.ensure_one()
+        return {
+            'name': name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'crm.action',
+            'view_type': 'form',
+            'view_mode': 'tree,calendar,form',
+            'views': [
+                (self.env.ref('crm_action.view_action_agenda_tree').id,
+                 'tree'),
+                (False, 'calendar'),
+                (False, 'form'),
+            ],
+            'domain': [
+                ('user_id', '=', self.user_id.id),
+                ('state', '=', 'draft'),
+            ],
+            'context': {
+                'search_default_%s' % filter_name: 1,
+                'default_user_id': self.user_id.id,
+            },
+        }
+
+    @api.multi
+    def button_overdue(self):
+        return self._open_actions(_('Overdue Actions'), 'overdue')
+
+    @api.multi
+    def button_today(self):
+        return self._open_actions(_('Actions of the Day'), 'today')
+
+    @api.multi
+    def button_next_7_days(self):
+        return self._open_actions(_('Next 7 Days'), 'next_7_days')
@@ -23,16 +23,118 @@
 from openerp import models, fields, api, _
 
 
+# Number of actions shown per page of the lead action timeline
+TIMELINE_PAGE_SIZE = 20
+
+
 class CrmLead(models.Model):
     _inherit = 'crm.lead'
 
+    @api.multi
     def count_actions(self):
-        self.actions_count = len(self.action_ids)
+        counts = {}
+        if self.ids:
+            for group in self.env['crm.action'].read_group(
+                    [('lead_id', 'in', self.ids)], ['lead_id'], ['lead_id']):
+                counts[group['lead_id'][0]] = group['lead_id_count']
+        for lead in self:
+            lead.actions_count = counts.get(lead.id, 0)
 
     actions_count = fields.Integer(compute='count_actions')
     action_ids = fields.One2many(
         'crm.action', 'lead_id', string='Actions')
 
+    @api.multi
+    def _compute_action_timeline(self):
+        cursor = self.env.context.get('action_timeline_cursor')
+        for lead in self:
+            if not lead.id:
+                continue
+            actions, next_cursor = lead._get_action_timeline(cursor=cursor)
+            lead.timeline_action_ids = actions
+            lead.timeline_next_cursor = next_cursor
+
+    timeline_action_ids = fields.One2many(
+        'crm.action', compute='_compute_action_timeline',
+        string='Action Timeline')
+    timeline_next_cursor = fields.Char(compute='_compute_action_timeline')
+
+    @api.multi
+    def _get_action_timeline(self, cursor=None, limit=TIMELINE_PAGE_SIZE):
+        """Return a page of the actions of the lead, newest first
+
+        Pages are selected on (date, id) rather than with an offset, so the
+        cost of a page does not depend on how deep it is in the timeline.
+
+        :param cursor: "date,id" of the last action of the previous page
+        :return: the actions of the page and the cursor of the next page,
+                 False on the last page
+        """
+        self.ensure_one()
+        domain = [('lead_id', '=', self.id)]
+        if cursor:
+            date, action_id = cursor.split(',')
+            domain += [
+                '|', ('date', '<', date),
+                '&', ('date', '=', date), ('id', '<', int(action_id)),
+            ]
+        actions = self.env['crm.action'].search(
+            domain, order='date desc, id desc', limit=limit + 1)
+        next_cursor = False
+        if len(actions) > limit:
+            actions = actions[:limit]
+            next_cursor = '%s,%d' % (actions[-1].date, actions[-1].id)
+        return actions, next_cursor
+
+    @api.multi
+    def get_action_timeline(self, cursor=None, limit=TIMELINE_PAGE_SIZE):
+        """RPC friendly version of _get_action_timeline
+
+        :return: dict with the read actions and the next page cursor
+        """
+        actions, next_cursor = self._get_action_timeline(
+            cursor=cursor, limit=limit)
+        return {
+            'actions': actions.read(
+                ['date', 'user_id', 'action_type', 'details', 'state']),
+            'cursor': next_cursor,
+        }
+
+    def _open_action_timeline(self, cursor):
+        self.ensure_one()
+        context = dict(self.env.context, action_timeline_cursor=cursor)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'crm.lead',
+            'res_id': self.id,
+            'view_type': 'form',
+            'view_mode': 'form',
+            'target': 'current',
+            'context': context,
+        }
+
+    @api.multi
+    def button_action_timeline_older(self):
+        self.ensure_one()
+        return self._open_action_timeline(self.timeline_next_cursor)
+
+    @api.multi
+    def button_action_timeline_newest(self):
+        return self._open_action_timeline(False)
+
+    @api.multi
+    def write(self, vals):
+        res = super(CrmLead, self).write(vals)
+        if 'user_id' in vals and self.ids:
+            self.env.cr.execute(
+                "UPDATE crm_action SET lead_user_id = %s "
+                "WHERE lead_id IN %s "
+                "AND lead_user_id IS DISTINCT FROM %s",
+                (vals['user_id'] or None, tuple(self.ids),
+                 vals['user_id'] or None))
+            self.env['crm.action'].invalidate_cache(['lead_user_id'])
+        return res
+
     @api.multi
     def button_actions(self):
         self.ensure_one()
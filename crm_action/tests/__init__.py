@@ -0,0 +1,11 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from . import (
+    test_crm_action_agenda,
+    test_crm_action_lead_user,
+    test_crm_action_schedule,
+    test_crm_action_timeline,
+)
@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from datetime import timedelta
+
+import openerp.tests.common as common
+from openerp import fields
+
+
+class TestCrmActionAgenda(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCrmActionAgenda, self).setUp()
+        self.action_model = self.env['crm.action']
+        self.action_type = self.env['crm.action.type'].create({
+            'name': 'Agenda call',
+        })
+        self.salesman = self.env['res.users'].create({
+            'name': 'Agenda salesman',
+            'login': 'agenda_salesman',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_sale_salesman').id])],
+        })
+        self.other_salesman = self.env['res.users'].create({
+            'name': 'Other agenda salesman',
+            'login': 'other_agenda_salesman',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_sale_salesman').id])],
+        })
+        self.today = fields.Date.from_string(
+            fields.Date.context_today(self.action_model.sudo(self.salesman)))
+        # days relative to today, the last one out of the counted range
+        self.actions = self.action_model.browse()
+        for days in (-3, -1, 0, 0, 1, 7, 8):
+            self.actions += self._create_action(self.salesman, days)
+        self._create_action(self.salesman, 1).button_confirm()
+        self._create_action(self.other_salesman, 0)
+
+    def _create_action(self, user, days):
+        return self.action_model.create({
+            'user_id': user.id,
+            'action_type': self.action_type.id,
+            'date': fields.Date.to_string(self.today + timedelta(days=days)),
+        })
+
+    def test_counters(self):
+        counters = self.action_model.sudo(
+            self.salesman).get_agenda_counters()
+        self.assertEqual(counters, {self.salesman.id: {
+            'overdue': 2, 'today': 2, 'next_7_days': 2}})
+        counters = self.action_model.get_agenda_counters(
+            [self.salesman.id, self.other_salesman.id])
+        self.assertEqual(counters[self.other_salesman.id], {
+            'overdue': 0, 'today': 1, 'next_7_days': 0})
+
+    def test_counters_apply_rules(self):
+        counters = self.action_model.sudo(
+            self.salesman).get_agenda_counters([self.other_salesman.id])
+        self.assertEqual(counters, {self.other_salesman.id: {
+            'overdue': 0, 'today': 0, 'next_7_days': 0}})
+
+    def test_agenda(self):
+        agenda = self.action_model.sudo(self.salesman).get_agenda(
+            date_to=fields.Date.to_string(self.today + timedelta(days=7)))
+        self.assertEqual(
+            [action['id'] for action in agenda['actions']],
+            self.actions[:-1].ids)
+        self.assertEqual(agenda['today'], 2)
+        agenda = self.action_model.sudo(self.salesman).get_agenda(
+            user_id=self.other_salesman.id)
+        self.assertEqual(agenda['actions'], [])
+
+    def test_agenda_wizard(self):
+        agenda = self.env['crm.action.agenda'].sudo(self.salesman).create({})
+        self.assertEqual(agenda.overdue_count, 2)
+        self.assertEqual(agenda.today_count, 2)
+        self.assertEqual(agenda.next_7_days_count, 2)
+        self.assertEqual(
+            agenda.button_today()['context'],
+            {'search_default_today': 1,
+             'default_user_id': self.salesman.id})
@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+
+
+class TestCrmActionLeadUser(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCrmActionLeadUser, self).setUp()
+        self.action_model = self.env['crm.action']
+        self.action_type = self.env['crm.action.type'].create({
+            'name': 'Lead user call',
+        })
+        group = self.env.ref('base.group_sale_salesman')
+        self.salesman = self.env['res.users'].create({
+            'name': 'Lead salesman',
+            'login': 'lead_salesman',
+            'groups_id': [(6, 0, [group.id])],
+        })
+        self.other_salesman = self.env['res.users'].create({
+            'name': 'Other lead salesman',
+            'login': 'other_lead_salesman',
+            'groups_id': [(6, 0, [group.id])],
+        })
+        self.lead = self.env['crm.lead'].create({
+            'name': 'Lead of the salesman',
+            'user_id': self.salesman.id,
+        })
+
+    def _create_action(self, model=None, **vals):
+        vals.setdefault('user_id', self.other_salesman.id)
+        vals.setdefault('action_type', self.action_type.id)
+        return (model or self.action_model).create(vals)
+
+    def test_create(self):
+        action = self._create_action(lead_id=self.lead.id)
+        self.assertEqual(action.lead_user_id, self.salesman)
+        action = self._create_action(
+            self.action_model.with_context(default_lead_id=self.lead.id))
+        self.assertEqual(action.lead_id, self.lead)
+        self.assertEqual(action.lead_user_id, self.salesman)
+        self.assertFalse(self._create_action().lead_user_id)
+
+    def test_lead_reassignment(self):
+        action = self._create_action(lead_id=self.lead.id)
+        other_lead = self.env['crm.lead'].create({'name': 'Unassigned lead'})
+        action.write({'lead_id': other_lead.id})
+        self.assertFalse(action.lead_user_id)
+        action.write({'lead_id': self.lead.id})
+        self.lead.write({'user_id': self.other_salesman.id})
+        self.assertEqual(action.lead_user_id, self.other_salesman)
+        self.lead.write({'user_id': False})
+        self.assertFalse(action.lead_user_id)
+
+    def test_personal_rule(self):
+        action = self._create_action(lead_id=self.lead.id)
+        other_action = self._create_action()
+        actions = self.action_model.sudo(self.salesman)
+        domain = [('id', 'in', [action.id, other_action.id])]
+        self.assertEqual(actions.search(domain).ids, [action.id])
+        self.lead.write({'user_id': self.other_salesman.id})
+        self.assertFalse(actions.search(domain))
+        self.assertEqual(
+            self.action_model.sudo(self.other_salesman).search(
+                domain, order='id').ids,
+            [action.id, other_action.id])
+
+    def test_salesman_creates_action_of_own_lead(self):
+        action = self._create_action(
+            self.action_model.sudo(self.salesman).with_context(
+                default_lead_id=self.lead.id))
+        self.assertEqual(action.sudo().lead_user_id, self.salesman)
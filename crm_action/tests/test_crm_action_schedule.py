@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+from openerp import exceptions
+
+
+class TestCrmActionSchedule(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCrmActionSchedule, self).setUp()
+        self.action_model = self.env['crm.action']
+        self.env['crm.action.type'].search([]).write({'is_active': False})
+        self.action_type = self.env['crm.action.type'].create({
+            'name': 'Scheduled call',
+        })
+        group = self.env.ref('base.group_sale_salesman')
+        self.salesman = self.env['res.users'].create({
+            'name': 'Scheduling salesman',
+            'login': 'scheduling_salesman',
+            'groups_id': [(6, 0, [group.id])],
+        })
+        self.other_salesman = self.env['res.users'].create({
+            'name': 'Other scheduling salesman',
+            'login': 'other_scheduling_salesman',
+            'groups_id': [(6, 0, [group.id])],
+        })
+        partner = self.env['res.partner'].create({'name': 'Scheduled'})
+        self.leads = self.env['crm.lead'].browse()
+        for index in range(5):
+            self.leads += self.env['crm.lead'].create({
+                'name': 'Scheduled lead %d' % index,
+                'partner_id': partner.id,
+                'user_id': index % 2 and self.salesman.id or False,
+            })
+        self.foreign_lead = self.env['crm.lead'].create({
+            'name': 'Lead of another salesman',
+            'user_id': self.other_salesman.id,
+        })
+
+    def test_schedule_chunks(self):
+        result = self.action_model.schedule_for_leads(
+            self.leads.ids, date='2015-06-01', details='Call back',
+            chunk_size=2)
+        self.assertEqual(result['created'], 5)
+        actions = self.action_model.browse(result['action_ids'])
+        self.assertEqual(actions.mapped('lead_id').ids, self.leads.ids)
+        for action, lead in zip(actions, self.leads):
+            self.assertEqual(action.lead_id, lead)
+            self.assertEqual(action.partner_id, lead.partner_id)
+            self.assertEqual(action.lead_user_id, lead.user_id)
+            self.assertEqual(action.user_id, self.env.user)
+            self.assertEqual(action.action_type, self.action_type)
+            self.assertEqual(action.date, '2015-06-01')
+            self.assertEqual(action.details, 'Call back')
+            self.assertEqual(action.state, 'draft')
+
+    def test_schedule_lead_user(self):
+        result = self.action_model.schedule_for_leads(
+            self.leads.ids, user_id=self.other_salesman.id,
+            use_lead_user=True)
+        actions = self.action_model.browse(result['action_ids'])
+        self.assertEqual(
+            [action.user_id.id for action in actions],
+            [self.other_salesman.id, self.salesman.id] * 2 +
+            [self.other_salesman.id])
+
+    def test_schedule_access(self):
+        result = self.action_model.sudo(self.salesman).schedule_for_leads(
+            (self.leads + self.foreign_lead).ids, chunk_size=4)
+        self.assertEqual(result['created'], 5)
+        self.assertNotIn(
+            self.foreign_lead,
+            self.action_model.browse(result['action_ids']).mapped('lead_id'))
+
+    def test_schedule_without_action_type(self):
+        self.action_type.write({'is_active': False})
+        with self.assertRaises(exceptions.Warning):
+            self.action_model.schedule_for_leads(self.leads.ids)
+
+    def test_schedule_wizard(self):
+        wizard = self.env['crm.action.schedule'].with_context(
+            active_ids=self.leads.ids).create({})
+        self.assertEqual(wizard.lead_count, 5)
+        self.assertEqual(wizard.action_type, self.action_type)
+        wizard.action_schedule()
+        self.assertEqual(wizard.state, 'done')
+        self.assertEqual(wizard.created_count, 5)
+        self.assertEqual(
+            self.action_model.search_count(
+                [('lead_id', 'in', self.leads.ids)]), 5)
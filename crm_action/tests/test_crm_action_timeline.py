@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+
+
+class TestCrmActionTimeline(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCrmActionTimeline, self).setUp()
+        self.action_type = self.env['crm.action.type'].create({
+            'name': 'Timeline call',
+        })
+        self.lead = self.env['crm.lead'].create({'name': 'Timeline lead'})
+        self.other_lead = self.env['crm.lead'].create({
+            'name': 'Other timeline lead',
+        })
+        action_model = self.env['crm.action']
+        self.actions = action_model.browse()
+        # three actions a day, so pages split days
+        for index in range(25):
+            self.actions += action_model.create({
+                'lead_id': self.lead.id,
+                'action_type': self.action_type.id,
+                'date': '2015-01-%02d' % (index // 3 + 1),
+            })
+        action_model.create({
+            'lead_id': self.other_lead.id,
+            'action_type': self.action_type.id,
+        })
+
+    def _newest_first(self):
+        return sorted(
+            self.actions, key=lambda action: (action.date, action.id),
+            reverse=True)
+
+    def test_timeline_pages(self):
+        expected = [action.id for action in self._newest_first()]
+        actions, cursor = self.lead._get_action_timeline(limit=10)
+        self.assertEqual(actions.ids, expected[:10])
+        self.assertEqual(
+            cursor, '%s,%d' % (actions[-1].date, actions[-1].id))
+        actions, cursor = self.lead._get_action_timeline(
+            cursor=cursor, limit=10)
+        self.assertEqual(actions.ids, expected[10:20])
+        actions, cursor = self.lead._get_action_timeline(
+            cursor=cursor, limit=10)
+        self.assertEqual(actions.ids, expected[20:])
+        self.assertFalse(cursor)
+
+    def test_timeline_context_cursor(self):
+        expected = [action.id for action in self._newest_first()]
+        self.assertEqual(self.lead.timeline_action_ids.ids, expected[:20])
+        cursor = self.lead.timeline_next_cursor
+        self.assertTrue(cursor)
+        action = self.lead.button_action_timeline_older()
+        self.assertEqual(action['context']['action_timeline_cursor'], cursor)
+        lead = self.lead.with_context(action_timeline_cursor=cursor)
+        lead.invalidate_cache()
+        self.assertEqual(lead.timeline_action_ids.ids, expected[20:])
+        self.assertFalse(lead.timeline_next_cursor)
+        self.assertFalse(
+            self.lead.button_action_timeline_newest()[
+                'context']['action_timeline_cursor'])
+
+    def test_get_action_timeline(self):
+        result = self.other_lead.get_action_timeline()
+        self.assertEqual(len(result['actions']), 1)
+        self.assertFalse(result['cursor'])
+
+    def test_count_actions(self):
+        leads = self.lead + self.other_lead
+        leads += self.env['crm.lead'].create({'name': 'Lead without action'})
+        self.assertEqual(
+            [lead.actions_count for lead in leads], [25, 1, 0])
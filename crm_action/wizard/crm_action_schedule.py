@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2015 Savoir-faire Linux
+#    (<http://www.savoirfairelinux.com>).
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp import models, fields, api
+
+
+class CrmActionSchedule(models.TransientModel):
+
+    """ Schedule an action for each of the selected leads."""
+    _name = 'crm.action.schedule'
+    _description = __doc__
+
+    def _default_lead_count(self):
+        return len(self._context.get('active_ids') or [])
+
+    def _default_action_type(self):
+        return self.env['crm.action'].default_action_type()
+
+    lead_count = fields.Integer(
+        'Leads', readonly=True, default=_default_lead_count)
+    date = fields.Date(
+        'Date', required=True, default=fields.Date.context_today)
+    action_type = fields.Many2one(
+        'crm.action.type', string='Type', required=True,
+        default=_default_action_type)
+    user_id = fields.Many2one(
+        'res.users', string='User', required=True,
+        default=lambda self: self.env.user)
+    use_lead_user = fields.Boolean(
+        'Assign to the Lead Salesperson',
+        help='Assign each action to the salesperson of its lead, or to '
+             'the user above when the lead has none.')
+    details = fields.Text('Details')
+    state = fields.Selection(
+        [('draft', 'Draft'), ('done', 'Done')], default='draft')
+    created_count = fields.Integer('Actions Created', readonly=True)
+    duration = fields.Float('Duration (s)', readonly=True)
+    actions_per_second = fields.Float('Actions per Second', readonly=True)
+
+    @api.multi
+    def action_schedule(self):
+        self.ensure_one()
+        result = self.env['crm.action'].schedule_for_leads(
+            self._context.get('active_ids') or [],
+            date=self.date,
+            action_type=self.action_type.id,
+            user_id=self.user_id.id,
+            use_lead_user=self.use_lead_user,
+            details=self.details)
+        self.write({
+            'state': 'done',
+            'created_count': result['created'],
+            'duration': result['duration'],
+            'actions_per_second': result['actions_per_second'],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_type': 'form',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': self._context,
+        }
@@ -3,10 +3,14 @@
 # For copyright and license notices, see __openerp__.py file in root directory
 ##############################################################################
 
+import logging
+
 from . import models
 from openerp.api import Environment
 from openerp import SUPERUSER_ID
 
+_logger = logging.getLogger(__name__)
+
 
 new_field_code_added = False
 
@@ -23,15 +27,38 @@ def create_code_equal_to_id(cr):
         new_field_code_added = True
 
 
-def assign_old_sequences(cr, registry):
+def assign_old_sequences(cr, registry, chunk_size=10000):
+    """Give the existing claims their codes in id order
+
+    Codes are reserved by chunks of chunk_size claims with one sequence
+    call, and written with one UPDATE per chunk."""
     if not new_field_code_added:
         # the field was already existing before the installation of the addon
+        with Environment.manage():
+            env = Environment(cr, SUPERUSER_ID, {})
+            env['crm.claim']._rebuild_reference_index()
         return
+    cr.execute('SELECT count(*) FROM crm_claim')
+    total = cr.fetchone()[0]
     with Environment.manage():
         env = Environment(cr, SUPERUSER_ID, {})
-
-        sequence_model = env['ir.sequence']
-
-        claims = env['crm.claim'].search([], order="id")
-        for claim in claims:
-            claim.code = sequence_model.next_by_code('crm.claim')
+        claim_model = env['crm.claim']
+        done = last_id = 0
+        while True:
+            cr.execute('SELECT id FROM crm_claim WHERE id > %s '
+                       'ORDER BY id LIMIT %s', (last_id, chunk_size))
+            claim_ids = [row[0] for row in cr.fetchall()]
+            if not claim_ids:
+                break
+            codes = claim_model._reserve_codes(len(claim_ids))
+            cr.execute(
+                'UPDATE crm_claim SET code = data.code '
+                'FROM (VALUES %s) AS data (id, code) '
+                'WHERE crm_claim.id = data.id' % ', '.join(
+                    cr.mogrify('(%s, %s)', row)
+                    for row in zip(claim_ids, codes)))
+            last_id = claim_ids[-1]
+            done += len(claim_ids)
+            _logger.info('Assigned codes to %d / %d claims', done, total)
+        env.invalidate_all()
+        claim_model._rebuild_reference_index()
@@ -22,6 +22,7 @@
     ],
     "depends": [
         "crm_claim",
+        "reference_index",
     ],
     "data": [
         "views/crm_claim_view.xml",
@@ -7,7 +7,9 @@ from openerp import models, fields, api
 
 
 class CrmClaim(models.Model):
-    _inherit = "crm.claim"
+    _name = "crm.claim"
+    _inherit = ["crm.claim", "reference.index.mixin"]
+    _reference_fields = ["code"]
 
     code = fields.Char(
         string='Claim Number', required=True, default="/", readonly=True)
@@ -17,12 +19,70 @@ class CrmClaim(models.Model):
          'The code must be unique!'),
     ]
 
+    @api.model
+    def _get_code_sequence(self):
+        """Return the sequence next_by_code('crm.claim') draws from"""
+        force_company = (self.env.context.get('force_company') or
+                         self.env.user.company_id.id)
+        return self.env['ir.sequence'].search(
+            [('code', '=', 'crm.claim'),
+             ('company_id', 'in', [force_company, False])],
+            order='company_id', limit=1)
+
+    @api.model
+    def _reserve_codes(self, count):
+        """Return count new claim codes, fetched in one sequence call
+
+        No-gap sequences are bumped once for the whole block, standard
+        sequences draw all their values in one query. Sequences using date
+        ranges keep one call per code.
+        """
+        if not count:
+            return []
+        sequence = self._get_code_sequence()
+        if not sequence:
+            return [False] * count
+        if sequence.use_date_range:
+            return [sequence._next() for dummy in range(count)]
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval('ir_sequence_%03d') "
+                "FROM generate_series(1, %%s)" % sequence.id, (count,))
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                "UPDATE ir_sequence "
+                "SET number_next = number_next + number_increment * %s "
+                "WHERE id = %s RETURNING number_next, number_increment",
+                (count, sequence.id))
+            number_end, increment = self.env.cr.fetchone()
+            numbers = range(
+                number_end - increment * count, number_end, increment)
+            sequence.invalidate_cache(['number_next'], sequence.ids)
+        return [sequence.get_next_char(number) for number in numbers]
+
     @api.model
     def create(self, vals):
         if vals.get('code', '/') == '/':
             vals['code'] = self.env['ir.sequence'].next_by_code('crm.claim')
         return super(CrmClaim, self).create(vals)
 
+    @api.model
+    def create_multi(self, vals_list):
+        """Create a claim per dict of vals_list
+
+        The codes of the claims without one, or with the '/' placeholder,
+        are reserved together with _reserve_codes.
+        """
+        vals_list = [dict(vals) for vals in vals_list]
+        todo = [vals for vals in vals_list if vals.get('code', '/') == '/']
+        for vals, code in zip(todo, self._reserve_codes(len(todo))):
+            vals['code'] = code
+        claims = self.browse()
+        for vals in vals_list:
+            claims += self.create(vals)
+        return claims
+
     @api.multi
     def copy(self, default=None):
         self.ensure_one()
@@ -34,6 +34,53 @@ class TestCrmClaimCode(common.TransactionCase):
         self.assertNotEqual(crm_claim_copy.code, self.crm_claim.code)
         self.assertEqual(crm_claim_copy.code, code)
 
+    def test_reserve_claim_codes(self):
+        number = self.crm_sequence.number_next_actual
+        codes = self.crm_claim_model._reserve_codes(3)
+        self.assertEqual(
+            codes,
+            [self.crm_sequence.get_next_char(number + i) for i in range(3)])
+        self.crm_sequence.invalidate_cache()
+        self.assertEqual(
+            self._get_next_code(), self.crm_sequence.get_next_char(number + 3))
+        self.assertEqual(self.crm_claim_model._reserve_codes(0), [])
+
+    def test_create_multi_claim_code_assign(self):
+        code = self._get_next_code()
+        crm_claims = self.crm_claim_model.create_multi([
+            {'name': 'Testing claim code 1'},
+            {'name': 'Testing claim code 2', 'code': '/'},
+            {'name': 'Testing claim code 3', 'code': 'MANUAL-CODE'},
+        ])
+        self.assertEqual(len(crm_claims), 3)
+        self.assertEqual(crm_claims[0].code, code)
+        self.assertNotEqual(crm_claims[1].code, '/')
+        self.assertNotEqual(crm_claims[1].code, code)
+        self.assertEqual(crm_claims[2].code, 'MANUAL-CODE')
+
+    def test_claim_code_reference_lookup(self):
+        crm_claim = self.crm_claim_model.create({
+            'name': 'Testing claim code lookup',
+        })
+        matches = self.env['reference.index'].lookup(crm_claim.code)
+        self.assertEqual(matches[0]['model'], 'crm.claim')
+        self.assertEqual(matches[0]['id'], crm_claim.id)
+        self.assertEqual(matches[0]['reference'], crm_claim.code)
+        crm_claim.write({'code': 'MANUAL-CLAIM-CODE'})
+        self.assertEqual(
+            [(match['model'], match['id']) for match in
+             self.env['reference.index'].lookup('manual-claim')],
+            [('crm.claim', crm_claim.id)])
+        crm_claim.unlink()
+        self.assertFalse(
+            self.env['reference.index'].lookup('MANUAL-CLAIM-CODE'))
+
+    def test_old_claim_codes_indexed(self):
+        self.assertIn(
+            ('crm.claim', self.crm_claim.id),
+            [(match['model'], match['id']) for match in
+             self.env['reference.index'].lookup(self.crm_claim.code)])
+
     def _get_next_code(self):
         return self.crm_sequence.get_next_char(
             self.crm_sequence.number_next_actual
@@ -5,21 +5,81 @@
 
 from . import models
 from openerp import SUPERUSER_ID
+from openerp.api import Environment
+from .online_migration import assign_codes, get_used_number
 
 
 def create_code_equal_to_id(cr):
+    cr.execute("SELECT column_name FROM information_schema.columns "
+               "WHERE table_name = 'crm_lead' AND column_name = 'code'")
+    if cr.fetchone():
+        # prepared with online_migration.prepare_code_column, only the
+        # leads created since then are left; their id keeps the code unique
+        # until assign_old_sequences numbers them
+        cr.execute('UPDATE crm_lead '
+                   'SET code = id WHERE code IS NULL;')
+        return
     cr.execute('ALTER TABLE crm_lead '
                'ADD COLUMN code character varying;')
     cr.execute('UPDATE crm_lead '
                'SET code = id;')
 
 
-def assign_old_sequences(cr, registry):
-    lead_obj = registry['crm.lead']
-    sequence_obj = registry['ir.sequence']
-    lead_ids = lead_obj.search(cr, SUPERUSER_ID, [], order="id")
-    for lead_id in lead_ids:
-        cr.execute('UPDATE crm_lead '
-                   'SET code = \'%s\' '
-                   'WHERE id = %d;' %
-                   (sequence_obj.get(cr, SUPERUSER_ID, 'crm.lead'), lead_id))
+def _reserve_code_range(cr, sequence, count):
+    """Reserve count consecutive numbers of sequence in one bump
+
+    The nextval and setval of a standard sequence are two steps, so another
+    transaction drawing from the sequence in between would get a number of
+    the range. This is only used on installation, where the sequence was
+    just created by the installing transaction and nobody else can see it
+    yet; crm.lead's _reserve_codes covers the general case.
+
+    :return: first reserved number and increment between numbers
+    """
+    increment = sequence.number_increment
+    if sequence.implementation == 'standard':
+        cr.execute(
+            "SELECT setval('ir_sequence_%03d', "
+            "nextval('ir_sequence_%03d') + %%s)" % (sequence.id, sequence.id),
+            (increment * (count - 1),))
+        first = cr.fetchone()[0] - increment * (count - 1)
+    else:
+        cr.execute(
+            "UPDATE ir_sequence "
+            "SET number_next = number_next + number_increment * %s "
+            "WHERE id = %s RETURNING number_next",
+            (count, sequence.id))
+        first = cr.fetchone()[0] - increment * count
+        sequence.invalidate_cache(['number_next'], sequence.ids)
+    return first, increment
+
+
+def assign_old_sequences(cr, registry, chunk_size=100000):
+    """Give the existing leads their codes in id order
+
+    Only the leads still coded with their id, or without code, are
+    numbered: those prepared with online_migration.prepare_code_column
+    already have their final code, and the sequence starts after the
+    highest of them. The numbers are reserved with a single bump of the
+    sequence, then codes are computed by the database in chunks of
+    chunk_size leads, one UPDATE per chunk."""
+    cr.execute('SELECT count(*), max(id) FROM crm_lead '
+               'WHERE code IS NULL OR code = id::text')
+    total, max_id = cr.fetchone()
+    with Environment.manage():
+        env = Environment(cr, SUPERUSER_ID, {})
+        lead_model = env['crm.lead']
+        sequence = lead_model._get_code_sequence()
+        if sequence:
+            prefix, suffix = lead_model._get_code_affixes(sequence)
+            used = get_used_number(cr, prefix, suffix)
+            # the sequence is moved past the prepared codes even when every
+            # lead already has one, so new leads do not reuse them
+            if used or total:
+                first, increment = _reserve_code_range(
+                    cr, sequence, used + total)
+            if total:
+                assign_codes(
+                    cr, first + used * increment, increment, prefix, suffix,
+                    sequence.padding, chunk_size, max_id=max_id)
+        lead_model._rebuild_reference_index()
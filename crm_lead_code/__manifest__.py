@@ -37,6 +37,7 @@
     ],
     "depends": [
         "crm",
+        "reference_index",
     ],
     "data": [
         "views/crm_lead_view.xml",
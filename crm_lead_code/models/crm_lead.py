@@ -7,7 +7,9 @@ from openerp import api, fields, models
 
 
 class CrmLead(models.Model):
-    _inherit = "crm.lead"
+    _name = "crm.lead"
+    _inherit = ["crm.lead", "reference.index.mixin"]
+    _reference_fields = ["code"]
 
     code = fields.Char(
         string='Lead Number', required=True, default="/", readonly=True)
@@ -17,15 +19,91 @@ class CrmLead(models.Model):
          'The code must be unique!'),
     ]
 
+    @api.model
+    def _get_code_sequence(self):
+        """Return the sequence ir.sequence.get('crm.lead') draws from"""
+        companies = self.env['res.company'].search([])
+        sequences = self.env['ir.sequence'].search(
+            [('code', '=', 'crm.lead'),
+             ('company_id', 'in', companies.ids + [False])])
+        company_id = (self.env.context.get('force_company') or
+                      self.env.user.company_id.id)
+        preferred = sequences.filtered(
+            lambda x: x.company_id.id == company_id)
+        return preferred[:1] or sequences[:1]
+
+    @api.model
+    def _get_code_affixes(self, sequence):
+        """Return the interpolated prefix and suffix of sequence"""
+        sequence_model = self.env['ir.sequence']
+        interpolation = sequence_model._interpolation_dict()
+        return (sequence_model._interpolate(sequence.prefix, interpolation),
+                sequence_model._interpolate(sequence.suffix, interpolation))
+
+    @api.model
+    def _reserve_codes(self, count):
+        """Allocate count codes with a single sequence call
+
+        Safe while other transactions draw codes: no-gap sequences hand out
+        a contiguous block under the lock of their ir_sequence row; standard
+        sequences draw count values of the PostgreSQL sequence in one query,
+        which are contiguous unless other transactions draw values at the
+        same time. Bumping a standard sequence with setval instead is only
+        done by the installation hook, see assign_old_sequences.
+        """
+        if not count:
+            return []
+        sequence = self._get_code_sequence()
+        if not sequence:
+            return [False] * count
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval('ir_sequence_%03d') "
+                "FROM generate_series(1, %%s)" % sequence.id, (count,))
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                "UPDATE ir_sequence "
+                "SET number_next = number_next + number_increment * %s "
+                "WHERE id = %s RETURNING number_next, number_increment",
+                (count, sequence.id))
+            number_next, increment = self.env.cr.fetchone()
+            sequence.invalidate_cache(['number_next'], sequence.ids)
+            first = number_next - increment * count
+            numbers = range(first, number_next, increment)
+        prefix, suffix = self._get_code_affixes(sequence)
+        number_format = '%%0%sd' % sequence.padding
+        return [prefix + number_format % number + suffix
+                for number in numbers]
+
     @api.model
     def create(self, vals):
         if vals.get('code', '/') == '/':
             vals['code'] = self.env['ir.sequence'].get('crm.lead')
         return super(CrmLead, self).create(vals)
 
-    @api.one
+    @api.model
+    def create_multi(self, vals_list):
+        """Create a lead per dict of vals_list
+
+        The codes of the leads without one, or with the '/' placeholder,
+        are allocated together in one sequence call.
+        """
+        vals_list = [dict(vals) for vals in vals_list]
+        todo = [vals for vals in vals_list if vals.get('code', '/') == '/']
+        for vals, code in zip(todo, self._reserve_codes(len(todo))):
+            vals['code'] = code
+        leads = self.browse()
+        for vals in vals_list:
+            leads += self.create(vals)
+        return leads
+
+    @api.multi
+    @api.returns('self', lambda value: value.id)
     def copy(self, default=None):
-        if default is None:
-            default = {}
-        default['code'] = self.env['ir.sequence'].get('crm.lead')
-        return super(CrmLead, self).copy(default)
+        codes = self._reserve_codes(len(self))
+        leads = self.browse()
+        for lead, code in zip(self, codes):
+            lead_default = dict(default or {}, code=code)
+            leads += super(CrmLead, lead).copy(lead_default)
+        return leads
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __openerp__.py file in root directory
+##############################################################################
+"""Online preparation of the code column of crm_lead
+
+Installing the module on a large database adds and fills the code column of
+crm_lead in the install transaction, which locks the table for as long as
+every lead is rewritten. Running prepare_code_column before the
+installation does the same work while users keep working:
+
+* the column is added as nullable, which only needs a short lock,
+* the leads get their final codes, numbered in id order like the
+  installation does, in small id ranges, each committed on its own, with a
+  pause between ranges to leave room to the other transactions,
+* the unique index is built concurrently and then attached as the
+  crm_lead_unique_code constraint, so the installation finds it ready.
+
+The codes follow the lead sequence of data/lead_sequence.xml; the
+installation then starts the sequence after the highest number given here
+and only numbers the leads created in between.
+
+For instance, from a script with the server configuration loaded::
+
+    from openerp.addons.crm_lead_code.online_migration import \\
+        prepare_code_column
+    prepare_code_column('mydb')
+"""
+
+import logging
+import time
+from contextlib import closing
+
+from openerp import sql_db
+
+_logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'crm_lead_crm_lead_unique_code'
+
+
+def _column_exists(cr):
+    cr.execute("SELECT 1 FROM information_schema.columns "
+               "WHERE table_name = 'crm_lead' AND column_name = 'code'")
+    return bool(cr.fetchone())
+
+
+def _add_column(cr, lock_timeout, retries):
+    """Add the nullable column, giving up waiting for the table lock after
+    lock_timeout so that the queries queued behind it are not blocked"""
+    for attempt in range(retries):
+        try:
+            cr.execute("SET lock_timeout = %s", ('%ds' % lock_timeout,))
+            cr.execute('ALTER TABLE crm_lead '
+                       'ADD COLUMN code character varying')
+            return
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            _logger.info('crm_lead is busy, retrying to add the code column')
+            time.sleep(lock_timeout)
+        finally:
+            cr.execute('RESET lock_timeout')
+
+
+def get_used_number(cr, prefix, suffix):
+    """Return the highest number of the lead codes made of prefix, digits
+    and suffix, or 0"""
+    cr.execute(
+        'SELECT max(substr(code, length(%(prefix)s) + 1, length(code) - '
+        '    length(%(prefix)s) - length(%(suffix)s))::bigint) '
+        'FROM crm_lead '
+        'WHERE left(code, length(%(prefix)s)) = %(prefix)s '
+        'AND right(code, length(%(suffix)s)) = %(suffix)s '
+        'AND substr(code, length(%(prefix)s) + 1, length(code) - '
+        "    length(%(prefix)s) - length(%(suffix)s)) ~ '^[0-9]+$' "
+        'AND code <> id::text',
+        {'prefix': prefix, 'suffix': suffix})
+    return cr.fetchone()[0] or 0
+
+
+def assign_codes(cr, first, increment, prefix, suffix, padding, batch_size,
+                 max_id=None, pause=0):
+    """Number the leads without a code, or with their id as code, in id
+    order, one UPDATE per batch of batch_size leads
+
+    :param first: number of the first code
+    :param max_id: leave out the leads created after this id
+    :param pause: seconds to wait between two batches
+    :return: number of leads updated
+    """
+    done = last_id = 0
+    while True:
+        cr.execute(
+            'WITH ranked AS ('
+            '    SELECT id, row_number() OVER (ORDER BY id) AS rank '
+            '    FROM crm_lead WHERE id > %(last_id)s '
+            '    AND (%(max_id)s IS NULL OR id <= %(max_id)s) '
+            '    AND (code IS NULL OR code = id::text) '
+            '    ORDER BY id LIMIT %(limit)s), '
+            'numbered AS ('
+            '    SELECT id, (%(first)s + (%(done)s + rank - 1) * '
+            '    %(increment)s)::text AS number FROM ranked), '
+            'updated AS ('
+            '    UPDATE crm_lead SET code = %(prefix)s || lpad(number, '
+            "        GREATEST(%(padding)s, length(number)), '0') || "
+            '        %(suffix)s '
+            '    FROM numbered WHERE crm_lead.id = numbered.id '
+            '    RETURNING crm_lead.id) '
+            'SELECT count(*), max(id) FROM updated',
+            {'last_id': last_id, 'max_id': max_id, 'limit': batch_size,
+             'first': first, 'done': done, 'increment': increment,
+             'prefix': prefix, 'suffix': suffix, 'padding': padding})
+        count, last_id = cr.fetchone()
+        if not count:
+            break
+        done += count
+        _logger.info('Assigned codes to %d leads, up to id %d',
+                     done, last_id)
+        if pause:
+            time.sleep(pause)
+    return done
+
+
+def _create_unique_constraint(cr):
+    cr.execute("SELECT 1 FROM pg_constraint WHERE conname = %s",
+               (INDEX_NAME,))
+    if cr.fetchone():
+        return
+    cr.execute("SELECT 1 FROM pg_class WHERE relname = %s", (INDEX_NAME,))
+    if cr.fetchone():
+        # left over, maybe invalid, by an interrupted run
+        cr.execute('DROP INDEX CONCURRENTLY %s' % INDEX_NAME)
+    _logger.info('Creating the unique index of lead codes')
+    cr.execute('CREATE UNIQUE INDEX CONCURRENTLY %s ON crm_lead (code)' %
+               INDEX_NAME)
+    cr.execute('ALTER TABLE crm_lead ADD CONSTRAINT %s UNIQUE USING INDEX %s' %
+               (INDEX_NAME, INDEX_NAME))
+
+
+def prepare_code_column(dbname, batch_size=5000, pause=0.1, lock_timeout=5,
+                        retries=10, prefix='LD', suffix='', padding=4):
+    """Add, fill and index the code column of crm_lead without long locks
+
+    :param batch_size: number of leads updated per transaction
+    :param pause: seconds to wait between two batches
+    :param lock_timeout: seconds to wait for the lock adding the column
+    :param retries: attempts to add the column
+    :param prefix, suffix, padding: those of the lead sequence, which
+                                    starts at 1 and increments by 1
+    """
+    with closing(sql_db.db_connect(dbname).cursor()) as cr:
+        # every statement commits on its own, and CREATE INDEX
+        # CONCURRENTLY cannot run in a transaction
+        cr.autocommit(True)
+        if not _column_exists(cr):
+            _add_column(cr, lock_timeout, retries)
+        # resumes after the codes of an interrupted run
+        assign_codes(cr, get_used_number(cr, prefix, suffix) + 1, 1, prefix,
+                     suffix, padding, batch_size, pause=pause)
+        _create_unique_constraint(cr)
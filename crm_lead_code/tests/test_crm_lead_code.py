@@ -4,6 +4,7 @@
 ##############################################################################
 
 import openerp.tests.common as common
+from openerp.addons.crm_lead_code import assign_old_sequences
 
 
 class TestCrmLeadCode(common.TransactionCase):
@@ -34,6 +35,83 @@ class TestCrmLeadCode(common.TransactionCase):
         self.assertNotEqual(crm_lead_copy.code, self.crm_lead.code)
         self.assertEqual(crm_lead_copy.code, code)
 
+    def test_create_multi_lead_code_assign(self):
+        code = self._get_next_code()
+        crm_leads = self.crm_lead_model.create_multi([
+            {'name': 'Testing lead code 1'},
+            {'name': 'Testing lead code 2', 'code': '/'},
+            {'name': 'Testing lead code 3', 'code': 'MANUAL-CODE'},
+            {'name': 'Testing lead code 4'},
+        ])
+        self.assertEqual(len(crm_leads), 4)
+        self.assertEqual(crm_leads[0].code, code)
+        self.assertEqual(crm_leads[2].code, 'MANUAL-CODE')
+        codes = crm_leads.mapped('code')
+        self.assertNotIn('/', codes)
+        self.assertEqual(len(set(codes)), 4)
+        self.assertEqual(
+            [self._get_code_number(c) for c in codes[:2] + codes[3:]],
+            [self._get_code_number(code) + i for i in range(3)])
+
+    def test_copy_multi_lead_code_assign(self):
+        crm_leads = self.crm_lead + self.env.ref('crm.crm_case_2')
+        code = self._get_next_code()
+        crm_lead_copies = crm_leads.copy()
+        self.assertEqual(len(crm_lead_copies), 2)
+        self.assertEqual(crm_lead_copies[0].code, code)
+        self.assertEqual(
+            self._get_code_number(crm_lead_copies[1].code),
+            self._get_code_number(code) + 1)
+
+    def test_lead_code_reference_lookup(self):
+        crm_lead = self.crm_lead_model.create({
+            'name': 'Testing lead code lookup',
+        })
+        matches = self.env['reference.index'].lookup(crm_lead.code)
+        self.assertEqual(matches[0]['model'], 'crm.lead')
+        self.assertEqual(matches[0]['id'], crm_lead.id)
+        self.assertEqual(matches[0]['reference'], crm_lead.code)
+        prefix_matches = self.env['reference.index'].lookup(
+            crm_lead.code[:-1].lower(), limit=100)
+        self.assertIn(
+            crm_lead.id, [match['id'] for match in prefix_matches
+                          if match['model'] == 'crm.lead'])
+        code, crm_lead_id = crm_lead.code, crm_lead.id
+        crm_lead.unlink()
+        self.assertNotIn(
+            crm_lead_id, [match['id'] for match in
+                          self.env['reference.index'].lookup(code)
+                          if match['model'] == 'crm.lead'])
+
+    def test_install_over_prepared_codes(self):
+        # every lead got its final code from
+        # online_migration.prepare_code_column, up to a number the
+        # sequence has not reached yet
+        number = self._get_code_number(self._get_next_code()) + 50
+        self.crm_lead.write({'code': self._format_code(number)})
+        self.assertFalse(self.crm_lead_model.search_count(
+            [('code', '=', False)]))
+        assign_old_sequences(self.cr, self.registry)
+        self.crm_sequence.invalidate_cache()
+        crm_lead = self.crm_lead_model.create({
+            'name': 'Testing lead code after preparation',
+        })
+        self.assertGreater(self._get_code_number(crm_lead.code), number)
+        self.assertEqual(
+            self.crm_lead_model.search_count(
+                [('code', '=', crm_lead.code)]), 1)
+
+    def _format_code(self, number):
+        d = self.ir_sequence_model._interpolation_dict()
+        return (self.ir_sequence_model._interpolate(
+            self.crm_sequence.prefix, d) +
+            '%%0%sd' % self.crm_sequence.padding % number +
+            self.ir_sequence_model._interpolate(
+                self.crm_sequence.suffix, d))
+
+    def _get_code_number(self, code):
+        return int(code[len(self.crm_sequence.prefix or ''):])
+
     def _get_next_code(self):
         d = self.ir_sequence_model._interpolation_dict()
         prefix = self.ir_sequence_model._interpolate(
@@ -34,7 +34,9 @@
         'python': [],
     },
     'data': [
+        'security/ir.model.access.csv',
         'views/crm_lead_view.xml',
+        'data/sale_order_partner_counter_data.xml',
     ],
     'installable': False,
     'application': True,
@@ -21,3 +21,4 @@
 ##############################################################################
 
 from . import crm_lead
+from . import sale_order_partner_counter
@@ -32,29 +32,32 @@ quotations_states = ['draft', 'sent', 'waiting_date']
 class CrmLead(models.Model):
     _inherit = 'crm.lead'
 
+    @api.multi
     def count_sales_order(self):
-        if not self.partner_id:
-            return False
-        self.sales_order_count = self.env['sale.order'].search_count([
-            ('partner_id', '=', self.partner_id.id),
-            ('state', 'in', sales_order_states),
-        ])
-        self.quotations_count = self.env['sale.order'].search_count([
-            ('partner_id', '=', self.partner_id.id),
-            ('state', 'in', quotations_states),
-        ])
+        """Read the order and quotation counts of the commercial partners
+        of the leads from the counters maintained by sale.order"""
+        counts = self.env['sale.order.partner.counter'].get_counts(
+            self.mapped('partner_id.commercial_partner_id').ids)
+        for lead in self:
+            lead.sales_order_count, lead.quotations_count = counts.get(
+                lead.partner_id.commercial_partner_id.id, (0, 0))
 
     sales_order_count = fields.Integer(compute='count_sales_order')
     quotations_count = fields.Integer(compute='count_sales_order')
 
     @api.multi
     def get_sale_order_view(self, order_states, view_title):
-        partner_ids = [lead.partner_id.id for lead in self]
-
-        orders = self.env['sale.order'].search([
-            ('partner_id', 'in', partner_ids),
+        """Open the orders of the commercial entities of the leads, placed
+        by the entities themselves or by any of their contacts"""
+        commercial_partner_ids = self.mapped(
+            'partner_id.commercial_partner_id').ids
+        domain = [
+            ('partner_id.commercial_partner_id', 'in',
+             commercial_partner_ids),
             ('state', 'in', order_states),
-        ])
+        ]
+
+        orders = self.env['sale.order'].search(domain, limit=2)
 
         res = {
             'name': view_title,
@@ -67,10 +70,7 @@ class CrmLead(models.Model):
             res['res_id'] = orders[0].id
             res['view_mode'] = 'form'
         else:
-            res['domain'] = [
-                ('state', 'in', order_states),
-                ('partner_id', 'in', partner_ids),
-            ]
+            res['domain'] = domain
             res['view_mode'] = 'tree,form'
 
         return res
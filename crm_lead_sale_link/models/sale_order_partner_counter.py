@@ -0,0 +1,242 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2015 Savoir-faire Linux
+#    (<http://www.savoirfairelinux.com>).
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+
+import logging
+
+from openerp import SUPERUSER_ID, models, fields, api
+
+from .crm_lead import sales_order_states, quotations_states
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleOrderPartnerCounter(models.Model):
+    """Number of sales orders and quotations of a commercial entity
+
+    Orders are counted on the commercial partner of their customer, so a
+    company's counter includes the orders of all its contacts. Rows are
+    maintained incrementally from sale.order and res.partner, so that the
+    lead smart buttons never need to count the orders themselves. A
+    scheduled reconciliation repairs any drift, e.g. after states changed
+    in SQL."""
+    _name = 'sale.order.partner.counter'
+    _description = 'Partner Sale Order Counter'
+    _rec_name = 'partner_id'
+    _log_access = False
+
+    partner_id = fields.Many2one(
+        'res.partner', string='Partner', required=True, readonly=True,
+        ondelete='cascade')
+    sales_order_count = fields.Integer(readonly=True)
+    quotations_count = fields.Integer(readonly=True)
+
+    _sql_constraints = [
+        ('partner_uniq', 'unique(partner_id)',
+         'Only one counter per partner.'),
+    ]
+
+    def init(self, cr):
+        # counters are maintained incrementally once built, so module
+        # updates do not recount every order
+        cr.execute('SELECT 1 FROM sale_order_partner_counter LIMIT 1')
+        if not cr.fetchone():
+            self._rebuild(cr, SUPERUSER_ID)
+
+    @api.model
+    def _get_actual_counts_query(self, order_ids=None):
+        """Return the query counting the orders of each commercial partner,
+        or only the given orders"""
+        params = (tuple(sales_order_states), tuple(quotations_states),
+                  tuple(sales_order_states + quotations_states))
+        where = ''
+        if order_ids is not None:
+            where = 'AND sale_order.id IN %s '
+            params += (tuple(order_ids),)
+        return (
+            'SELECT coalesce(partner.commercial_partner_id, partner.id) '
+            'AS partner_id, '
+            'sum(CASE WHEN sale_order.state IN %s THEN 1 ELSE 0 END) '
+            'AS sales, '
+            'sum(CASE WHEN sale_order.state IN %s THEN 1 ELSE 0 END) '
+            'AS quotations '
+            'FROM sale_order '
+            'JOIN res_partner partner ON partner.id = sale_order.partner_id '
+            'WHERE sale_order.state IN %s ' + where +
+            'GROUP BY 1', params)
+
+    @api.model
+    def _rebuild(self):
+        """Recompute all counters from the orders"""
+        query, params = self._get_actual_counts_query()
+        self.env.cr.execute('DELETE FROM sale_order_partner_counter')
+        self.env.cr.execute(
+            'INSERT INTO sale_order_partner_counter '
+            '(partner_id, sales_order_count, quotations_count) ' + query,
+            params)
+
+    @api.model
+    def _lock_partner(self, partner_id):
+        """Serialize the creation of the counter of partner_id with the
+        other transactions"""
+        self.env.cr.execute(
+            "SELECT pg_advisory_xact_lock("
+            "hashtext('sale_order_partner_counter'), %s)", (partner_id,))
+
+    @api.model
+    def _add(self, partner_id, sales, quotations):
+        self.env.cr.execute(
+            'UPDATE sale_order_partner_counter '
+            'SET sales_order_count = sales_order_count + %s, '
+            'quotations_count = quotations_count + %s '
+            'WHERE partner_id = %s', (sales, quotations, partner_id))
+        return self.env.cr.rowcount
+
+    @api.model
+    def _update(self, order_ids, sign):
+        """Add (sign=1) or remove (sign=-1) orders from the counters"""
+        if not order_ids:
+            return
+        cr = self.env.cr
+        cr.execute(*self._get_actual_counts_query(order_ids))
+        for partner_id, sales, quotations in cr.fetchall():
+            if self._add(partner_id, sign * sales, sign * quotations):
+                continue
+            # missing counter: retry under the lock in case another
+            # transaction created it meanwhile
+            self._lock_partner(partner_id)
+            if not self._add(partner_id, sign * sales, sign * quotations):
+                cr.execute(
+                    'INSERT INTO sale_order_partner_counter '
+                    '(partner_id, sales_order_count, quotations_count) '
+                    'VALUES (%s, %s, %s)',
+                    (partner_id, sign * sales, sign * quotations))
+
+    @api.model
+    def get_counts(self, partner_ids):
+        """Return {partner_id: (sales_order_count, quotations_count)}
+
+        :param partner_ids: ids of commercial partners
+        """
+        if not partner_ids:
+            return {}
+        self.env.cr.execute(
+            'SELECT partner_id, sales_order_count, quotations_count '
+            'FROM sale_order_partner_counter WHERE partner_id IN %s',
+            (tuple(partner_ids),))
+        return dict((partner_id, (sales, quotations))
+                    for partner_id, sales, quotations
+                    in self.env.cr.fetchall())
+
+    @api.model
+    def reconcile(self):
+        """Repair the counters which drifted from the orders
+
+        :return: number of repaired counters
+        """
+        query, params = self._get_actual_counts_query()
+        self.env.cr.execute(
+            'SELECT coalesce(actual.partner_id, counter.partner_id), '
+            'coalesce(actual.sales, 0), coalesce(actual.quotations, 0), '
+            'counter.id IS NOT NULL '
+            'FROM (' + query + ') AS actual '
+            'FULL OUTER JOIN sale_order_partner_counter counter '
+            'ON counter.partner_id = actual.partner_id '
+            'WHERE counter.id IS NULL '
+            'OR counter.sales_order_count != coalesce(actual.sales, 0) '
+            'OR counter.quotations_count != coalesce(actual.quotations, 0)',
+            params)
+        rows = self.env.cr.fetchall()
+        for partner_id, sales, quotations, exists in rows:
+            if not exists:
+                self._lock_partner(partner_id)
+            self.env.cr.execute(
+                'UPDATE sale_order_partner_counter '
+                'SET sales_order_count = %s, quotations_count = %s '
+                'WHERE partner_id = %s', (sales, quotations, partner_id))
+            if not self.env.cr.rowcount:
+                self.env.cr.execute(
+                    'INSERT INTO sale_order_partner_counter '
+                    '(partner_id, sales_order_count, quotations_count) '
+                    'VALUES (%s, %s, %s)', (partner_id, sales, quotations))
+        if rows:
+            _logger.warning('Repaired %d partner sale order counters',
+                            len(rows))
+        return len(rows)
+
+    @api.model
+    def _cron_reconcile(self):
+        return self.reconcile()
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    @api.model
+    def create(self, vals):
+        order = super(SaleOrder, self).create(vals)
+        self.env['sale.order.partner.counter']._update(order.ids, 1)
+        return order
+
+    @api.multi
+    def write(self, vals):
+        counter_model = self.env['sale.order.partner.counter']
+        counted = bool(set(vals) & set(['partner_id', 'state']))
+        if counted:
+            counter_model._update(self.ids, -1)
+        res = super(SaleOrder, self).write(vals)
+        if counted:
+            counter_model._update(self.ids, 1)
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['sale.order.partner.counter']._update(self.ids, -1)
+        return super(SaleOrder, self).unlink()
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def _auto_init(self, cr, context=None):
+        res = super(ResPartner, self)._auto_init(cr, context=context)
+        cr.execute(
+            "SELECT 1 FROM pg_indexes "
+            "WHERE indexname = 'res_partner_commercial_partner_id_index'")
+        if not cr.fetchone():
+            cr.execute('CREATE INDEX res_partner_commercial_partner_id_index '
+                       'ON res_partner (commercial_partner_id)')
+        return res
+
+    @api.multi
+    def write(self, vals):
+        """Move the orders of partners changing of commercial entity, and
+        of their contacts, to the counters of their new entity"""
+        if not set(vals) & set(['parent_id', 'is_company']):
+            return super(ResPartner, self).write(vals)
+        order_ids = self.env['sale.order'].sudo().search(
+            [('partner_id', 'child_of', self.ids)]).ids
+        counter_model = self.env['sale.order.partner.counter']
+        counter_model._update(order_ids, -1)
+        res = super(ResPartner, self).write(vals)
+        counter_model._update(order_ids, 1)
+        return res
@@ -21,3 +21,6 @@
 ###############################################################################
 
 from . import models
+from . import report
+from . import wizard
+from . import controllers
@@ -29,9 +29,9 @@
     'license': 'AGPL-3',
     'category': 'Customer Relationship Management',
     'summary': 'Track letters, parcels, registered documents',
-    'depends': ['mail'],
+    'depends': ['mail', 'reference_index'],
     'external_dependencies': {
-        'python': [],
+        'python': ['reportlab', 'requests', 'unicodecsv'],
     },
     'data': [
         "views/res_letter_view.xml",
@@ -40,7 +40,17 @@
         "views/letter_class_view.xml",
         "views/letter_reassignment_view.xml",
         "views/letter_type_view.xml",
+        "views/res_letter_archive_view.xml",
+        "views/letter_routing_rule_view.xml",
+        "views/letter_scan_view.xml",
+        "views/letter_tracking_view.xml",
+        "views/letter_sla_view.xml",
+        "wizard/letter_intake_wizard_view.xml",
+        "wizard/letter_register_wizard_view.xml",
         "data/letter_sequence.xml",
+        "data/letter_archive_data.xml",
+        "data/letter_scan_data.xml",
+        "data/letter_tracking_data.xml",
         'security/ir.model.access.csv',
     ],
     'demo': ["data/letter_demo.xml"],
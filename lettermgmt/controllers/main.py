@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import cgi
+import tempfile
+
+import werkzeug.utils
+
+from openerp import http
+from openerp.http import request
+
+UPLOAD_FORM = u"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"/><title>%(title)s</title></head>
+<body>
+<h1>%(title)s</h1>
+<form method="post" enctype="multipart/form-data">
+<input type="hidden" name="letter_id" value="%(letter_id)d"/>
+<input type="file" name="scan" multiple="multiple" accept="%(accept)s"/>
+<input type="submit" value="%(submit)s"/>
+</form>
+</body></html>
+"""
+
+
+class LetterScanController(http.Controller):
+
+    @http.route('/lettermgmt/scan', type='json', auth='user')
+    def scan(self, codes):
+        """Resolve a batch of scanned codes to letters
+
+        :param codes: a code or a list of codes
+        :return: list of {'code', 'id', 'number', 'state'} dicts, id being
+                 False for unknown codes
+        """
+        if not isinstance(codes, list):
+            codes = [codes]
+        letter_pool = request.registry['res.letter']
+        cr, uid = request.cr, request.uid
+        context = dict(request.context, include_archive=True)
+        matches = letter_pool.scan(cr, uid, codes, context=context)
+        letters = dict(
+            (letter['id'], letter) for letter in letter_pool.read(
+                cr, uid, [letter_id for letter_id in matches.values()
+                          if letter_id],
+                ['number', 'state'], context=context))
+        result = []
+        for code in codes:
+            letter = letters.get(matches.get((code or '').strip()), {})
+            result.append({
+                'code': code,
+                'id': letter.get('id', False),
+                'number': letter.get('number', False),
+                'state': letter.get('state', False),
+            })
+        return result
+
+    def _send_pdf(self, render, filename):
+        """Render a PDF into a temporary file and stream it back"""
+        output = tempfile.TemporaryFile()
+        render(output)
+        output.seek(0)
+        return http.send_file(
+            output, filename=filename, mimetype='application/pdf',
+            as_attachment=True)
+
+    @http.route('/lettermgmt/register', type='http', auth='user')
+    def register(self, date_from, date_to, move=None, channel_id=None,
+                 **kwargs):
+        """Daily register of the letters sent or received between two
+        dates, optionally of a move and of a channel"""
+        report_pool = request.registry['res.letter.report']
+        cr, uid, context = request.cr, request.uid, request.context
+        domain = report_pool.get_register_domain(
+            cr, uid, date_from, date_to, move=move or None,
+            channel_id=channel_id and int(channel_id) or None,
+            context=context)
+        return self._send_pdf(
+            lambda output: report_pool.render_register(
+                cr, uid, output, domain, context=context),
+            'register.pdf')
+
+    @http.route('/lettermgmt/labels', type='http', auth='user')
+    def labels(self, ids, **kwargs):
+        """Shipping labels of comma separated letter ids"""
+        report_pool = request.registry['res.letter.report']
+        cr, uid, context = request.cr, request.uid, request.context
+        letter_ids = [int(letter_id) for letter_id in ids.split(',')]
+        return self._send_pdf(
+            lambda output: report_pool.render_labels(
+                cr, uid, output, letter_ids, context=context),
+            'labels.pdf')
+
+    @http.route('/lettermgmt/scan/upload', type='http', auth='user',
+                methods=['GET'])
+    def scan_upload_form(self, letter_id, **kwargs):
+        """Plain upload form, posting scans without going through base64
+        encoded JSON requests"""
+        letter = request.registry['res.letter'].browse(
+            request.cr, request.uid, int(letter_id), context=request.context)
+        return request.make_response(UPLOAD_FORM % {
+            'title': cgi.escape(u'%s - %s' % (
+                letter.number or '', 'Upload Scans')),
+            'letter_id': letter.id,
+            'accept': 'application/pdf,image/*',
+            'submit': 'Upload',
+        }, [('Content-Type', 'text/html; charset=utf-8')])
+
+    @http.route('/lettermgmt/scan/upload', type='http', auth='user',
+                methods=['POST'])
+    def scan_upload(self, letter_id, **kwargs):
+        """Store uploaded scans, streamed from werkzeug's spooled files"""
+        scan_pool = request.registry['letter.scan']
+        cr, uid, context = request.cr, request.uid, request.context
+        letter_id = int(letter_id)
+        for upload in request.httprequest.files.getlist('scan'):
+            scan_pool.add_scan(
+                cr, uid, letter_id, upload.stream, upload.filename,
+                mimetype=upload.mimetype, context=context)
+        return werkzeug.utils.redirect(
+            '/web#id=%d&view_type=form&model=res.letter' % letter_id)
+
+    @http.route('/lettermgmt/scan/<int:scan_id>', type='http', auth='user')
+    def scan_download(self, scan_id, **kwargs):
+        scan_pool = request.registry['letter.scan']
+        cr, uid, context = request.cr, request.uid, request.context
+        scan = scan_pool.browse(cr, uid, scan_id, context=context)
+        return http.send_file(
+            scan_pool.open_file(cr, uid, scan_id, context=context),
+            filename=scan.name, mimetype=scan.mimetype,
+            as_attachment=True)
@@ -25,4 +25,13 @@ from . import (
     letter_type,
     letter_reassignment,
     letter_channel,
+    letter_intake,
+    letter_folder_counter,
+    res_letter_archive,
+    res_letter_fulltext,
+    res_partner,
+    letter_routing_rule,
+    letter_scan,
+    letter_tracking,
+    letter_sla,
 )
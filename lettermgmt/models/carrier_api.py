@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import requests
+
+# Carrier API classes by name, see carrier_api
+CARRIER_APIS = {}
+
+
+def carrier_api(name, label):
+    """Class decorator registering a carrier tracking API
+
+    Registered APIs can be chosen on letter channels, so other modules add
+    carriers with::
+
+        @carrier_api('acme', 'ACME Express')
+        class AcmeCarrierApi(CarrierApi):
+            status_map = {...}
+
+            def fetch_status(self, track_ref):
+                ...
+    """
+    def register(cls):
+        cls.name = name
+        cls.label = label
+        CARRIER_APIS[name] = cls
+        return cls
+    return register
+
+
+def get_carrier_api_selection(*args, **kwargs):
+    return sorted(
+        (name, cls.label) for name, cls in CARRIER_APIS.items())
+
+
+class CarrierApi(object):
+    """Base of carrier tracking APIs
+
+    Instances are shared by the polling threads, so fetch_status must be
+    thread safe and must not use the database."""
+    name = None
+    label = None
+    # Carrier status: letter state, unknown statuses leave letters as is
+    status_map = {}
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch_status(self, track_ref):
+        """Return the carrier status of a tracking reference"""
+        raise NotImplementedError()
+
+    def get_state(self, track_ref):
+        """Return the letter state of a tracking reference, or None"""
+        return self.status_map.get(self.fetch_status(track_ref))
+
+
+@carrier_api('json', 'Generic JSON')
+class JsonCarrierApi(CarrierApi):
+    """Carrier answering GET <url>?tracking_ref=<ref> with
+    {"status": "<status>"}"""
+    status_map = {
+        'in_transit': 'sent',
+        'delivered': 'rec',
+        'returned': 'rec_ret',
+        'damaged': 'rec_bad',
+    }
+
+    def fetch_status(self, track_ref):
+        response = requests.get(
+            self.url, params={'tracking_ref': track_ref},
+            timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get('status')
@@ -22,6 +22,8 @@
 ##############################################################################
 from openerp.osv import fields, orm
 
+from .carrier_api import get_carrier_api_selection
+
 
 class letter_channel(orm.Model):
     """ Class to define various channels using which letters can be sent or
@@ -30,4 +32,15 @@ class letter_channel(orm.Model):
     _description = "Send/Receive channel"
     _columns = {
         'name': fields.char('Type', required=True),
+        'tracking_api': fields.selection(
+            get_carrier_api_selection, 'Tracking API',
+            help="Carrier API the tracking references of the letters of "
+                 "this channel are polled from."),
+        'tracking_url': fields.char('Tracking URL'),
+        'tracking_timeout': fields.integer(
+            'Tracking Timeout',
+            help="Timeout in seconds of each request, 10 if empty."),
+    }
+    _defaults = {
+        'tracking_timeout': 10,
     }
@@ -20,19 +20,89 @@
 #
 ###############################################################################
 from openerp.osv import orm, fields
+from openerp.tools.translate import _
 
 
 class letter_folder(orm.Model):
     """Folder which contains collections of letters"""
     _name = 'letter.folder'
     _description = 'Letter Folder'
+
+    def _get_letter_counts(self, cr, uid, ids, field_names, arg,
+                           context=None):
+        """Totals from the maintained counters, in one query for all ids"""
+        result = dict(
+            (folder_id, dict.fromkeys(field_names, 0)) for folder_id in ids)
+        if not ids:
+            return result
+        cr.execute(
+            'SELECT folder_id, move, sum(letter_count) '
+            'FROM letter_folder_counter WHERE folder_id IN %s '
+            'GROUP BY folder_id, move', (tuple(ids),))
+        for folder_id, move, count in cr.fetchall():
+            counts = result[folder_id]
+            if 'letter_count' in counts:
+                counts['letter_count'] += count
+            field_name = 'letter_%s_count' % move
+            if field_name in counts:
+                counts[field_name] += count
+        return result
+
     _columns = {
         'name': fields.char('Name', required=True),
         'code': fields.char('Code', required=True),
         'letter_ids': fields.one2many(
             'res.letter', 'folder_id', string='Letters',
             help='Letters contained in this folder.'),
+        'counter_ids': fields.one2many(
+            'letter.folder.counter', 'folder_id', string='Statistics',
+            readonly=True,
+            help='Number of letters of this folder per move and state.'),
+        'letter_count': fields.function(
+            _get_letter_counts, type='integer', string='Letters',
+            multi='letter_count'),
+        'letter_in_count': fields.function(
+            _get_letter_counts, type='integer', string='Inbound Letters',
+            multi='letter_count'),
+        'letter_out_count': fields.function(
+            _get_letter_counts, type='integer', string='Outbound Letters',
+            multi='letter_count'),
     }
     _sql_constraints = [('code_uniq', 'unique(code)', 'Code must be unique !')]
 
+    def read_letter_page(self, cr, uid, folder_id, last_id=None, limit=80,
+                         domain=None, fields_to_read=None, context=None):
+        """Read a page of the letters of a folder, newest first
+
+        Pages are keyset based: pass the id of the last letter of the
+        previous page as last_id to get the next one, which stays an index
+        range scan however deep in the folder the page is.
+
+        :param domain: optional extra domain on the letters
+        :return: list of dicts as returned by read
+        """
+        letter_pool = self.pool.get('res.letter')
+        letter_domain = [('folder_id', '=', folder_id)] + (domain or [])
+        if last_id:
+            letter_domain.append(('id', '<', last_id))
+        letter_ids = letter_pool.search(
+            cr, uid, letter_domain, limit=limit, order='id desc',
+            context=context)
+        return letter_pool.read(
+            cr, uid, letter_ids,
+            fields_to_read or ['number', 'name', 'move', 'state'],
+            context=context)
+
+    def action_view_letters(self, cr, uid, ids, context=None):
+        """Open the letters of the folder in a paginated list"""
+        return {
+            'name': _('Letters'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'res.letter',
+            'view_type': 'form',
+            'view_mode': 'tree,form',
+            'domain': [('folder_id', 'in', ids)],
+            'context': {'default_folder_id': ids[0]},
+        }
+
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from openerp.osv import fields, orm
+
+
+class letter_folder_counter(orm.Model):
+    """Number of letters of a folder per move and state
+
+    Rows are maintained incrementally by res.letter, so that folder
+    statistics never need to scan the letters themselves."""
+    _name = 'letter.folder.counter'
+    _description = 'Letter Folder Counter'
+    _order = 'folder_id, move, state'
+    _columns = {
+        'folder_id': fields.many2one(
+            'letter.folder', 'Folder', required=True, ondelete='cascade',
+            readonly=True),
+        'move': fields.char('Move', readonly=True),
+        'state': fields.char('State', readonly=True),
+        'letter_count': fields.integer('Letters', readonly=True),
+    }
+    _sql_constraints = [
+        ('folder_move_state_uniq', 'unique(folder_id, move, state)',
+         'Only one counter per folder, move and state.'),
+    ]
+
+    def init(self, cr):
+        # counters are maintained incrementally, only fill them on install
+        cr.execute('SELECT 1 FROM letter_folder_counter LIMIT 1')
+        if not cr.fetchone():
+            self._rebuild(cr)
+
+    def _rebuild(self, cr):
+        """Recompute all counters from the letters"""
+        cr.execute('DELETE FROM letter_folder_counter')
+        cr.execute(
+            'INSERT INTO letter_folder_counter '
+            '(folder_id, move, state, letter_count) '
+            'SELECT folder_id, move, state, count(*) FROM res_letter '
+            'WHERE folder_id IS NOT NULL GROUP BY folder_id, move, state')
+
+    def _add(self, cr, folder_id, move, state, count):
+        cr.execute(
+            'UPDATE letter_folder_counter '
+            'SET letter_count = letter_count + %s '
+            'WHERE folder_id = %s AND move IS NOT DISTINCT FROM %s '
+            'AND state IS NOT DISTINCT FROM %s',
+            (count, folder_id, move, state))
+        return cr.rowcount
+
+    def _update(self, cr, letter_ids, sign):
+        """Add (sign=1) or remove (sign=-1) letters from the counters"""
+        if not letter_ids:
+            return
+        cr.execute(
+            'SELECT folder_id, move, state, count(*) FROM res_letter '
+            'WHERE id IN %s AND folder_id IS NOT NULL '
+            'GROUP BY folder_id, move, state', (tuple(letter_ids),))
+        for folder_id, move, state, count in cr.fetchall():
+            if self._add(cr, folder_id, move, state, sign * count):
+                continue
+            # missing counter: serialize its creation with the other
+            # transactions of the folder, then retry in case one of them
+            # created it meanwhile
+            cr.execute(
+                "SELECT pg_advisory_xact_lock("
+                "hashtext('letter_folder_counter'), %s)", (folder_id,))
+            if not self._add(cr, folder_id, move, state, sign * count):
+                cr.execute(
+                    'INSERT INTO letter_folder_counter '
+                    '(folder_id, move, state, letter_count) '
+                    'VALUES (%s, %s, %s, %s)',
+                    (folder_id, move, state, sign * count))
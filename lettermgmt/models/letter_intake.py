@@ -0,0 +1,298 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import json
+import logging
+import time
+
+import unicodecsv
+
+from openerp.osv import orm
+from openerp.tools.translate import _
+
+_logger = logging.getLogger(__name__)
+
+# Columns of an intake row which are copied as they are
+PLAIN_FIELDS = [
+    'name', 'number', 'move', 'date', 'snd_rec_date', 'note', 'state',
+    'orig_ref', 'expeditor_ref', 'track_ref', 'weight', 'size',
+]
+# Maximum number of partner references kept in memory between chunks
+PARTNER_CACHE_SIZE = 10000
+# Maximum number of row errors reported back to the caller
+MAX_ERRORS = 1000
+
+
+class res_letter_intake(orm.AbstractModel):
+    """Streaming bulk import of letters
+
+    Rows are read lazily from an iterable of dicts and inserted in chunks
+    through res.letter's _bulk_create, so memory use only depends on the
+    chunk size. Rows may reference:
+
+    * type: letter.type code or name
+    * class: letter.class name
+    * channel: letter.channel name
+    * folder: letter.folder code or name
+    * sender, recipient: res.partner reference, or name
+    """
+    _name = 'res.letter.intake'
+    _description = 'Letter Bulk Intake'
+
+    def _get_lookup_map(self, cr, uid, model, keys, context=None):
+        """Map lowercased code/name values of a small model to its ids"""
+        model_pool = self.pool.get(model)
+        fields_to_read = [key for key in keys if key in model_pool._columns]
+        ids = model_pool.search(
+            cr, uid, [], context=dict(context or {}, active_test=False))
+        result = {}
+        for record in model_pool.read(
+                cr, uid, ids, fields_to_read, context=context):
+            # names come last, codes win over names on collision
+            for key in reversed(fields_to_read):
+                if record[key]:
+                    result[record[key].strip().lower()] = record['id']
+        return result
+
+    def _get_lookup_maps(self, cr, uid, context=None):
+        columns = self.pool.get('res.letter')._columns
+        return {
+            'move': dict(columns['move'].selection),
+            'state': dict(columns['state'].selection),
+            'type': self._get_lookup_map(
+                cr, uid, 'letter.type', ['code', 'name'], context=context),
+            'class': self._get_lookup_map(
+                cr, uid, 'letter.class', ['name'], context=context),
+            'channel_id': self._get_lookup_map(
+                cr, uid, 'letter.channel', ['name'], context=context),
+            'folder_id': self._get_lookup_map(
+                cr, uid, 'letter.folder', ['code', 'name'], context=context),
+        }
+
+    def _resolve_partners(self, cr, uid, references, cache, context=None):
+        """Fill cache with the partner ids of references in one query"""
+        todo = list(set(references) - set(cache))
+        if not todo:
+            return
+        if len(cache) + len(todo) > PARTNER_CACHE_SIZE:
+            cache.clear()
+        cr.execute(
+            "SELECT lower(ref), id FROM res_partner "
+            "WHERE lower(ref) IN %s ORDER BY id DESC",
+            (tuple(todo),))
+        found = dict(cr.fetchall())
+        missing = tuple(set(todo) - set(found))
+        if missing:
+            cr.execute(
+                "SELECT lower(name), id FROM res_partner "
+                "WHERE lower(name) IN %s ORDER BY id DESC",
+                (missing,))
+            found.update(cr.fetchall())
+        for reference in todo:
+            cache[reference] = found.get(reference)
+
+    def _prepare_vals(self, row, lookup_maps, partner_cache, move):
+        """Turn an intake row into res.letter values
+
+        Raises ValueError with a readable message for invalid rows."""
+        vals = {}
+        for name in PLAIN_FIELDS:
+            value = row.get(name)
+            if value not in (None, ''):
+                vals[name] = value
+        vals.setdefault('move', move)
+        for field in ('move', 'state'):
+            if field in vals and vals[field] not in lookup_maps[field]:
+                raise ValueError(
+                    _('Invalid %s "%s"') % (field, vals[field]))
+        if 'weight' in vals:
+            vals['weight'] = float(vals['weight'])
+        for key, field in [('type', 'type'), ('class', 'class'),
+                           ('channel', 'channel_id'),
+                           ('folder', 'folder_id')]:
+            value = ('%s' % (row.get(key) or '')).strip().lower()
+            if not value:
+                continue
+            if value not in lookup_maps[field]:
+                raise ValueError(
+                    _('Unknown %s "%s"') % (key, row.get(key)))
+            vals[field] = lookup_maps[field][value]
+        for key, field in [('sender', 'sender_partner_id'),
+                           ('recipient', 'recipient_partner_id')]:
+            value = ('%s' % (row.get(key) or '')).strip().lower()
+            if not value:
+                continue
+            if not partner_cache.get(value):
+                raise ValueError(
+                    _('Unknown partner "%s"') % row.get(key))
+            vals[field] = partner_cache[value]
+        return vals
+
+    def _insert_chunk(self, cr, uid, chunk, stats, context=None):
+        """Insert a chunk of (line, vals), isolating the failing rows
+
+        Returns the ids of the created letters."""
+        letter_pool = self.pool.get('res.letter')
+        cr.execute('SAVEPOINT letter_intake_chunk')
+        try:
+            ids = letter_pool._bulk_create(
+                cr, uid, [vals for line, vals in chunk], context=context)
+        except Exception:
+            cr.execute('ROLLBACK TO SAVEPOINT letter_intake_chunk')
+        else:
+            cr.execute('RELEASE SAVEPOINT letter_intake_chunk')
+            stats['created'] += len(chunk)
+            return ids
+        ids = []
+        for line, vals in chunk:
+            cr.execute('SAVEPOINT letter_intake_row')
+            try:
+                ids += letter_pool._bulk_create(
+                    cr, uid, [vals], context=context)
+            except Exception as e:
+                cr.execute('ROLLBACK TO SAVEPOINT letter_intake_row')
+                self._add_error(stats, line, e)
+            else:
+                cr.execute('RELEASE SAVEPOINT letter_intake_row')
+                stats['created'] += 1
+        return ids
+
+    def _add_error(self, stats, line, error):
+        stats['error_count'] += 1
+        if len(stats['errors']) < MAX_ERRORS:
+            stats['errors'].append((line, '%s' % error))
+
+    def import_rows(self, cr, uid, rows, move='in', chunk_size=1000,
+                    commit=False, route=False, context=None):
+        """Import an iterable of dicts as letters
+
+        :param rows: iterable of dicts, consumed lazily; ValueError items
+                     are counted as invalid rows
+        :param move: default move for rows which do not set it
+        :param chunk_size: number of rows inserted per statement
+        :param commit: commit after each chunk, for long running imports
+        :param route: reassign the new incoming letters with the routing
+                      rules
+        :raise AccessError: if the user may not create letters, or
+                            reassignment lines when route is set
+        :return: dict with the row, created and error counts, the first
+                 errors as (line, message) tuples, the duration in seconds
+                 and the throughput in rows per second
+        """
+        self.pool.get('res.letter').check_access_rights(cr, uid, 'create')
+        if route:
+            self.pool.get('letter.reassignment').check_access_rights(
+                cr, uid, 'create')
+        start = time.time()
+        stats = {
+            'rows': 0,
+            'created': 0,
+            'error_count': 0,
+            'errors': [],
+            'routed': 0,
+        }
+        lookup_maps = self._get_lookup_maps(cr, uid, context=context)
+        partner_cache = {}
+        batch = []
+
+        def flush():
+            references = set()
+            for line, row in batch:
+                for key in ('sender', 'recipient'):
+                    if row.get(key):
+                        references.add(('%s' % row[key]).strip().lower())
+            self._resolve_partners(
+                cr, uid, references, partner_cache, context=context)
+            chunk = []
+            for line, row in batch:
+                try:
+                    chunk.append((line, self._prepare_vals(
+                        row, lookup_maps, partner_cache, move)))
+                except ValueError as e:
+                    self._add_error(stats, line, e)
+            ids = self._insert_chunk(cr, uid, chunk, stats, context=context)
+            if route:
+                stats['routed'] += self.pool.get(
+                    'letter.routing.rule').route_letters(
+                        cr, uid, ids, skip_routed=False, context=context)
+            if commit:
+                cr.commit()
+            elapsed = time.time() - start
+            _logger.info(
+                'Letter intake: %d rows, %d created, %d errors, '
+                '%.1f rows/s', stats['rows'], stats['created'],
+                stats['error_count'], stats['rows'] / (elapsed or 1))
+            del batch[:]
+
+        for line, row in enumerate(rows, 1):
+            stats['rows'] += 1
+            if isinstance(row, ValueError):
+                self._add_error(stats, line, row)
+                continue
+            batch.append((line, row))
+            if len(batch) >= chunk_size:
+                flush()
+        if batch:
+            flush()
+        stats['duration'] = time.time() - start
+        stats['rows_per_second'] = stats['rows'] / (stats['duration'] or 1)
+        return stats
+
+    def _iter_file(self, data_file, file_format):
+        """Lazily yield rows of a CSV or JSON file object
+
+        JSON files are either JSON lines, which are streamed, or a single
+        array, which has to be loaded at once. Malformed JSON lines are
+        yielded as the ValueError describing them, to be reported as row
+        errors."""
+        if file_format == 'csv':
+            for row in unicodecsv.DictReader(data_file, encoding='utf-8'):
+                yield row
+            return
+        first = data_file.read(1)
+        while first and first.isspace():
+            first = data_file.read(1)
+        if first == '[':
+            for row in json.loads(first + data_file.read()):
+                yield row
+            return
+        line = first + data_file.readline()
+        while line:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = ValueError(_('Invalid JSON: %s') % e)
+                else:
+                    if not isinstance(row, dict):
+                        row = ValueError(_('Invalid JSON: not an object'))
+                yield row
+            line = data_file.readline()
+
+    def import_file(self, cr, uid, data_file, file_format='csv', move='in',
+                    chunk_size=1000, commit=False, route=False,
+                    context=None):
+        """Import letters from a CSV or JSON file object
+
+        See import_rows for the parameters and the returned statistics."""
+        return self.import_rows(
+            cr, uid, self._iter_file(data_file, file_format), move=move,
+            chunk_size=chunk_size, commit=commit, route=route,
+            context=context)
@@ -33,6 +33,9 @@ class letter_reassignment(orm.Model):
             'Comment', help='Comment for user explaining forward.'),
         'letter_id': fields.many2one(
             'res.letter', string='Letter', help='Letter in question.'),
+        'archive_letter_id': fields.many2one(
+            'res.letter.archive', string='Archived Letter',
+            ondelete='cascade', help='Archived letter in question.'),
     }
 
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
@@ -0,0 +1,176 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import itertools
+
+from openerp import SUPERUSER_ID, tools
+from openerp.osv import fields, orm
+
+# res.letter fields a routing rule can match on, in decision index key order
+ROUTING_FIELDS = [
+    ('sender_partner_id', 'sender_partner_id'),
+    ('type_id', 'type'),
+    ('class_id', 'class'),
+    ('channel_id', 'channel_id'),
+]
+
+
+class letter_routing_rule(orm.Model):
+    """Rule reassigning incoming letters to a user
+
+    Rules are compiled into a decision index keyed on the sender, type,
+    class and channel they match, a letter being routed by the matching
+    rule with the lowest sequence."""
+    _name = 'letter.routing.rule'
+    _description = 'Letter Routing Rule'
+    _order = 'sequence, id'
+    _columns = {
+        'name': fields.char('Name', required=True),
+        'sequence': fields.integer('Sequence'),
+        'active': fields.boolean('Active'),
+        'sender_partner_id': fields.many2one(
+            'res.partner', 'Sender', help='Leave empty to match any sender.'),
+        'type_id': fields.many2one(
+            'letter.type', 'Type', help='Leave empty to match any type.'),
+        'class_id': fields.many2one(
+            'letter.class', 'Class', help='Leave empty to match any class.'),
+        'channel_id': fields.many2one(
+            'letter.channel', 'Channel',
+            help='Leave empty to match any channel.'),
+        'keywords': fields.char(
+            'Subject Keywords',
+            help='Comma separated words, one of which the subject must '
+                 'contain. Leave empty to match any subject.'),
+        'user_id': fields.many2one(
+            'res.users', 'Reassign To', required=True),
+        'comment': fields.text(
+            'Comment', help='Comment of the reassignment lines.'),
+    }
+    _defaults = {
+        'sequence': 10,
+        'active': True,
+    }
+
+    @tools.ormcache(skiparg=3)
+    def _get_decision_index(self, cr, uid):
+        """Map (sender, type, class, channel) to the rules matching them,
+        None standing for any value
+
+        Each rule is a (sequence, id, keywords, user_id, comment) tuple and
+        the lists are sorted by sequence."""
+        index = {}
+        rule_ids = self.search(cr, SUPERUSER_ID, [])
+        for rule in self.read(
+                cr, SUPERUSER_ID, rule_ids,
+                [field for field, letter_field in ROUTING_FIELDS] +
+                ['sequence', 'keywords', 'user_id', 'comment']):
+            key = tuple(rule[field] and rule[field][0] or None
+                        for field, letter_field in ROUTING_FIELDS)
+            keywords = tuple(
+                keyword.strip().lower()
+                for keyword in (rule['keywords'] or '').split(',')
+                if keyword.strip())
+            index.setdefault(key, []).append((
+                rule['sequence'], rule['id'], keywords,
+                rule['user_id'][0], rule['comment']))
+        for rules in index.values():
+            rules.sort()
+        return index
+
+    def _match(self, index, letter):
+        """Return the first rule of the index matching a letter"""
+        values = [letter[letter_field] and letter[letter_field][0] or None
+                  for field, letter_field in ROUTING_FIELDS]
+        candidates = []
+        # every combination of the letter's values and wildcards
+        for key in itertools.product(*[(value, None) if value else (None,)
+                                       for value in values]):
+            candidates.extend(index.get(key, []))
+        subject = (letter['name'] or '').lower()
+        for rule in sorted(candidates):
+            keywords = rule[2]
+            if not keywords or any(
+                    keyword in subject for keyword in keywords):
+                return rule
+        return None
+
+    def route_letters(self, cr, uid, letter_ids, skip_routed=True,
+                      context=None):
+        """Create the reassignment lines of incoming letters in one pass
+
+        Other letters are left alone.
+
+        :param skip_routed: leave letters which already have reassignment
+                            lines alone
+        :raise AccessError: if the user may not create reassignment lines
+        :return: number of routed letters
+        """
+        self.pool.get('letter.reassignment').check_access_rights(
+            cr, uid, 'create')
+        if not letter_ids:
+            return 0
+        query = ("SELECT id FROM res_letter "
+                 "WHERE id IN %s AND move = 'in'")
+        if skip_routed:
+            query += (' AND NOT EXISTS (SELECT 1 FROM letter_reassignment '
+                      'WHERE letter_id = res_letter.id)')
+        cr.execute(query + ' ORDER BY id', (tuple(letter_ids),))
+        letter_ids = [row[0] for row in cr.fetchall()]
+        index = self._get_decision_index(cr, uid)
+        if not index or not letter_ids:
+            return 0
+        rows = []
+        now = fields.datetime.now()
+        for letter in self.pool.get('res.letter').read(
+                cr, uid, letter_ids,
+                ['name'] + [letter_field for field, letter_field
+                            in ROUTING_FIELDS],
+                context=context):
+            rule = self._match(index, letter)
+            if rule:
+                rows.append((rule[3], rule[4], letter['id'],
+                             uid, now, uid, now))
+        for start in range(0, len(rows), 1000):
+            chunk = rows[start:start + 1000]
+            cr.execute(
+                'INSERT INTO letter_reassignment (name, comment, letter_id, '
+                'create_uid, create_date, write_uid, write_date) '
+                'VALUES %s' % ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] *
+                                        len(chunk)),
+                [value for row in chunk for value in row])
+        return len(rows)
+
+    def create(self, cr, uid, vals, context=None):
+        rule_id = super(letter_routing_rule, self).create(
+            cr, uid, vals, context=context)
+        self.clear_caches()
+        return rule_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        res = super(letter_routing_rule, self).write(
+            cr, uid, ids, vals, context=context)
+        self.clear_caches()
+        return res
+
+    def unlink(self, cr, uid, ids, context=None):
+        res = super(letter_routing_rule, self).unlink(
+            cr, uid, ids, context=context)
+        self.clear_caches()
+        return res
@@ -0,0 +1,443 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import base64
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image
+
+from openerp import SUPERUSER_ID
+from openerp.osv import fields, orm
+from openerp.tools import find_in_path
+
+_logger = logging.getLogger(__name__)
+
+# Size of the chunks uploads are read and hashed with
+CHUNK_SIZE = 64 * 1024
+# Bounding box of the thumbnails
+THUMBNAIL_SIZE = (256, 256)
+# Default number of threads rendering thumbnails
+THUMBNAIL_WORKERS = 4
+# Age, in seconds, after which leftover temporary upload files are removed
+TMP_FILE_AGE = 24 * 3600
+# Namespace of the advisory locks taken on scan checksums
+CHECKSUM_LOCK = 'letter_scan_blob'
+
+
+def render_thumbnail(path, mimetype):
+    """Render the first page of a scan as a PNG thumbnail
+
+    Runs in the thumbnail worker threads, so it must not use the database.
+    PDF files are rasterized by poppler's pdftoppm, images by PIL."""
+    tmp_dir = None
+    try:
+        if mimetype == 'application/pdf':
+            tmp_dir = tempfile.mkdtemp()
+            prefix = os.path.join(tmp_dir, 'page')
+            subprocess.check_call([
+                find_in_path('pdftoppm'), '-png', '-singlefile',
+                '-f', '1', '-l', '1',
+                '-scale-to', str(max(THUMBNAIL_SIZE)), path, prefix])
+            path = prefix + '.png'
+        image = Image.open(path)
+        image.thumbnail(THUMBNAIL_SIZE, Image.ANTIALIAS)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+        output = StringIO()
+        image.save(output, 'PNG')
+        return output.getvalue()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _render_job(job):
+    """Render the thumbnail of a (blob id, path, mimetype) job"""
+    blob_id, path, mimetype = job
+    try:
+        return blob_id, render_thumbnail(path, mimetype)
+    except Exception:
+        _logger.warning('Cannot render thumbnail of %s', path, exc_info=True)
+        return blob_id, None
+
+
+class letter_scan_blob(orm.Model):
+    """Content of scans, stored once per distinct content
+
+    Files are kept in the filestore under their SHA-1, so a cover page
+    uploaded a thousand times is only stored and thumbnailed once."""
+    _name = 'letter.scan.blob'
+    _description = 'Letter Scan Content'
+    _rec_name = 'checksum'
+    _columns = {
+        'checksum': fields.char(
+            'Checksum', size=40, required=True, readonly=True, select=True),
+        'store_fname': fields.char('Stored Filename', readonly=True),
+        'file_size': fields.integer('File Size', readonly=True),
+        'mimetype': fields.char('Mime Type', readonly=True),
+        'thumbnail': fields.binary('Thumbnail', readonly=True),
+        'thumbnail_state': fields.selection(
+            [('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')],
+            'Thumbnail State', required=True, readonly=True, select=True),
+        'scan_ids': fields.one2many('letter.scan', 'blob_id', 'Scans'),
+    }
+    _defaults = {
+        'thumbnail_state': 'pending',
+    }
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(checksum)',
+         'Scan contents must be unique!'),
+    ]
+
+    def _full_path(self, cr, uid, store_fname):
+        return self.pool.get('ir.attachment')._full_path(
+            cr, uid, store_fname)
+
+    def _lock_checksum(self, cr, checksum, session=False):
+        """Take the advisory lock of a checksum
+
+        Uploads hold it until their transaction ends, while they look up,
+        move and register the file of a content. The garbage collection
+        holds it at session level, without waiting, from the deletion of a
+        blob until its file is removed.
+
+        :return: whether the lock was acquired
+        """
+        if session:
+            cr.execute(
+                'SELECT pg_try_advisory_lock(hashtext(%s), hashtext(%s))',
+                (CHECKSUM_LOCK, checksum))
+            return cr.fetchone()[0]
+        cr.execute(
+            'SELECT pg_advisory_xact_lock(hashtext(%s), hashtext(%s))',
+            (CHECKSUM_LOCK, checksum))
+        return True
+
+    def _unlock_checksum(self, cr, checksum):
+        cr.execute(
+            'SELECT pg_advisory_unlock(hashtext(%s), hashtext(%s))',
+            (CHECKSUM_LOCK, checksum))
+
+    def _store_file(self, cr, uid, data_file, mimetype, context=None):
+        """Stream a file object to the filestore and return its blob id
+
+        The file is copied chunk by chunk to a temporary file next to its
+        final location while being hashed, then moved under its checksum
+        unless the same content is already stored."""
+        tmp_dir = self._full_path(cr, uid, 'letter_scan/tmp')
+        if not os.path.isdir(tmp_dir):
+            os.makedirs(tmp_dir)
+        checksum = hashlib.sha1()
+        file_size = 0
+        handle, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                chunk = data_file.read(CHUNK_SIZE)
+                while chunk:
+                    checksum.update(chunk)
+                    file_size += len(chunk)
+                    tmp_file.write(chunk)
+                    chunk = data_file.read(CHUNK_SIZE)
+            checksum = checksum.hexdigest()
+            self._lock_checksum(cr, checksum)
+            blob_ids = self.search(
+                cr, SUPERUSER_ID, [('checksum', '=', checksum)],
+                context=context)
+            if blob_ids:
+                return blob_ids[0]
+            store_fname = 'letter_scan/%s/%s' % (checksum[:2], checksum)
+            full_path = self._full_path(cr, uid, store_fname)
+            if not os.path.isdir(os.path.dirname(full_path)):
+                os.makedirs(os.path.dirname(full_path))
+            os.rename(tmp_path, full_path)
+            tmp_path = None
+            try:
+                with cr.savepoint():
+                    return self.create(cr, SUPERUSER_ID, {
+                        'checksum': checksum,
+                        'store_fname': store_fname,
+                        'file_size': file_size,
+                        'mimetype': mimetype,
+                    }, context=context)
+            except Exception:
+                # the same content was stored concurrently
+                blob_ids = self.search(
+                    cr, SUPERUSER_ID, [('checksum', '=', checksum)],
+                    context=context)
+                if not blob_ids:
+                    raise
+                return blob_ids[0]
+        finally:
+            if tmp_path:
+                os.unlink(tmp_path)
+
+    def open_file(self, cr, uid, blob_id, context=None):
+        """Return the stored file of a blob, opened for reading"""
+        blob = self.browse(cr, uid, blob_id, context=context)
+        return open(self._full_path(cr, uid, blob.store_fname), 'rb')
+
+    def generate_thumbnails(self, cr, uid, batch_size=100, workers=None,
+                            commit=False, context=None):
+        """Render the pending thumbnails in a pool of worker threads
+
+        The worker threads only read files and render images, the results
+        are written back by the calling thread after each batch.
+
+        :param workers: number of threads, by default the
+                        lettermgmt.thumbnail_workers system parameter
+        :param commit: commit after each batch, for scheduled runs
+        :return: number of rendered thumbnails
+        """
+        if workers is None:
+            workers = int(self.pool.get('ir.config_parameter').get_param(
+                cr, SUPERUSER_ID, 'lettermgmt.thumbnail_workers',
+                THUMBNAIL_WORKERS, context=context))
+        pool = ThreadPool(max(workers, 1))
+        total = 0
+        try:
+            while True:
+                cr.execute(
+                    'SELECT id, store_fname, mimetype FROM letter_scan_blob '
+                    "WHERE thumbnail_state = 'pending' ORDER BY id LIMIT %s",
+                    (batch_size,))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                jobs = [(blob_id, self._full_path(cr, uid, store_fname),
+                         mimetype) for blob_id, store_fname, mimetype in rows]
+                for blob_id, thumbnail in pool.imap_unordered(
+                        _render_job, jobs):
+                    if thumbnail:
+                        self.write(cr, SUPERUSER_ID, [blob_id], {
+                            'thumbnail': base64.b64encode(thumbnail),
+                            'thumbnail_state': 'done',
+                        }, context=context)
+                        total += 1
+                    else:
+                        self.write(cr, SUPERUSER_ID, [blob_id], {
+                            'thumbnail_state': 'failed',
+                        }, context=context)
+                if commit:
+                    cr.commit()
+                _logger.info('Rendered %d letter scan thumbnails', total)
+        finally:
+            pool.close()
+        return total
+
+    def _collect_garbage(self, cr, uid, context=None):
+        """Delete the blobs no scan refers to anymore, and their files
+
+        Files are only removed once the deletion is committed, so a rolled
+        back transaction never loses content. The checksum of each blob is
+        locked from its deletion until its file is removed, so an upload of
+        the same content waits instead of registering a file about to be
+        removed; blobs being uploaded are left for the next run."""
+        cr.execute(
+            'SELECT id, checksum, store_fname FROM letter_scan_blob blob '
+            'WHERE NOT EXISTS ('
+            '    SELECT 1 FROM letter_scan scan WHERE scan.blob_id = blob.id)')
+        rows = [row for row in cr.fetchall()
+                if self._lock_checksum(cr, row[1], session=True)]
+        try:
+            if rows:
+                # scans may have been added before the locks were taken
+                cr.execute(
+                    'SELECT id FROM letter_scan_blob blob '
+                    'WHERE id IN %s AND NOT EXISTS ('
+                    '    SELECT 1 FROM letter_scan scan '
+                    '    WHERE scan.blob_id = blob.id)',
+                    (tuple(row[0] for row in rows),))
+                orphan_ids = set(row[0] for row in cr.fetchall())
+                self.unlink(cr, SUPERUSER_ID, list(orphan_ids),
+                            context=context)
+                cr.commit()
+                for blob_id, checksum, store_fname in rows:
+                    if blob_id not in orphan_ids:
+                        continue
+                    try:
+                        os.unlink(self._full_path(cr, uid, store_fname))
+                    except OSError:
+                        _logger.warning('Cannot remove %s', store_fname)
+                return len(orphan_ids)
+            return 0
+        finally:
+            for blob_id, checksum, store_fname in rows:
+                self._unlock_checksum(cr, checksum)
+
+    def _sweep_files(self, cr, uid, context=None):
+        """Remove the stored files no blob refers to
+
+        Such files are left by uploads whose transaction was rolled back
+        after their file was moved to the filestore, and by interrupted
+        uploads for temporary files. Files of uploads in progress are
+        skipped, as their checksum is locked.
+
+        :return: number of removed files
+        """
+        root = self._full_path(cr, uid, 'letter_scan')
+        if not os.path.isdir(root):
+            return 0
+        total = 0
+        tmp_dir = os.path.join(root, 'tmp')
+        if os.path.isdir(tmp_dir):
+            for name in os.listdir(tmp_dir):
+                path = os.path.join(tmp_dir, name)
+                if os.path.getmtime(path) < time.time() - TMP_FILE_AGE:
+                    os.unlink(path)
+                    total += 1
+        for directory in sorted(os.listdir(root)):
+            if len(directory) != 2:
+                continue
+            checksums = os.listdir(os.path.join(root, directory))
+            if not checksums:
+                continue
+            cr.execute(
+                'SELECT checksum FROM letter_scan_blob WHERE checksum IN %s',
+                (tuple(checksums),))
+            stored = set(row[0] for row in cr.fetchall())
+            for checksum in set(checksums) - stored:
+                if not self._lock_checksum(cr, checksum, session=True):
+                    continue
+                try:
+                    cr.execute(
+                        'SELECT 1 FROM letter_scan_blob WHERE checksum = %s',
+                        (checksum,))
+                    if not cr.fetchone():
+                        os.unlink(os.path.join(root, directory, checksum))
+                        total += 1
+                finally:
+                    self._unlock_checksum(cr, checksum)
+        _logger.info('Removed %d unused letter scan files', total)
+        return total
+
+    def _cron_process_scans(self, cr, uid, context=None):
+        self._collect_garbage(cr, uid, context=context)
+        return self.generate_thumbnails(cr, uid, commit=True, context=context)
+
+    def _cron_sweep_files(self, cr, uid, context=None):
+        return self._sweep_files(cr, uid, context=context)
+
+
+class letter_scan(orm.Model):
+    """Scanned document of a letter"""
+    _name = 'letter.scan'
+    _description = 'Letter Scan'
+    _order = 'id desc'
+    _columns = {
+        'name': fields.char('Filename', required=True),
+        'letter_id': fields.many2one(
+            'res.letter', 'Letter', select=True, ondelete='cascade'),
+        'archive_letter_id': fields.many2one(
+            'res.letter.archive', 'Archived Letter', select=True,
+            ondelete='cascade'),
+        'blob_id': fields.many2one(
+            'letter.scan.blob', 'Content', required=True, readonly=True,
+            select=True, ondelete='restrict'),
+        'file_size': fields.related(
+            'blob_id', 'file_size', type='integer', string='File Size',
+            readonly=True),
+        'mimetype': fields.related(
+            'blob_id', 'mimetype', type='char', string='Mime Type',
+            readonly=True),
+        'thumbnail': fields.related(
+            'blob_id', 'thumbnail', type='binary', string='Thumbnail',
+            readonly=True),
+        'thumbnail_state': fields.related(
+            'blob_id', 'thumbnail_state', type='selection',
+            selection=[('pending', 'Pending'), ('done', 'Done'),
+                       ('failed', 'Failed')],
+            string='Thumbnail State', readonly=True),
+        'create_date': fields.datetime('Uploaded on', readonly=True),
+        'create_uid': fields.many2one('res.users', 'Uploaded by',
+                                      readonly=True),
+    }
+
+    def add_scan(self, cr, uid, letter_id, data_file, filename,
+                 mimetype=None, context=None):
+        """Attach the content of a file object to a letter
+
+        The content is streamed to the filestore and shared with every
+        other scan of the same content. Uploading a content the letter
+        already has returns the existing scan.
+
+        :return: id of the scan
+        """
+        if not mimetype:
+            mimetype = (
+                filename.lower().endswith('.pdf') and 'application/pdf' or
+                'application/octet-stream')
+        self.pool.get('res.letter').check_access_rule(
+            cr, uid, [letter_id], 'write', context=context)
+        blob_id = self.pool.get('letter.scan.blob')._store_file(
+            cr, uid, data_file, mimetype, context=context)
+        scan_ids = self.search(
+            cr, uid, [('letter_id', '=', letter_id),
+                      ('blob_id', '=', blob_id)], limit=1, context=context)
+        if scan_ids:
+            return scan_ids[0]
+        return self.create(cr, uid, {
+            'name': filename,
+            'letter_id': letter_id,
+            'blob_id': blob_id,
+        }, context=context)
+
+    def open_file(self, cr, uid, scan_id, context=None):
+        """Return the content of a scan, opened for reading"""
+        scan = self.browse(cr, uid, scan_id, context=context)
+        return self.pool.get('letter.scan.blob').open_file(
+            cr, SUPERUSER_ID, scan.blob_id.id, context=context)
+
+
+class res_letter(orm.Model):
+    _inherit = 'res.letter'
+    _columns = {
+        'scan_ids': fields.one2many('letter.scan', 'letter_id', 'Scans'),
+    }
+
+    def action_upload_scan(self, cr, uid, ids, context=None):
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/lettermgmt/scan/upload?letter_id=%d' % ids[0],
+            'target': 'self',
+        }
+
+
+class res_letter_archive(orm.Model):
+    _inherit = 'res.letter.archive'
+    _columns = {
+        'scan_ids': fields.one2many(
+            'letter.scan', 'archive_letter_id', 'Scans', readonly=True),
+    }
+
+    def _move_letters(self, cr, uid, letter_ids, context=None):
+        cr.execute(
+            'UPDATE letter_scan '
+            'SET archive_letter_id = letter_id, letter_id = NULL '
+            'WHERE letter_id IN %s', (tuple(letter_ids),))
+        return super(res_letter_archive, self)._move_letters(
+            cr, uid, letter_ids, context=context)
@@ -0,0 +1,276 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import math
+
+from openerp.osv import fields, orm
+
+from .res_letter import LETTER_STATES
+
+# States whose processing time is aggregated
+SLA_STATES = ('validated', 'rec', 'sent')
+# Durations are aggregated in buckets growing by 2 ** (1 / BUCKET_STEPS),
+# so percentiles are known within about 19%, from one minute on
+BUCKET_STEPS = 4
+BUCKET_UNIT = 60.0
+MAX_BUCKET = 120
+BUCKET_SQL = (
+    'LEAST(%d, GREATEST(0, ceil(%d * log(2, '
+    '(GREATEST(duration, %f) / %f)::numeric))))::integer' % (
+        MAX_BUCKET, BUCKET_STEPS, BUCKET_UNIT, BUCKET_UNIT))
+
+
+def bucket_upper_bound(bucket):
+    """Longest duration, in seconds, counted in a bucket"""
+    return BUCKET_UNIT * 2 ** (float(bucket) / BUCKET_STEPS)
+
+
+class letter_state_log(orm.Model):
+    """State transitions of letters
+
+    One compact row per transition, with the duration since the letter was
+    sent or received and the dimensions the SLA statistics are grouped by,
+    as they were at the time of the transition."""
+    _name = 'letter.state.log'
+    _description = 'Letter State Transition'
+    _log_access = False
+    _order = 'id desc'
+    _columns = {
+        'letter_id': fields.many2one(
+            'res.letter', 'Letter', readonly=True, select=True,
+            ondelete='cascade'),
+        'archive_letter_id': fields.many2one(
+            'res.letter.archive', 'Archived Letter', readonly=True,
+            select=True, ondelete='cascade'),
+        'state': fields.selection(
+            LETTER_STATES, 'State', readonly=True, required=True),
+        'date': fields.datetime('Date', readonly=True, required=True),
+        'user_id': fields.many2one('res.users', 'User', readonly=True),
+        'duration': fields.float(
+            'Duration', readonly=True,
+            help="Seconds since the letter was sent or received."),
+        'channel_id': fields.many2one(
+            'letter.channel', 'Channel', readonly=True),
+        'type_id': fields.many2one('letter.type', 'Type', readonly=True),
+    }
+
+    def _log(self, cr, uid, letter_ids, context=None):
+        """Log the current state of letters which just changed state"""
+        dimensions = self.pool.get('letter.sla.stat')._get_sla_dimensions()
+        cr.execute(
+            'INSERT INTO letter_state_log '
+            '(letter_id, state, date, user_id, duration, %s) '
+            "SELECT id, state, now() AT TIME ZONE 'UTC', %%s, "
+            "GREATEST(0, EXTRACT(EPOCH FROM now() AT TIME ZONE 'UTC' - "
+            'snd_rec_date)), %s FROM res_letter WHERE id IN %%s '
+            'RETURNING id' % (
+                ', '.join(column for column, letter_column in dimensions),
+                ', '.join(
+                    letter_column for column, letter_column in dimensions)),
+            (uid, tuple(letter_ids)))
+        log_ids = [row[0] for row in cr.fetchall()]
+        self.pool.get('letter.sla.stat')._add_logs(cr, log_ids)
+        return log_ids
+
+
+class letter_sla_stat(orm.Model):
+    """Processing time of letters, aggregated by state and dimensions
+
+    Rows count the transitions to a state of SLA_STATES and sum their
+    durations by duration bucket, so means and percentiles of any grouping
+    are computed from a few rows. They are maintained incrementally from
+    the state transitions; concurrent transactions may add several rows
+    for the same key, which sums the same."""
+    _name = 'letter.sla.stat'
+    _description = 'Letter Processing Time Statistics'
+    _log_access = False
+    _rec_name = 'state'
+    _columns = {
+        'state': fields.selection(
+            LETTER_STATES, 'State', readonly=True, required=True,
+            select=True),
+        'bucket': fields.integer('Duration Bucket', readonly=True),
+        'channel_id': fields.many2one(
+            'letter.channel', 'Channel', readonly=True, select=True,
+            ondelete='cascade'),
+        'type_id': fields.many2one(
+            'letter.type', 'Type', readonly=True, select=True,
+            ondelete='cascade'),
+        'count': fields.integer('Letters', readonly=True),
+        'total_duration': fields.float(
+            'Total Duration', readonly=True, help="In seconds."),
+    }
+
+    def _get_sla_dimensions(self):
+        """Return (column, res_letter column) tuples of the dimensions
+
+        The columns must exist on both letter.state.log and this model."""
+        return [('channel_id', 'channel_id'), ('type_id', 'type')]
+
+    def _add_logs(self, cr, log_ids):
+        """Add the given state transitions to the statistics"""
+        if not log_ids:
+            return
+        columns = [column for column, letter_column
+                   in self._get_sla_dimensions()]
+        cr.execute(
+            'SELECT state, %s, %s, count(*), sum(duration) '
+            'FROM letter_state_log WHERE id IN %%s AND state IN %%s '
+            'AND duration IS NOT NULL GROUP BY 1, 2, %s' % (
+                BUCKET_SQL, ', '.join(columns),
+                ', '.join(str(i) for i in range(3, len(columns) + 3))),
+            (tuple(log_ids), SLA_STATES))
+        where = ' AND '.join(
+            ['state = %s', 'bucket = %s'] +
+            ['%s IS NOT DISTINCT FROM %%s' % column for column in columns])
+        for row in cr.fetchall():
+            key = row[:len(columns) + 2]
+            count, total = row[len(columns) + 2:]
+            cr.execute(
+                'UPDATE letter_sla_stat SET count = count + %%s, '
+                'total_duration = total_duration + %%s WHERE %s' % where,
+                (count, total) + tuple(key))
+            if not cr.rowcount:
+                cr.execute(
+                    'INSERT INTO letter_sla_stat (state, bucket, %s, count, '
+                    'total_duration) VALUES (%s)' % (
+                        ', '.join(columns), ', '.join(['%s'] * len(row))),
+                    row)
+
+    def rebuild(self, cr, uid, context=None):
+        """Recompute the statistics from the state transition log"""
+        columns = ', '.join(
+            column for column, letter_column in self._get_sla_dimensions())
+        cr.execute('DELETE FROM letter_sla_stat')
+        cr.execute(
+            'INSERT INTO letter_sla_stat (state, bucket, %s, count, '
+            'total_duration) '
+            'SELECT state, %s AS bucket, %s, count(*), sum(duration) '
+            'FROM letter_state_log WHERE state IN %%s '
+            'AND duration IS NOT NULL GROUP BY state, bucket, %s' % (
+                columns, BUCKET_SQL, columns, columns),
+            (SLA_STATES,))
+        return True
+
+    def get_sla_metrics(self, cr, uid, group_by=None, domain=None,
+                        percentile=95, context=None):
+        """Return the count, mean and percentile of processing times
+
+        :param group_by: dimension columns to group by, in addition to the
+                         state, like ['channel_id']
+        :param domain: domain on the statistics, like
+                       [('type_id', '=', type_id)]
+        :return: list of dicts with the state, the group_by values, count,
+                 mean and percentile durations in seconds. Percentiles are
+                 the upper bound of their duration bucket.
+        """
+        group_by = list(group_by or [])
+        dimensions = [column for column, letter_column
+                      in self._get_sla_dimensions()]
+        for column in group_by:
+            if column not in dimensions:
+                raise ValueError('Invalid group by %s' % column)
+        query = self._where_calc(cr, uid, domain or [], context=context)
+        self._apply_ir_rules(cr, uid, query, 'read', context=context)
+        from_clause, where_clause, where_params = query.get_sql()
+        keys = ['"letter_sla_stat".state'] + [
+            '"letter_sla_stat".%s' % column for column in group_by]
+        cr.execute(
+            'SELECT %s, "letter_sla_stat".bucket, '
+            'sum("letter_sla_stat".count), '
+            'sum("letter_sla_stat".total_duration) FROM %s %s '
+            'GROUP BY %s, "letter_sla_stat".bucket '
+            'ORDER BY %s, "letter_sla_stat".bucket' % (
+                ', '.join(keys), from_clause,
+                where_clause and 'WHERE %s' % where_clause or '',
+                ', '.join(keys), ', '.join(keys)),
+            where_params)
+        groups = []
+        for row in cr.fetchall():
+            key = row[:len(keys)]
+            bucket, count, total = row[len(keys):]
+            if not groups or groups[-1][0] != key:
+                groups.append((key, []))
+            groups[-1][1].append((bucket, count, total))
+        result = []
+        for key, buckets in groups:
+            count = sum(bucket[1] for bucket in buckets)
+            threshold = math.ceil(count * percentile / 100.0)
+            cumulated = 0
+            for bucket, bucket_count, total in buckets:
+                cumulated += bucket_count
+                if cumulated >= threshold:
+                    break
+            metrics = dict(zip(['state'] + group_by, key))
+            metrics.update({
+                'count': count,
+                'mean': sum(bucket[2] for bucket in buckets) / count,
+                'percentile': bucket_upper_bound(bucket),
+            })
+            result.append(metrics)
+        return result
+
+
+class res_letter(orm.Model):
+    _inherit = 'res.letter'
+
+    def _bulk_create(self, cr, uid, vals_list, context=None):
+        ids = super(res_letter, self)._bulk_create(
+            cr, uid, vals_list, context=context)
+        if ids:
+            self.pool.get('letter.state.log')._log(
+                cr, uid, ids, context=context)
+        return ids
+
+    def create(self, cr, uid, vals, context=None):
+        letter_id = super(res_letter, self).create(
+            cr, uid, vals, context=context)
+        self.pool.get('letter.state.log')._log(
+            cr, uid, [letter_id], context=context)
+        return letter_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        changed_ids = []
+        if vals.get('state') and ids:
+            cr.execute(
+                'SELECT id FROM res_letter '
+                'WHERE id IN %s AND state IS DISTINCT FROM %s',
+                (tuple(ids), vals['state']))
+            changed_ids = [row[0] for row in cr.fetchall()]
+        res = super(res_letter, self).write(
+            cr, uid, ids, vals, context=context)
+        if changed_ids:
+            self.pool.get('letter.state.log')._log(
+                cr, uid, changed_ids, context=context)
+        return res
+
+
+class res_letter_archive(orm.Model):
+    _inherit = 'res.letter.archive'
+
+    def _move_letters(self, cr, uid, letter_ids, context=None):
+        cr.execute(
+            'UPDATE letter_state_log '
+            'SET archive_letter_id = letter_id, letter_id = NULL '
+            'WHERE letter_id IN %s', (tuple(letter_ids),))
+        return super(res_letter_archive, self)._move_letters(
+            cr, uid, letter_ids, context=context)
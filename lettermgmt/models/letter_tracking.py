@@ -0,0 +1,199 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import functools
+import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+from openerp import SUPERUSER_ID
+from openerp.osv import fields, orm
+
+from .carrier_api import CARRIER_APIS
+
+_logger = logging.getLogger(__name__)
+
+# States of the letters whose tracking references are polled, letters in
+# any other state are either not shipped yet or in a final state
+POLL_STATES = ('validated', 'sent')
+# Default number of concurrent requests to carriers
+TRACKING_WORKERS = 8
+# Timeout in seconds of the requests of channels without one, so that a
+# carrier which never answers cannot block the polling
+TRACKING_TIMEOUT = 10
+
+
+def _fetch_state(api, row):
+    """Fetch the state of a (letter id, tracking reference, state) row
+
+    Runs in the polling threads. Returns the row with the new state, or
+    None on errors, and the latency in seconds."""
+    letter_id, track_ref, state = row
+    start = time.time()
+    try:
+        new_state = api.get_state(track_ref)
+        error = False
+    except Exception as e:
+        _logger.warning(
+            'Cannot poll tracking reference %s from %s: %s',
+            track_ref, api.url, e)
+        new_state = None
+        error = True
+    return letter_id, state, new_state, error, time.time() - start
+
+
+class letter_tracking_batch(orm.Model):
+    """Statistics of a batch of tracking references polled from a carrier"""
+    _name = 'letter.tracking.batch'
+    _description = 'Letter Tracking Batch'
+    _order = 'id desc'
+    _columns = {
+        'date': fields.datetime('Date', readonly=True, select=True),
+        'channel_id': fields.many2one(
+            'letter.channel', 'Channel', readonly=True, select=True,
+            ondelete='cascade'),
+        'size': fields.integer('Polled', readonly=True),
+        'updated_count': fields.integer('Updated', readonly=True),
+        'error_count': fields.integer('Errors', readonly=True),
+        'duration': fields.float(
+            'Duration', readonly=True, help="Duration of the batch, in "
+                                            "seconds."),
+        'latency_avg': fields.float(
+            'Average Latency', readonly=True,
+            help="Average duration of the requests, in seconds."),
+        'latency_max': fields.float(
+            'Maximum Latency', readonly=True,
+            help="Duration of the slowest request, in seconds."),
+    }
+    _defaults = {
+        'date': fields.datetime.now,
+    }
+
+
+class letter_tracking_poller(orm.AbstractModel):
+    """Update the state of shipped letters from their carriers
+
+    Letters of channels with a tracking API are polled by batches of
+    tracking references, with a bounded number of concurrent requests. The
+    polling threads only talk to the carrier, the states are written back
+    by state, in one write per batch and state."""
+    _name = 'letter.tracking.poller'
+    _description = 'Letter Tracking Poller'
+
+    def _get_batch_rows(self, cr, channel_id, last_id, batch_size):
+        cr.execute(
+            'SELECT id, track_ref, state FROM res_letter '
+            'WHERE channel_id = %s AND state IN %s AND id > %s '
+            "AND track_ref IS NOT NULL AND track_ref != '' "
+            'ORDER BY id LIMIT %s',
+            (channel_id, POLL_STATES, last_id, batch_size))
+        return cr.fetchall()
+
+    def _poll_batch(self, cr, uid, api, channel_id, rows, thread_pool,
+                    context=None):
+        """Poll a batch of rows, write the new states and log the batch
+
+        :return: id of the letter.tracking.batch
+        """
+        start = time.time()
+        results = thread_pool.map(functools.partial(_fetch_state, api), rows)
+        updates = {}
+        latencies = []
+        error_count = 0
+        for letter_id, state, new_state, error, latency in results:
+            latencies.append(latency)
+            error_count += error
+            if new_state and new_state != state:
+                updates.setdefault(new_state, []).append(letter_id)
+        letter_pool = self.pool.get('res.letter')
+        for new_state, letter_ids in updates.items():
+            letter_pool.write(
+                cr, uid, letter_ids, {'state': new_state}, context=context)
+        duration = time.time() - start
+        _logger.info(
+            'Polled %d tracking references of channel %d in %.2fs: '
+            '%d updated, %d errors', len(rows), channel_id, duration,
+            sum(len(letter_ids) for letter_ids in updates.values()),
+            error_count)
+        return self.pool.get('letter.tracking.batch').create(
+            cr, SUPERUSER_ID, {
+                'channel_id': channel_id,
+                'size': len(rows),
+                'updated_count': sum(
+                    len(letter_ids) for letter_ids in updates.values()),
+                'error_count': error_count,
+                'duration': duration,
+                'latency_avg': sum(latencies) / len(latencies),
+                'latency_max': max(latencies),
+            }, context=context)
+
+    def poll(self, cr, uid, channel_ids=None, batch_size=100, workers=None,
+             commit=False, context=None):
+        """Poll the tracking references of the letters in POLL_STATES
+
+        :param channel_ids: channels to poll, by default all the channels
+                            with a tracking API
+        :param workers: maximum number of concurrent requests, by default
+                        the lettermgmt.tracking_workers system parameter
+        :param commit: commit after each batch, for scheduled runs
+        :return: ids of the letter.tracking.batch records of the run
+        """
+        channel_pool = self.pool.get('letter.channel')
+        domain = [('tracking_api', '!=', False),
+                  ('tracking_url', '!=', False)]
+        if channel_ids is not None:
+            domain.append(('id', 'in', channel_ids))
+        if workers is None:
+            workers = int(self.pool.get('ir.config_parameter').get_param(
+                cr, SUPERUSER_ID, 'lettermgmt.tracking_workers',
+                TRACKING_WORKERS, context=context))
+        thread_pool = ThreadPool(max(workers, 1))
+        batch_ids = []
+        try:
+            for channel in channel_pool.browse(
+                    cr, uid, channel_pool.search(
+                        cr, uid, domain, context=context),
+                    context=context):
+                if channel.tracking_api not in CARRIER_APIS:
+                    _logger.warning(
+                        'Unknown tracking API %s of channel %s',
+                        channel.tracking_api, channel.name)
+                    continue
+                api = CARRIER_APIS[channel.tracking_api](
+                    channel.tracking_url,
+                    timeout=channel.tracking_timeout or TRACKING_TIMEOUT)
+                last_id = 0
+                while True:
+                    rows = self._get_batch_rows(
+                        cr, channel.id, last_id, batch_size)
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    batch_ids.append(self._poll_batch(
+                        cr, uid, api, channel.id, rows, thread_pool,
+                        context=context))
+                    if commit:
+                        cr.commit()
+        finally:
+            thread_pool.close()
+        return batch_ids
+
+    def _cron_poll_tracking(self, cr, uid, context=None):
+        return self.poll(cr, uid, commit=True, context=context)
@@ -21,14 +21,37 @@
 #    along with this program.  If not, see http://www.gnu.org/licenses/.
 #
 ##############################################################################
+import logging
+
 from openerp.osv import fields, orm
+from openerp.tools.translate import _
+
+_logger = logging.getLogger(__name__)
+
+LETTER_STATES = [
+    ('draft', 'Draft'),
+    ('created', 'Created'),
+    ('validated', 'Validated'),
+    ('rec', 'Received'),
+    ('sent', 'Sent'),
+    ('rec_bad', 'Received Damage'),
+    ('rec_ret', 'Received But Returned'),
+    ('cancel', 'Cancelled'),
+]
+
+# Reference fields matched by a scanned code, by order of precedence
+SCAN_FIELDS = ['number', 'track_ref', 'expeditor_ref', 'orig_ref']
+# Key of the advisory lock serializing the nested set allocations
+PARENT_STORE_LOCK = 'res_letter_parent_store'
 
 
 class res_letter(orm.Model):
     """A register class to log all movements regarding letters"""
     _name = 'res.letter'
     _description = "Log of Letter Movements"
-    _inherit = 'mail.thread'
+    _inherit = ['mail.thread', 'reference.index.mixin']
+    _parent_store = True
+    _reference_fields = ['number', 'track_ref']
 
     def _get_number(self, cr, uid, context=None):
         if context is None:
@@ -41,11 +64,11 @@ class res_letter(orm.Model):
     _columns = {
         'name': fields.text('Subject', help="Subject of letter."),
         'folder_id': fields.many2one(
-            'letter.folder', string='Folder',
+            'letter.folder', string='Folder', select=True,
             help='Folder which contains letter.'),
         'number': fields.char(
             'Number', help="Auto Generated Number of letter.",
-            required=True),
+            required=True, select=True),
         'move': fields.selection(
             [('in', 'IN'), ('out', 'OUT')], 'Move', readonly=True,
             help="Incoming or Outgoing Letter."),
@@ -58,31 +81,32 @@ class res_letter(orm.Model):
         'snd_rec_date': fields.datetime(
             'Sent / Received Date', help='Created Date of Letter Logging.'),
         'recipient_partner_id': fields.many2one(
-            'res.partner', string='Recipient', track_visibility='onchange'),
+            'res.partner', string='Recipient', track_visibility='onchange',
+            select=True),
         'sender_partner_id': fields.many2one(
-            'res.partner', string='Sender', track_visibility='onchange'),
+            'res.partner', string='Sender', track_visibility='onchange',
+            select=True),
         'note': fields.text('Note'),
-        'state': fields.selection([('draft', 'Draft'),
-                                   ('created', 'Created'),
-                                   ('validated', 'Validated'),
-                                   ('rec', 'Received'),
-                                   ('sent', 'Sent'),
-                                   ('rec_bad', 'Received Damage'),
-                                   ('rec_ret', 'Received But Returned'),
-                                   ('cancel', 'Cancelled')],
-                                  'State', readonly=True,
-                                  track_visibility='onchange'),
-        'parent_id': fields.many2one('res.letter', 'Parent'),
+        'state': fields.selection(
+            LETTER_STATES, 'State', readonly=True,
+            track_visibility='onchange'),
+        'parent_id': fields.many2one(
+            'res.letter', 'Parent', select=True),
+        'parent_left': fields.integer('Left Parent', select=True),
+        'parent_right': fields.integer('Right Parent', select=True),
         'child_line': fields.one2many(
             'res.letter', 'parent_id', 'Letter Lines'),
         'channel_id': fields.many2one(
             'letter.channel', 'Sent / Receive Source'),
         'orig_ref': fields.char(
-            'Original Reference', help="Reference Number at Origin."),
+            'Original Reference', help="Reference Number at Origin.",
+            select=True),
         'expeditor_ref': fields.char(
-            'Expeditor Reference', help="Reference Number used by Expeditor."),
+            'Expeditor Reference', help="Reference Number used by Expeditor.",
+            select=True),
         'track_ref': fields.char(
-            'Tracking Reference', help="Reference Number used for Tracking."),
+            'Tracking Reference', help="Reference Number used for Tracking.",
+            select=True),
         'weight': fields.float('Weight (in KG)'),
         'size': fields.char('Size'),
         'reassignment_ids': fields.one2many(
@@ -92,6 +116,83 @@ class res_letter(orm.Model):
             'res.partner', string='Recipients'),
     }
 
+    def _auto_init(self, cr, context=None):
+        res = super(res_letter, self)._auto_init(cr, context=context)
+        self._create_trigram_indexes(cr)
+        return res
+
+    def _create_trigram_indexes(self, cr):
+        """Create pg_trgm indexes for partial matches on the references
+
+        The extension may require a superuser to be created, in which case
+        partial matches fall back to sequential scans."""
+        cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not cr.fetchone():
+            try:
+                with cr.savepoint():
+                    cr.execute('CREATE EXTENSION pg_trgm')
+            except Exception:
+                _logger.warning(
+                    'Could not create the pg_trgm extension, partial '
+                    'letter reference searches will not be indexed.')
+                return
+        for field in SCAN_FIELDS:
+            index = 'res_letter_%s_trgm_index' % field
+            cr.execute(
+                'SELECT 1 FROM pg_indexes WHERE indexname = %s', (index,))
+            if not cr.fetchone():
+                cr.execute(
+                    'CREATE INDEX %s ON res_letter '
+                    'USING gin (%s gin_trgm_ops)' % (index, field))
+
+    def _match_codes(self, cr, uid, model, codes, context=None):
+        """Match codes against the references of the records of model
+
+        :return: dict mapping the matched codes to the id of a record the
+                 user can read
+        """
+        model_pool = self.pool.get(model)
+        cr.execute(
+            'SELECT id, %s FROM %s WHERE %s ORDER BY id' % (
+                ', '.join(SCAN_FIELDS), model_pool._table,
+                ' OR '.join('%s IN %%s' % field for field in SCAN_FIELDS)),
+            [codes] * len(SCAN_FIELDS))
+        rows = cr.fetchall()
+        allowed_ids = set(model_pool.search(
+            cr, uid, [('id', 'in', [row[0] for row in rows])],
+            context=context))
+        result = {}
+        for position in reversed(range(len(SCAN_FIELDS))):
+            for row in rows:
+                if row[0] in allowed_ids and row[position + 1] in codes:
+                    result[row[position + 1]] = row[0]
+        return result
+
+    def scan(self, cr, uid, codes, context=None):
+        """Resolve scanned codes to letters
+
+        Codes are matched exactly against the number, tracking, expeditor
+        and original references, in that order of precedence, with a single
+        query on their indexes whatever the number of codes.
+
+        :param codes: list of scanned codes
+        :return: dict mapping each code to a letter id, or False
+        """
+        codes = [code.strip() for code in codes if code and code.strip()]
+        result = dict.fromkeys(codes, False)
+        if not codes:
+            return result
+        result.update(self._match_codes(
+            cr, uid, self._name, tuple(set(codes)), context=context))
+        return result
+
+    def search_reference(self, cr, uid, code, limit=10, context=None):
+        """Return ids of letters whose references contain code, served
+        by the trigram indexes"""
+        domain = ['|'] * (len(SCAN_FIELDS) - 1) + [
+            (field, 'ilike', code) for field in SCAN_FIELDS]
+        return self.search(cr, uid, domain, limit=limit, context=context)
+
     _defaults = {
         'number': _get_number,
         'snd_rec_date': fields.datetime.now,
@@ -99,6 +200,188 @@ class res_letter(orm.Model):
         'state': 'draft',
     }
 
+    def _reserve_numbers(self, cr, uid, move, count, context=None):
+        """Reserve count numbers of the move's sequence in one round trip
+
+        Returns the list of formatted numbers, in allocation order."""
+        if not count:
+            return []
+        sequence_pool = self.pool.get('ir.sequence')
+        code = '%s.letter' % move
+        company_ids = self.pool.get('res.company').search(
+            cr, uid, [], context=context) + [False]
+        sequence_ids = sequence_pool.search(
+            cr, uid,
+            [('code', '=', code), ('company_id', 'in', company_ids)],
+            context=context)
+        if not sequence_ids:
+            return [False] * count
+        sequence = sequence_pool.browse(
+            cr, uid, sequence_ids[0], context=context)
+        if sequence.implementation == 'standard':
+            cr.execute(
+                "SELECT nextval('ir_sequence_%03d') "
+                "FROM generate_series(1, %%s)" % sequence.id, (count,))
+            numbers = [row[0] for row in cr.fetchall()]
+        else:
+            cr.execute(
+                "UPDATE ir_sequence "
+                "SET number_next = number_next + number_increment * %s "
+                "WHERE id = %s RETURNING number_next, number_increment",
+                (count, sequence.id))
+            number_end, increment = cr.fetchone()
+            first = number_end - increment * count
+            numbers = range(first, number_end, increment)
+            sequence_pool.invalidate_cache(
+                cr, uid, ['number_next'], [sequence.id], context=context)
+        interpolation = sequence_pool._interpolation_dict()
+        prefix = sequence_pool._interpolate(sequence.prefix, interpolation)
+        suffix = sequence_pool._interpolate(sequence.suffix, interpolation)
+        number_format = '%%0%sd' % sequence.padding
+        return [prefix + number_format % number + suffix
+                for number in numbers]
+
+    def _lock_parent_store(self, cr):
+        """Serialize the transactions allocating nested set intervals
+
+        Both the ORM and _bulk_create read the right end of the set before
+        appending to it, so two concurrent transactions would otherwise
+        get overlapping intervals."""
+        cr.execute(
+            'SELECT pg_advisory_xact_lock(hashtext(%s))', (PARENT_STORE_LOCK,))
+
+    def _bulk_create(self, cr, uid, vals_list, context=None):
+        """Insert letters with a single multi-row INSERT
+
+        Only plain columns are written: no mail tracking, no followers and
+        no per-row sequence call. Missing numbers are reserved in one block
+        per move. The letters are appended as roots of the nested set, so
+        letters within a bundle have to be created one by one. Returns the
+        ids of the new letters in input order."""
+        if not vals_list:
+            return []
+        if any(vals.get('parent_id') for vals in vals_list):
+            raise orm.except_orm(
+                _('Error'),
+                _('Letters within a bundle cannot be created in bulk.'))
+        vals_list = [dict(vals) for vals in vals_list]
+        now = fields.datetime.now()
+        defaults = {
+            'move': 'in',
+            'state': 'draft',
+            'snd_rec_date': now,
+        }
+        for vals in vals_list:
+            for name, value in defaults.items():
+                if not vals.get(name):
+                    vals[name] = value
+        for move in set(vals['move'] for vals in vals_list):
+            todo = [vals for vals in vals_list
+                    if vals['move'] == move and not vals.get('number')]
+            numbers = self._reserve_numbers(
+                cr, uid, move, len(todo), context=context)
+            for vals, number in zip(todo, numbers):
+                vals['number'] = number
+        columns = sorted(set(
+            name for vals in vals_list for name in vals
+            if name in self._columns and
+            self._columns[name]._classic_write))
+        # new roots are appended at the right of the nested set
+        self._lock_parent_store(cr)
+        cr.execute('SELECT MAX(parent_right) FROM res_letter')
+        parent_right = cr.fetchone()[0] or 0
+        row_format = '(%s)' % ', '.join(['%s'] * (len(columns) + 6))
+        params = []
+        for vals in vals_list:
+            params.extend(vals.get(name) for name in columns)
+            params.extend([parent_right + 1, parent_right + 2])
+            params.extend([uid, now, uid, now])
+            parent_right += 2
+        cr.execute(
+            'INSERT INTO res_letter (%s, parent_left, parent_right, '
+            'create_uid, create_date, write_uid, write_date) '
+            'VALUES %s RETURNING id' % (
+                ', '.join('"%s"' % name for name in columns),
+                ', '.join([row_format] * len(vals_list))),
+            params)
+        ids = [row[0] for row in cr.fetchall()]
+        self.pool.get('letter.folder.counter')._update(cr, ids, 1)
+        self._update_reference_index(cr, uid, ids, context=context)
+        return ids
+
+    def create(self, cr, uid, vals, context=None):
+        self._lock_parent_store(cr)
+        letter_id = super(res_letter, self).create(
+            cr, uid, vals, context=context)
+        self.pool.get('letter.folder.counter')._update(cr, [letter_id], 1)
+        return letter_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        counter_pool = self.pool.get('letter.folder.counter')
+        counted = bool(set(vals) & set(['folder_id', 'move', 'state']))
+        if 'parent_id' in vals:
+            self._lock_parent_store(cr)
+        if counted:
+            counter_pool._update(cr, ids, -1)
+        res = super(res_letter, self).write(
+            cr, uid, ids, vals, context=context)
+        if counted:
+            counter_pool._update(cr, ids, 1)
+        return res
+
+    def unlink(self, cr, uid, ids, context=None):
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        self.pool.get('letter.folder.counter')._update(cr, ids, -1)
+        return super(res_letter, self).unlink(cr, uid, ids, context=context)
+
+    def get_bundle_letter_ids(self, cr, uid, ids, context=None):
+        """Return the ids of the given letters and all their descendants
+
+        child_of is served by the parent_left/parent_right nested set, so
+        this is a single range query whatever the depth of the bundles."""
+        if not ids:
+            return []
+        return self.search(
+            cr, uid, [('id', 'child_of', ids)], order='parent_left',
+            context=context)
+
+    def get_parent_letter_ids(self, cr, uid, ids, context=None):
+        """Return the ids of the given letters and all their ancestors,
+        the counterpart of get_bundle_letter_ids (parent_of)"""
+        if not ids:
+            return []
+        cr.execute(
+            'SELECT DISTINCT parent.id, parent.parent_left '
+            'FROM res_letter child '
+            'JOIN res_letter parent '
+            'ON parent.parent_left <= child.parent_left '
+            'AND parent.parent_right > child.parent_left '
+            'WHERE child.id IN %s ORDER BY parent.parent_left',
+            (tuple(ids),))
+        return self.search(
+            cr, uid, [('id', 'in', [row[0] for row in cr.fetchall()])],
+            order='parent_left', context=context)
+
+    def action_view_bundle(self, cr, uid, ids, context=None):
+        """Open all letters of the bundles the given letters belong to"""
+        root_ids = self.search(
+            cr, uid,
+            [('id', 'in', self.get_parent_letter_ids(
+                cr, uid, ids, context=context)),
+             ('parent_id', '=', False)],
+            context=context)
+        return {
+            'name': _('Bundle'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'res.letter',
+            'view_type': 'form',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'child_of', root_ids)],
+        }
+
     def action_received(self, cr, uid, ids, context=None):
         """Put the state of the letter into Received"""
         for letter in self.browse(cr, uid, ids, context=context):
@@ -0,0 +1,304 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import logging
+from datetime import datetime, timedelta
+
+from openerp import SUPERUSER_ID
+from openerp.osv import fields, orm
+from openerp.tools import DEFAULT_SERVER_DATETIME_FORMAT
+
+from .res_letter import LETTER_STATES
+
+_logger = logging.getLogger(__name__)
+
+# Only letters in these states are moved to the archive
+ARCHIVE_STATES = ('rec', 'sent', 'rec_bad', 'rec_ret', 'cancel')
+# Default age, in days, of the letters to archive
+ARCHIVE_DAYS = 730
+
+
+class res_letter_archive(orm.Model):
+    """Letters moved out of res.letter once they are old and closed
+
+    The archive has the same fields as res.letter, so the same domains
+    search it, while the res_letter table only keeps the current letters.
+    Letters keep their id, their history and their followers, and
+    res.letter also searches and reads them when the include_archive
+    context key is set."""
+    _name = 'res.letter.archive'
+    _description = 'Archived Letter'
+    _inherit = 'mail.thread'
+    _order = 'snd_rec_date desc, id desc'
+    _columns = {
+        'name': fields.text('Subject', readonly=True),
+        'folder_id': fields.many2one(
+            'letter.folder', string='Folder', readonly=True, select=True),
+        'number': fields.char('Number', readonly=True, select=True),
+        'move': fields.selection(
+            [('in', 'IN'), ('out', 'OUT')], 'Move', readonly=True),
+        'type': fields.many2one('letter.type', 'Type', readonly=True),
+        'class': fields.many2one('letter.class', 'Class', readonly=True),
+        'date': fields.datetime('Letter Date', readonly=True),
+        'snd_rec_date': fields.datetime(
+            'Sent / Received Date', readonly=True, select=True),
+        'recipient_partner_id': fields.many2one(
+            'res.partner', string='Recipient', readonly=True, select=True),
+        'sender_partner_id': fields.many2one(
+            'res.partner', string='Sender', readonly=True, select=True),
+        'note': fields.text('Note', readonly=True),
+        'state': fields.selection(LETTER_STATES, 'State', readonly=True),
+        'parent_id': fields.many2one(
+            'res.letter.archive', 'Parent', readonly=True, select=True,
+            ondelete='cascade'),
+        'child_line': fields.one2many(
+            'res.letter.archive', 'parent_id', 'Letter Lines',
+            readonly=True),
+        'channel_id': fields.many2one(
+            'letter.channel', 'Sent / Receive Source', readonly=True),
+        'orig_ref': fields.char(
+            'Original Reference', readonly=True, select=True),
+        'expeditor_ref': fields.char(
+            'Expeditor Reference', readonly=True, select=True),
+        'track_ref': fields.char(
+            'Tracking Reference', readonly=True, select=True),
+        'weight': fields.float('Weight (in KG)', readonly=True),
+        'size': fields.char('Size', readonly=True),
+        'reassignment_ids': fields.one2many(
+            'letter.reassignment', 'archive_letter_id',
+            string='Reassignment lines', readonly=True),
+        'extern_partner_ids': fields.many2many(
+            'res.partner', 'res_letter_archive_res_partner_rel',
+            'letter_id', 'partner_id', string='Recipients', readonly=True),
+        'archive_date': fields.datetime('Archived On', readonly=True),
+    }
+
+    def _get_cutoff(self, cr, uid, context=None):
+        days = self.pool.get('ir.config_parameter').get_param(
+            cr, uid, 'lettermgmt.archive_days', default=ARCHIVE_DAYS,
+            context=context)
+        return (datetime.now() - timedelta(days=int(days))).strftime(
+            DEFAULT_SERVER_DATETIME_FORMAT)
+
+    def _get_root_ids(self, cr, cutoff, limit):
+        """Return bundle roots whose whole bundle can be archived"""
+        cr.execute(
+            'SELECT root.id FROM res_letter root '
+            'WHERE root.parent_id IS NULL AND root.snd_rec_date < %s '
+            'AND root.state IN %s AND NOT EXISTS ('
+            '    SELECT 1 FROM res_letter child '
+            '    WHERE child.parent_left > root.parent_left '
+            '    AND child.parent_left < root.parent_right '
+            '    AND (child.state NOT IN %s OR child.snd_rec_date >= %s)) '
+            'ORDER BY root.id LIMIT %s',
+            (cutoff, ARCHIVE_STATES, ARCHIVE_STATES, cutoff, limit))
+        return [row[0] for row in cr.fetchall()]
+
+    def _get_moved_columns(self, cr):
+        """Columns of res_letter copied as they are to the archive"""
+        letter_pool = self.pool.get('res.letter')
+        return [name for name, column in letter_pool._columns.items()
+                if column._classic_write and name in self._columns]
+
+    def _move_letters(self, cr, uid, letter_ids, context=None):
+        """Move letters, their relations and their history to the archive"""
+        letter_pool = self.pool.get('res.letter')
+        ids = tuple(letter_ids)
+        columns = ', '.join(
+            '"%s"' % name for name in self._get_moved_columns(cr))
+        cr.execute(
+            'INSERT INTO res_letter_archive (id, %s, archive_date, '
+            'create_uid, create_date, write_uid, write_date) '
+            "SELECT id, %s, now() AT TIME ZONE 'UTC', "
+            'create_uid, create_date, write_uid, write_date '
+            'FROM res_letter WHERE id IN %%s' % (columns, columns), (ids,))
+        for name, column in letter_pool._columns.items():
+            if column._type != 'many2many' or name not in self._columns:
+                continue
+            relation, id1, id2 = column._sql_names(letter_pool)
+            archive_relation, archive_id1, archive_id2 = \
+                self._columns[name]._sql_names(self)
+            cr.execute(
+                'INSERT INTO %s (%s, %s) SELECT %s, %s FROM %s '
+                'WHERE %s IN %%s' % (
+                    archive_relation, archive_id1, archive_id2,
+                    id1, id2, relation, id1), (ids,))
+        cr.execute(
+            'UPDATE letter_reassignment '
+            'SET archive_letter_id = letter_id, letter_id = NULL '
+            'WHERE letter_id IN %s', (ids,))
+        for table, column in [('mail_message', 'model'),
+                              ('mail_followers', 'res_model'),
+                              ('ir_attachment', 'res_model')]:
+            cr.execute(
+                'UPDATE %s SET %s = %%s WHERE %s = %%s AND res_id IN %%s' % (
+                    table, column, column),
+                (self._name, letter_pool._name, ids))
+        cr.execute(
+            'UPDATE reference_index SET res_model = %s '
+            'WHERE res_model = %s AND res_id IN %s',
+            (self._name, letter_pool._name, ids))
+        self.pool.get('letter.folder.counter')._update(cr, ids, -1)
+        cr.execute('DELETE FROM res_letter WHERE id IN %s', (ids,))
+        letter_pool.invalidate_cache(cr, uid, ids=list(ids), context=context)
+
+    def archive_letters(self, cr, uid, cutoff=None, batch_size=1000,
+                        commit=False, context=None):
+        """Move closed letters older than cutoff to the archive
+
+        Whole bundles are moved at once, and only when all of their letters
+        are closed and older than the cutoff.
+
+        :param cutoff: snd_rec_date limit, by default the age set in the
+                       lettermgmt.archive_days system parameter
+        :param commit: commit after each batch, for scheduled runs
+        :raise AccessError: if the user may not create archived letters
+                            or delete letters
+        :return: number of archived letters
+        """
+        self.check_access_rights(cr, uid, 'create')
+        self.pool.get('res.letter').check_access_rights(cr, uid, 'unlink')
+        if cutoff is None:
+            cutoff = self._get_cutoff(cr, uid, context=context)
+        letter_pool = self.pool.get('res.letter')
+        total = 0
+        while True:
+            root_ids = self._get_root_ids(cr, cutoff, batch_size)
+            if not root_ids:
+                break
+            letter_ids = letter_pool.get_bundle_letter_ids(
+                cr, SUPERUSER_ID, root_ids, context=context)
+            self._move_letters(cr, uid, letter_ids, context=context)
+            total += len(letter_ids)
+            if commit:
+                cr.commit()
+            _logger.info('Archived %d letters older than %s', total, cutoff)
+        return total
+
+    def _cron_archive_letters(self, cr, uid, context=None):
+        return self.archive_letters(cr, uid, commit=True, context=context)
+
+
+class res_letter(orm.Model):
+    """Search and read archived letters through res.letter
+
+    With the include_archive context key, searches return the matching
+    archived letters after the current ones, and reads of archived ids are
+    served by res.letter.archive. Archived letters keep their id, so the
+    ids of both tables never collide."""
+    _inherit = 'res.letter'
+
+    def _archive_searchable(self, cr, uid, domain, context=None):
+        """Whether the archive is to be searched with domain as well"""
+        if not (context or {}).get('include_archive'):
+            return False
+        archive_fields = self.pool.get('res.letter.archive')._fields
+        for leaf in domain or []:
+            if isinstance(leaf, (list, tuple)) and len(leaf) == 3:
+                field_name = leaf[0].split('.')[0]
+                if field_name != 'id' and field_name not in archive_fields:
+                    return False
+        return True
+
+    def _get_archive_order(self, order):
+        """Order of the archive search matching order, if it can"""
+        if not order:
+            return None
+        archive_fields = self.pool.get('res.letter.archive')._fields
+        for part in order.split(','):
+            field_name = part.strip().split(' ')[0].strip('"')
+            if field_name != 'id' and field_name not in archive_fields:
+                return None
+        return order
+
+    def _search(self, cr, uid, args, offset=0, limit=None, order=None,
+                context=None, count=False, access_rights_uid=None):
+        res = super(res_letter, self)._search(
+            cr, uid, args, offset=offset, limit=limit, order=order,
+            context=context, count=count,
+            access_rights_uid=access_rights_uid)
+        if not self._archive_searchable(cr, uid, args, context=context):
+            return res
+        archive_pool = self.pool.get('res.letter.archive')
+        if count:
+            return res + archive_pool._search(
+                cr, uid, args, context=context, count=True,
+                access_rights_uid=access_rights_uid)
+        if limit and len(res) >= limit:
+            return res
+        # current letters come first, the archive continues their pages
+        if res or not offset:
+            current_count = offset + len(res)
+        else:
+            current_count = super(res_letter, self)._search(
+                cr, uid, args, context=context, count=True,
+                access_rights_uid=access_rights_uid)
+        return res + archive_pool._search(
+            cr, uid, args, offset=max(offset - current_count, 0),
+            limit=limit and limit - len(res),
+            order=self._get_archive_order(order), context=context,
+            access_rights_uid=access_rights_uid)
+
+    def scan(self, cr, uid, codes, context=None):
+        result = super(res_letter, self).scan(
+            cr, uid, codes, context=context)
+        missing = tuple(code for code, letter_id in result.items()
+                        if not letter_id)
+        if missing and (context or {}).get('include_archive'):
+            result.update(self._match_codes(
+                cr, uid, 'res.letter.archive', missing, context=context))
+        return result
+
+    def read(self, cr, uid, ids, fields=None, context=None,
+             load='_classic_read'):
+        if not (context or {}).get('include_archive'):
+            return super(res_letter, self).read(
+                cr, uid, ids, fields=fields, context=context, load=load)
+        single = not isinstance(ids, (list, tuple))
+        ids = [ids] if single else list(ids)
+        archived_ids = set()
+        if ids:
+            cr.execute(
+                'SELECT id FROM res_letter_archive WHERE id IN %s',
+                (tuple(ids),))
+            archived_ids = set(row[0] for row in cr.fetchall())
+        current_ids = [
+            letter_id for letter_id in ids if letter_id not in archived_ids]
+        result = super(res_letter, self).read(
+            cr, uid, current_ids, fields=fields, context=context, load=load)
+        if archived_ids:
+            archive_pool = self.pool.get('res.letter.archive')
+            archive_fields = None
+            if fields:
+                archive_fields = [
+                    name for name in fields
+                    if name in archive_pool._fields] or ['id']
+            for record in archive_pool.read(
+                    cr, uid, list(archived_ids), archive_fields,
+                    context=context, load=load):
+                for name in fields or []:
+                    record.setdefault(name, False)
+                result.append(record)
+        records = dict((record['id'], record) for record in result)
+        result = [records[letter_id] for letter_id in ids
+                  if letter_id in records]
+        if single:
+            return result and result[0] or False
+        return result
@@ -0,0 +1,236 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from openerp import SUPERUSER_ID
+from openerp.osv import fields, orm
+from openerp.tools.translate import _
+
+# Fields of res.letter the full-text vector is built from
+FULLTEXT_FIELDS = [
+    'name', 'note', 'orig_ref', 'sender_partner_id', 'recipient_partner_id',
+]
+# Default text search configuration, see lettermgmt.search_config
+SEARCH_CONFIG = 'simple'
+
+
+class res_letter(orm.Model):
+    """Full-text search over the subject, note, original reference and
+    partner names of letters
+
+    The search_vector tsvector column is maintained on write and indexed
+    with GIN, using the text search configuration of the
+    lettermgmt.search_config system parameter (english, french, ...)."""
+    _inherit = 'res.letter'
+
+    def _search_text_domain(self, cr, uid, table, args, context=None):
+        """Domain matching the search_text args on the vectors of table"""
+        result = []
+        for field_name, operator, value in args:
+            if not value:
+                continue
+            query = (
+                'SELECT id FROM %s WHERE search_vector @@ '
+                'plainto_tsquery(%%s::regconfig, %%s)' % table)
+            params = (self._get_search_config(cr, uid, context=context),
+                      value)
+            if operator in ('not ilike', '!=', 'not like'):
+                result.append(('id', 'not inselect', (query, params)))
+            else:
+                result.append(('id', 'inselect', (query, params)))
+        return result
+
+    def _search_text(self, cr, uid, obj, name, args, context=None):
+        return self._search_text_domain(
+            cr, uid, self._table, args, context=context)
+
+    def _get_search_text(self, cr, uid, ids, field_name, arg,
+                         context=None):
+        return dict.fromkeys(ids, False)
+
+    _columns = {
+        'search_text': fields.function(
+            _get_search_text, fnct_search=_search_text, type='char',
+            string='Text',
+            help='Full-text search on subject, note, original reference '
+                 'and partners.'),
+    }
+
+    def _get_search_config(self, cr, uid, context=None):
+        return self.pool.get('ir.config_parameter').get_param(
+            cr, uid, 'lettermgmt.search_config', default=SEARCH_CONFIG,
+            context=context)
+
+    def _auto_init(self, cr, context=None):
+        res = super(res_letter, self)._auto_init(cr, context=context)
+        self._add_search_vector(cr, self._table)
+        return res
+
+    def _add_search_vector(self, cr, table):
+        """Add the indexed search_vector column to table if missing"""
+        cr.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = 'search_vector'",
+            (table,))
+        if not cr.fetchone():
+            cr.execute(
+                'ALTER TABLE %s ADD COLUMN search_vector tsvector' % table)
+            cr.execute(
+                'CREATE INDEX %s_search_vector_index '
+                'ON %s USING gin (search_vector)' % (table, table))
+            self._update_search_vector(cr, None, table=table)
+
+    def _update_search_vector(self, cr, ids, table='res_letter'):
+        """Recompute the vector of the given letters, or of all letters"""
+        if ids is not None and not ids:
+            return
+        config = self._get_search_config(cr, SUPERUSER_ID)
+        query = (
+            'UPDATE ' + table + ' letter SET search_vector = '
+            "setweight(to_tsvector(%s::regconfig, "
+            "coalesce(letter.name, '')), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, "
+            "coalesce(letter.orig_ref, '') || ' ' || "
+            "coalesce(sender.name, '') || ' ' || "
+            "coalesce(recipient.name, '')), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, "
+            "coalesce(letter.note, '')), 'C') "
+            'FROM ' + table + ' source '
+            'LEFT JOIN res_partner sender '
+            'ON sender.id = source.sender_partner_id '
+            'LEFT JOIN res_partner recipient '
+            'ON recipient.id = source.recipient_partner_id '
+            'WHERE source.id = letter.id')
+        params = [config] * 3
+        if ids is not None:
+            query += ' AND letter.id IN %s'
+            params.append(tuple(ids))
+        cr.execute(query, params)
+
+    def rebuild_search_vectors(self, cr, uid, context=None):
+        """Recompute all vectors, after a change of search configuration"""
+        self._update_search_vector(cr, None)
+        self._update_search_vector(cr, None, table='res_letter_archive')
+        return True
+
+    def _bulk_create(self, cr, uid, vals_list, context=None):
+        ids = super(res_letter, self)._bulk_create(
+            cr, uid, vals_list, context=context)
+        self._update_search_vector(cr, ids)
+        return ids
+
+    def create(self, cr, uid, vals, context=None):
+        letter_id = super(res_letter, self).create(
+            cr, uid, vals, context=context)
+        self._update_search_vector(cr, [letter_id])
+        return letter_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        res = super(res_letter, self).write(
+            cr, uid, ids, vals, context=context)
+        if set(vals) & set(FULLTEXT_FIELDS):
+            if not isinstance(ids, (list, tuple)):
+                ids = [ids]
+            self._update_search_vector(cr, ids)
+        return res
+
+    def _search_fulltext_model(self, cr, uid, model, text, domain, limit,
+                               context=None):
+        model_pool = self.pool.get(model)
+        table = model_pool._table
+        query = model_pool._where_calc(
+            cr, uid, domain or [], context=context)
+        model_pool._apply_ir_rules(cr, uid, query, 'read', context=context)
+        from_clause, where_clause, where_params = query.get_sql()
+        config = self._get_search_config(cr, uid, context=context)
+        cr.execute(
+            'SELECT "%s".id, ts_rank("%s".search_vector, '
+            'plainto_tsquery(%%s::regconfig, %%s)) AS rank '
+            'FROM %s WHERE "%s".search_vector @@ '
+            'plainto_tsquery(%%s::regconfig, %%s) %s '
+            'ORDER BY rank DESC, "%s".id DESC LIMIT %%s' % (
+                table, table, from_clause, table,
+                where_clause and 'AND ' + where_clause or '', table),
+            [config, text, config, text] + where_params + [limit])
+        return cr.fetchall()
+
+    def search_fulltext(self, cr, uid, text, domain=None, offset=0,
+                        limit=80, context=None):
+        """Return letters matching text, best matches first
+
+        Archived letters are searched as well with the include_archive
+        context key.
+
+        :param domain: optional domain the letters must also match
+        :return: list of (id, rank) tuples
+        """
+        result = self._search_fulltext_model(
+            cr, uid, self._name, text, domain, offset + limit,
+            context=context)
+        if self._archive_searchable(cr, uid, domain, context=context):
+            result += self._search_fulltext_model(
+                cr, uid, 'res.letter.archive', text, domain, offset + limit,
+                context=context)
+            result.sort(key=lambda row: (row[1], row[0]), reverse=True)
+        return result[offset:offset + limit]
+
+    def action_search_fulltext(self, cr, uid, text, context=None):
+        """Open the best matches of a full-text search"""
+        return {
+            'name': _('Search Results'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'res.letter',
+            'view_type': 'form',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', [
+                letter_id for letter_id, rank in self.search_fulltext(
+                    cr, uid, text, context=context)])],
+        }
+
+
+class res_letter_archive(orm.Model):
+    """Full-text search over archived letters, whose vectors are moved
+    along with them"""
+    _inherit = 'res.letter.archive'
+
+    def _search_text(self, cr, uid, obj, name, args, context=None):
+        return self.pool.get('res.letter')._search_text_domain(
+            cr, uid, self._table, args, context=context)
+
+    def _get_search_text(self, cr, uid, ids, field_name, arg,
+                         context=None):
+        return dict.fromkeys(ids, False)
+
+    _columns = {
+        'search_text': fields.function(
+            _get_search_text, fnct_search=_search_text, type='char',
+            string='Text',
+            help='Full-text search on subject, note, original reference '
+                 'and partners.'),
+    }
+
+    def _auto_init(self, cr, context=None):
+        res = super(res_letter_archive, self)._auto_init(
+            cr, context=context)
+        self.pool.get('res.letter')._add_search_vector(cr, self._table)
+        return res
+
+    def _get_moved_columns(self, cr):
+        return super(res_letter_archive, self)._get_moved_columns(cr) + [
+            'search_vector']
@@ -0,0 +1,43 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from openerp.osv import orm
+
+
+class res_partner(orm.Model):
+    _inherit = 'res.partner'
+
+    def write(self, cr, uid, ids, vals, context=None):
+        res = super(res_partner, self).write(
+            cr, uid, ids, vals, context=context)
+        if 'name' in vals:
+            if not isinstance(ids, (list, tuple)):
+                ids = [ids]
+            # partner names are part of the letters' full-text vectors,
+            # both partner columns are indexed
+            letter_pool = self.pool.get('res.letter')
+            for table in ('res_letter', 'res_letter_archive'):
+                cr.execute(
+                    'SELECT id FROM %s WHERE sender_partner_id IN %%s '
+                    'OR recipient_partner_id IN %%s' % table,
+                    (tuple(ids), tuple(ids)))
+                letter_pool._update_search_vector(
+                    cr, [row[0] for row in cr.fetchall()], table=table)
+        return res
@@ -0,0 +1,289 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+
+from pyPdf import PdfFileReader, PdfFileWriter
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from openerp.osv import fields, orm
+from openerp.tools import DEFAULT_SERVER_DATETIME_FORMAT, find_in_path
+from openerp.tools.translate import _
+
+# Size of shipping labels, one per page
+LABEL_SIZE = (100 * mm, 60 * mm)
+# Columns of the daily register: (field, title, width)
+REGISTER_COLUMNS = [
+    ('number', _('Number'), 45 * mm),
+    ('snd_rec_date', _('Date'), 35 * mm),
+    ('move', _('Move'), 15 * mm),
+    ('channel_id', _('Channel'), 30 * mm),
+    ('sender_partner_id', _('Sender'), 50 * mm),
+    ('recipient_partner_id', _('Recipient'), 50 * mm),
+    ('track_ref', _('Tracking'), 40 * mm),
+    ('state', _('State'), 20 * mm),
+]
+# Number of pages rendered in each temporary PDF part
+PART_PAGES = 100
+
+
+class res_letter_report(orm.AbstractModel):
+    """Incremental PDF rendering of letter labels and registers
+
+    Letters are read in chunks and drawn with reportlab into parts of at
+    most PART_PAGES pages, each saved to its own temporary file, instead of
+    building the whole document in memory. The parts are then concatenated
+    on disk by poppler's pdfunite, so tens of thousands of letters can be
+    printed with a bounded memory. Without pdfunite, the parts are merged
+    with pyPdf, whose memory use grows with the document."""
+    _name = 'res.letter.report'
+    _description = 'Letter Labels and Register'
+
+    def _iter_chunks(self, cr, uid, domain, fields_to_read, chunk_size=500,
+                     context=None):
+        """Yield lists of chunk_size letters matching domain, by id"""
+        letter_pool = self.pool.get('res.letter')
+        last_id = 0
+        while True:
+            letter_ids = letter_pool.search(
+                cr, uid, domain + [('id', '>', last_id)], limit=chunk_size,
+                order='id', context=context)
+            if not letter_ids:
+                return
+            yield letter_pool.read(
+                cr, uid, letter_ids, fields_to_read, context=context)
+            last_id = letter_ids[-1]
+            letter_pool.invalidate_cache(cr, uid, context=context)
+
+    def _concatenate(self, paths, output):
+        """Write the concatenation of the PDF files of paths to output"""
+        if len(paths) == 1:
+            with open(paths[0], 'rb') as part:
+                shutil.copyfileobj(part, output)
+            return
+        pdfunite = find_in_path('pdfunite')
+        if pdfunite:
+            merged = os.path.join(os.path.dirname(paths[0]), 'merged.pdf')
+            subprocess.check_call([pdfunite] + paths + [merged])
+            with open(merged, 'rb') as part:
+                shutil.copyfileobj(part, output)
+            return
+        writer = PdfFileWriter()
+        parts = [open(path, 'rb') for path in paths]
+        try:
+            for part in parts:
+                reader = PdfFileReader(part)
+                for index in range(reader.getNumPages()):
+                    writer.addPage(reader.getPage(index))
+            writer.write(output)
+        finally:
+            for part in parts:
+                part.close()
+
+    def _render_parts(self, output, page_size, chunks, render_chunk):
+        """Render each chunk with render_chunk(pdf, chunk, last) into its
+        own temporary PDF file, then concatenate them into output
+
+        :param chunks: iterable of chunks, at least one
+        """
+        directory = tempfile.mkdtemp(prefix='lettermgmt-report-')
+        try:
+            paths = []
+            chunks = iter(chunks)
+            chunk = next(chunks)
+            while True:
+                # look one chunk ahead to tell the last one
+                following = next(chunks, None)
+                path = os.path.join(directory, '%06d.pdf' % len(paths))
+                pdf = canvas.Canvas(
+                    path, pagesize=page_size, pageCompression=1)
+                render_chunk(pdf, chunk, following is None)
+                pdf.save()
+                paths.append(path)
+                if following is None:
+                    break
+                chunk = following
+            self._concatenate(paths, output)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _format_value(self, cr, uid, letter, field, selections,
+                      context=None):
+        value = letter[field]
+        if isinstance(value, (list, tuple)):
+            value = value[1]
+        elif field in selections:
+            value = selections[field].get(value, value)
+        elif value and self.pool.get('res.letter')._columns[
+                field]._type == 'datetime':
+            value = fields.datetime.context_timestamp(
+                cr, uid, datetime.strptime(
+                    value, DEFAULT_SERVER_DATETIME_FORMAT),
+                context=context).strftime('%Y-%m-%d %H:%M')
+        return value and u'%s' % value or u''
+
+    def get_register_domain(self, cr, uid, date_from, date_to, move=None,
+                            channel_id=None, context=None):
+        domain = [('snd_rec_date', '>=', date_from),
+                  ('snd_rec_date', '<=', date_to)]
+        if move:
+            domain.append(('move', '=', move))
+        if channel_id:
+            domain.append(('channel_id', '=', channel_id))
+        return domain
+
+    def render_register(self, cr, uid, output, domain, title=None,
+                        context=None):
+        """Write the register of the letters matching domain as PDF
+
+        Dates are printed in the timezone of the user.
+
+        :param output: file object the PDF is written to
+        """
+        letter_pool = self.pool.get('res.letter')
+        selections = dict(
+            (field, dict(letter_pool.fields_get(
+                cr, uid, [field], context=context)[field]['selection']))
+            for field in ('move', 'state'))
+        page_size = landscape(A4)
+        width, height = page_size
+        margin = 10 * mm
+        line_height = 5 * mm
+        first_line = height - margin - 3 * line_height
+        lines_per_page = int(round((first_line - margin) / line_height)) + 1
+        page = [0]
+        count = [0]
+
+        def header(pdf):
+            page[0] += 1
+            pdf.setFont('Helvetica-Bold', 11)
+            pdf.drawString(
+                margin, height - margin, title or _('Letter Register'))
+            pdf.drawRightString(
+                width - margin, height - margin, _('Page %d') % page[0])
+            pdf.setFont('Helvetica-Bold', 8)
+            x = margin
+            for field, column_title, column_width in REGISTER_COLUMNS:
+                pdf.drawString(x, height - margin - 2 * line_height,
+                               _(column_title))
+                x += column_width
+            pdf.setFont('Helvetica', 8)
+            return first_line
+
+        def render_chunk(pdf, letters, last):
+            y = header(pdf)
+            lines = 0
+            for letter in letters:
+                if lines == lines_per_page:
+                    pdf.showPage()
+                    y = header(pdf)
+                    lines = 0
+                x = margin
+                for field, column_title, column_width in REGISTER_COLUMNS:
+                    pdf.drawString(x, y, self._format_value(
+                        cr, uid, letter, field, selections,
+                        context=context)[:int(column_width / (1.6 * mm))])
+                    x += column_width
+                y -= line_height
+                lines += 1
+                count[0] += 1
+            if last:
+                if lines >= lines_per_page - 1:
+                    pdf.showPage()
+                    y = header(pdf)
+                pdf.setFont('Helvetica-Bold', 8)
+                pdf.drawString(
+                    margin, y - line_height, _('%d letters') % count[0])
+            pdf.showPage()
+
+        # parts hold whole pages, so that pages are not cut between parts
+        chunks = self._iter_chunks(
+            cr, uid, domain,
+            [field for field, column_title, column_width
+             in REGISTER_COLUMNS],
+            chunk_size=lines_per_page * PART_PAGES, context=context)
+        self._render_parts(
+            output, page_size, _with_default(chunks, []), render_chunk)
+        return count[0]
+
+    def render_labels(self, cr, uid, output, letter_ids, context=None):
+        """Write one shipping label per letter as PDF
+
+        :param output: file object the PDF is written to
+        """
+        width, height = LABEL_SIZE
+        margin = 5 * mm
+        partner_pool = self.pool.get('res.partner')
+        count = [0]
+
+        def render_chunk(pdf, letters, last):
+            partners = dict(
+                (partner.id, partner) for partner in partner_pool.browse(
+                    cr, uid, list(set(
+                        letter['recipient_partner_id'][0]
+                        for letter in letters
+                        if letter['recipient_partner_id'])),
+                    context=context))
+            for letter in letters:
+                pdf.setFont('Helvetica-Bold', 12)
+                pdf.drawString(margin, height - margin - 4 * mm,
+                               letter['number'] or '')
+                pdf.setFont('Helvetica', 10)
+                y = height - margin - 12 * mm
+                lines = []
+                if letter['recipient_partner_id']:
+                    partner = partners[letter['recipient_partner_id'][0]]
+                    lines = [partner.name] + partner_pool._display_address(
+                        cr, uid, partner, context=context).split('\n')
+                for line in lines:
+                    if line and line.strip():
+                        pdf.drawString(margin, y, line.strip())
+                        y -= 4.5 * mm
+                pdf.setFont('Helvetica', 8)
+                pdf.drawString(margin, margin, letter['track_ref'] or '')
+                if letter['weight']:
+                    pdf.drawRightString(
+                        width - margin, margin, '%.3f kg' % letter['weight'])
+                pdf.showPage()
+                count[0] += 1
+
+        chunks = self._iter_chunks(
+            cr, uid, [('id', 'in', list(letter_ids))],
+            ['number', 'recipient_partner_id', 'track_ref', 'weight'],
+            chunk_size=PART_PAGES, context=context)
+        self._render_parts(
+            output, LABEL_SIZE, _with_default(chunks, []), render_chunk)
+        return count[0]
+
+
+def _with_default(iterable, default):
+    """Yield the items of iterable, or default alone if it is empty"""
+    empty = True
+    for item in iterable:
+        empty = False
+        yield item
+    if empty:
+        yield default
@@ -0,0 +1,15 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from . import (
+    test_letter_archive,
+    test_letter_folder_counter,
+    test_letter_intake,
+    test_letter_reference_index,
+    test_letter_register,
+    test_letter_routing,
+    test_letter_sla,
+    test_letter_tracking,
+)
@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from openerp.exceptions import AccessError
+import openerp.tests.common as common
+
+
+class TestLetterArchive(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterArchive, self).setUp()
+        self.letter_model = self.env['res.letter']
+        self.archive_model = self.env['res.letter.archive']
+        self.old_letter = self._create_letter(
+            'Archived quarterly statement', 'ARC-OLD', '2001-01-01 10:00:00')
+        self.new_letter = self._create_letter(
+            'Current quarterly statement', 'ARC-NEW', '2030-01-01 10:00:00')
+        self.old_id = self.old_letter.id
+        self.new_id = self.new_letter.id
+        self.registry('res.letter.archive').archive_letters(
+            self.cr, self.uid, cutoff='2002-01-01 00:00:00')
+        self.env.invalidate_all()
+
+    def _create_letter(self, name, track_ref, snd_rec_date):
+        letter = self.letter_model.create({
+            'name': name,
+            'track_ref': track_ref,
+        })
+        letter.write({'state': 'sent', 'snd_rec_date': snd_rec_date})
+        return letter
+
+    def test_move(self):
+        self.assertFalse(self.letter_model.search([('id', '=', self.old_id)]))
+        self.assertEqual(
+            self.archive_model.search([('track_ref', '=', 'ARC-OLD')]).ids,
+            [self.old_id])
+        self.assertTrue(self.letter_model.search([('id', '=', self.new_id)]))
+
+    def test_search_include_archive(self):
+        domain = [('name', 'like', 'quarterly statement')]
+        self.assertEqual(self.letter_model.search(domain).ids, [self.new_id])
+        letters = self.letter_model.with_context(include_archive=True)
+        self.assertEqual(
+            letters.search(domain).ids, [self.new_id, self.old_id])
+        self.assertEqual(letters.search_count(domain), 2)
+        self.assertEqual(
+            letters.search(domain, offset=1, limit=1).ids, [self.old_id])
+        self.assertEqual(
+            letters.search(domain, offset=2, limit=1).ids, [])
+
+    def test_read_include_archive(self):
+        letter_pool = self.registry('res.letter')
+        records = letter_pool.read(
+            self.cr, self.uid, [self.old_id, self.new_id],
+            ['track_ref', 'state'], context={'include_archive': True})
+        self.assertEqual(
+            [record['track_ref'] for record in records],
+            ['ARC-OLD', 'ARC-NEW'])
+
+    def test_scan_include_archive(self):
+        letter_pool = self.registry('res.letter')
+        self.assertEqual(
+            letter_pool.scan(self.cr, self.uid, ['ARC-OLD']),
+            {'ARC-OLD': False})
+        self.assertEqual(
+            letter_pool.scan(self.cr, self.uid, ['ARC-OLD', 'ARC-NEW'],
+                             context={'include_archive': True}),
+            {'ARC-OLD': self.old_id, 'ARC-NEW': self.new_id})
+
+    def test_fulltext_include_archive(self):
+        self.assertEqual(
+            self.archive_model.search(
+                [('search_text', 'ilike', 'archived')]).ids,
+            [self.old_id])
+        letter_pool = self.registry('res.letter')
+        matches = letter_pool.search_fulltext(
+            self.cr, self.uid, 'quarterly statement',
+            context={'include_archive': True})
+        self.assertEqual(
+            sorted(letter_id for letter_id, rank in matches),
+            sorted([self.old_id, self.new_id]))
+
+    def test_archive_letters_access(self):
+        user = self.env['res.users'].create({
+            'name': 'Letter Archive User',
+            'login': 'letter_archive_user',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        with self.assertRaises(AccessError):
+            self.registry('res.letter.archive').archive_letters(
+                self.cr, user.id, cutoff='2100-01-01 00:00:00')
+        self.assertTrue(self.letter_model.search([('id', '=', self.new_id)]))
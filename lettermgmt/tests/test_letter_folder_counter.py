@@ -0,0 +1,64 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+
+
+class TestLetterFolderCounter(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterFolderCounter, self).setUp()
+        self.folder = self.env['letter.folder'].create({
+            'name': 'Counted folder',
+            'code': 'COUNTED',
+        })
+        self.counter_model = self.env['letter.folder.counter']
+
+    def _counts(self):
+        self.counter_model.invalidate_cache()
+        return dict(
+            ((counter.move, counter.state), counter.letter_count)
+            for counter in self.counter_model.search(
+                [('folder_id', '=', self.folder.id)])
+            if counter.letter_count)
+
+    def _create_letter(self, move='in'):
+        return self.env['res.letter'].with_context(move=move).create({
+            'name': 'Counted letter',
+            'folder_id': self.folder.id,
+        })
+
+    def test_incremental_counts(self):
+        letter = self._create_letter()
+        self._create_letter()
+        self._create_letter(move='out')
+        self.assertEqual(
+            self._counts(), {('in', 'draft'): 2, ('out', 'draft'): 1})
+        letter.write({'state': 'rec'})
+        self.assertEqual(self._counts(), {
+            ('in', 'draft'): 1, ('in', 'rec'): 1, ('out', 'draft'): 1})
+        letter.write({'folder_id': False})
+        self.assertEqual(
+            self._counts(), {('in', 'draft'): 1, ('out', 'draft'): 1})
+        self.folder.invalidate_cache()
+        self.assertEqual(self.folder.letter_count, 2)
+        self.assertEqual(self.folder.letter_in_count, 1)
+        self.assertEqual(self.folder.letter_out_count, 1)
+
+    def test_bulk_create_and_unlink(self):
+        letter_model = self.registry('res.letter')
+        letter_ids = letter_model._bulk_create(self.cr, self.uid, [
+            {'name': 'Bulk %d' % index, 'folder_id': self.folder.id}
+            for index in range(3)])
+        self.assertEqual(self._counts(), {('in', 'draft'): 3})
+        letter_model.unlink(self.cr, self.uid, letter_ids[:2])
+        self.assertEqual(self._counts(), {('in', 'draft'): 1})
+
+    def test_rebuild_matches_increments(self):
+        self._create_letter().write({'state': 'validated'})
+        self._create_letter(move='out')
+        expected = self._counts()
+        self.registry('letter.folder.counter')._rebuild(self.cr)
+        self.assertEqual(self._counts(), expected)
@@ -0,0 +1,56 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from StringIO import StringIO
+
+from openerp.exceptions import AccessError
+import openerp.tests.common as common
+
+
+class TestLetterIntake(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterIntake, self).setUp()
+        self.intake = self.registry('res.letter.intake')
+        self.letter_model = self.env['res.letter']
+
+    def test_import_rows(self):
+        stats = self.intake.import_rows(self.cr, self.uid, [
+            {'name': 'Intake valid', 'state': 'rec'},
+            {'name': 'Intake bad state', 'state': 'foo'},
+            {'name': 'Intake bad move', 'move': 'sideways'},
+        ])
+        self.assertEqual(stats['rows'], 3)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['error_count'], 2)
+        self.assertEqual([line for line, error in stats['errors']], [2, 3])
+        letters = self.letter_model.search([('name', 'like', 'Intake ')])
+        self.assertEqual(letters.mapped('state'), ['rec'])
+
+    def test_import_json_lines(self):
+        data_file = StringIO(
+            '{"name": "Intake JSON 1"}\n'
+            '{"name": "Intake JSON broken\n'
+            '\n'
+            '["Intake JSON list"]\n'
+            '{"name": "Intake JSON 2"}\n')
+        stats = self.intake.import_file(
+            self.cr, self.uid, data_file, file_format='json')
+        self.assertEqual(stats['rows'], 4)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual([line for line, error in stats['errors']], [2, 3])
+        self.assertEqual(
+            len(self.letter_model.search([('name', 'like', 'Intake JSON')])),
+            2)
+
+    def test_import_rows_access(self):
+        outsider = self.env['res.users'].create({
+            'name': 'Letter Intake Outsider',
+            'login': 'letter_intake_outsider',
+            'groups_id': [(6, 0, [])],
+        })
+        with self.assertRaises(AccessError):
+            self.intake.import_rows(
+                self.cr, outsider.id, [{'name': 'Intake portal'}])
@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+
+
+class TestLetterReferenceIndex(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterReferenceIndex, self).setUp()
+        self.index_model = self.env['reference.index']
+
+    def _lookup(self, reference):
+        return [(match['model'], match['id'], match['field'])
+                for match in self.index_model.lookup(reference)
+                if match['reference'] == reference]
+
+    def test_create_write_unlink(self):
+        letter = self.env['res.letter'].create({
+            'name': 'Indexed letter',
+            'track_ref': 'IDX-TRACK-1',
+        })
+        self.assertEqual(
+            self._lookup('IDX-TRACK-1'),
+            [('res.letter', letter.id, 'track_ref')])
+        self.assertIn(
+            ('res.letter', letter.id, 'number'), self._lookup(letter.number))
+        self.assertEqual(
+            [match['id'] for match in self.index_model.lookup('idx-track')
+             if match['model'] == 'res.letter'],
+            [letter.id])
+        letter.write({'track_ref': 'IDX-TRACK-2'})
+        self.assertEqual(self._lookup('IDX-TRACK-1'), [])
+        self.assertEqual(
+            self._lookup('IDX-TRACK-2'),
+            [('res.letter', letter.id, 'track_ref')])
+        letter.unlink()
+        self.assertEqual(self._lookup('IDX-TRACK-2'), [])
+
+    def test_bulk_create(self):
+        letter_ids = self.registry('res.letter')._bulk_create(
+            self.cr, self.uid, [
+                {'name': 'Imported letter %d' % index,
+                 'track_ref': 'IDX-BULK-%d' % index}
+                for index in range(2)])
+        for index, letter_id in enumerate(letter_ids):
+            self.assertEqual(
+                self._lookup('IDX-BULK-%d' % index),
+                [('res.letter', letter_id, 'track_ref')])
+
+    def test_archive_move(self):
+        letter = self.env['res.letter'].create({
+            'name': 'Archived indexed letter',
+            'track_ref': 'IDX-ARCHIVED',
+        })
+        letter.write({'state': 'sent', 'snd_rec_date': '2001-01-01 10:00:00'})
+        letter_id = letter.id
+        self.registry('res.letter.archive').archive_letters(
+            self.cr, self.uid, cutoff='2002-01-01 00:00:00')
+        self.env.invalidate_all()
+        self.assertEqual(
+            self._lookup('IDX-ARCHIVED'),
+            [('res.letter.archive', letter_id, 'track_ref')])
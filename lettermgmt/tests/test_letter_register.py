@@ -0,0 +1,33 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from datetime import datetime
+
+import pytz
+
+import openerp.tests.common as common
+from openerp import fields
+
+
+class TestLetterRegister(common.TransactionCase):
+
+    def _local_bounds(self, tz_name):
+        wizard = self.env['res.letter.register.wizard'].with_context(
+            tz=tz_name)
+        defaults = wizard.default_get(['date_from', 'date_to'])
+        tz = pytz.timezone(tz_name)
+        return [
+            pytz.utc.localize(fields.Datetime.from_string(
+                defaults[name])).astimezone(tz)
+            for name in ('date_from', 'date_to')]
+
+    def test_default_period_in_user_timezone(self):
+        for tz_name in ('Pacific/Auckland', 'America/Los_Angeles'):
+            date_from, date_to = self._local_bounds(tz_name)
+            today = datetime.now(pytz.timezone(tz_name)).date()
+            self.assertEqual(date_from.date(), today)
+            self.assertEqual(date_from.strftime('%H:%M:%S'), '00:00:00')
+            self.assertEqual(date_to.date(), today)
+            self.assertEqual(date_to.strftime('%H:%M:%S'), '23:59:59')
@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from openerp.exceptions import AccessError
+import openerp.tests.common as common
+
+
+class TestLetterRouting(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterRouting, self).setUp()
+        self.rule_pool = self.registry('letter.routing.rule')
+        self.env['letter.routing.rule'].search([]).write({'active': False})
+        self.env['letter.routing.rule'].create({
+            'name': 'Invoices',
+            'keywords': 'invoice',
+            'user_id': self.uid,
+            'comment': 'Routed invoice',
+        })
+        self.letter_model = self.env['res.letter']
+
+    def _reassignments(self, letters):
+        return self.env['letter.reassignment'].search(
+            [('letter_id', 'in', letters.ids)])
+
+    def test_route_incoming_letters(self):
+        incoming = self.letter_model.with_context(move='in').create({
+            'name': 'Incoming invoice',
+        })
+        outgoing = self.letter_model.with_context(move='out').create({
+            'name': 'Outgoing invoice',
+        })
+        other = self.letter_model.with_context(move='in').create({
+            'name': 'Incoming greetings',
+        })
+        letters = incoming + outgoing + other
+        self.assertEqual(
+            self.rule_pool.route_letters(self.cr, self.uid, letters.ids), 1)
+        reassignments = self._reassignments(letters)
+        self.assertEqual(reassignments.mapped('letter_id'), incoming)
+        self.assertEqual(reassignments.comment, 'Routed invoice')
+        self.assertEqual(
+            self.rule_pool.route_letters(self.cr, self.uid, letters.ids), 0)
+        self.assertEqual(
+            self.rule_pool.route_letters(
+                self.cr, self.uid, letters.ids, skip_routed=False), 1)
+
+    def test_route_letters_access(self):
+        user = self.env['res.users'].create({
+            'name': 'Letter Routing User',
+            'login': 'letter_routing_user',
+            'groups_id': [(6, 0, [self.env.ref('base.group_user').id])],
+        })
+        letter = self.letter_model.with_context(move='in').create({
+            'name': 'Incoming invoice',
+        })
+        with self.assertRaises(AccessError):
+            self.rule_pool.route_letters(self.cr, user.id, letter.ids)
+        self.assertFalse(self._reassignments(letter))
@@ -0,0 +1,32 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import openerp.tests.common as common
+
+
+class TestLetterSla(common.TransactionCase):
+
+    def _logged_states(self, letter_ids):
+        return [
+            (log.letter_id.id, log.state)
+            for log in self.env['letter.state.log'].search(
+                [('letter_id', 'in', letter_ids)], order='id')]
+
+    def test_create_and_write_logged(self):
+        letter = self.env['res.letter'].create({'name': 'Logged letter'})
+        letter.write({'state': 'rec'})
+        letter.write({'state': 'rec'})
+        self.assertEqual(
+            self._logged_states([letter.id]),
+            [(letter.id, 'draft'), (letter.id, 'rec')])
+
+    def test_bulk_create_logged(self):
+        letter_ids = self.registry('res.letter')._bulk_create(
+            self.cr, self.uid, [
+                {'name': 'Imported letter', 'state': 'validated'},
+                {'name': 'Imported draft'}])
+        self.assertEqual(
+            self._logged_states(letter_ids),
+            [(letter_ids[0], 'validated'), (letter_ids[1], 'draft')])
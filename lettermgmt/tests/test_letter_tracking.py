@@ -0,0 +1,154 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+import json
+import threading
+import time
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import openerp.tests.common as common
+from openerp.addons.lettermgmt.models import letter_tracking
+
+# Carrier statuses answered by the stand-in carrier
+STATUSES = {
+    'TRK-TRANSIT': 'in_transit',
+    'TRK-DELIVERED': 'delivered',
+    'TRK-RETURNED': 'returned',
+    'TRK-DAMAGED': 'damaged',
+}
+
+# Seconds the stand-in carrier takes to give up on a silent reference
+SILENT_DELAY = 3
+
+
+class CarrierHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        track_ref = query.get('tracking_ref', [''])[0]
+        self.server.requested.append(track_ref)
+        if track_ref == 'TRK-SILENT':
+            # a carrier which does not answer in time
+            time.sleep(SILENT_DELAY)
+            return
+        if track_ref not in STATUSES:
+            self.send_error(404)
+            return
+        body = json.dumps({'status': STATUSES[track_ref]})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLetterTracking(common.TransactionCase):
+
+    def setUp(self):
+        super(TestLetterTracking, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), CarrierHandler)
+        self.server.requested = []
+        self.server_thread = threading.Thread(
+            target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.channel = self.env['letter.channel'].create({
+            'name': 'Stand-in carrier',
+            'tracking_api': 'json',
+            'tracking_url': 'http://127.0.0.1:%d/track' % (
+                self.server.server_address[1]),
+        })
+        self.poller = self.registry('letter.tracking.poller')
+        self.partner = self.env.ref('base.res_partner_2')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(TestLetterTracking, self).tearDown()
+
+    def _create_letter(self, track_ref, state='validated', move='out'):
+        letter = self.env['res.letter'].with_context(move=move).create({
+            'name': 'Letter %s' % track_ref,
+            'recipient_partner_id': self.partner.id,
+            'sender_partner_id': self.partner.id,
+            'channel_id': self.channel.id,
+            'track_ref': track_ref,
+        })
+        letter.write({'state': state})
+        return letter
+
+    def _poll(self, **kwargs):
+        return self.poller.poll(
+            self.cr, self.uid, channel_ids=[self.channel.id], **kwargs)
+
+    def test_poll_maps_states(self):
+        transit = self._create_letter('TRK-TRANSIT')
+        delivered = self._create_letter('TRK-DELIVERED', move='in')
+        returned = self._create_letter('TRK-RETURNED', state='sent')
+        damaged = self._create_letter('TRK-DAMAGED', state='sent')
+        self._poll()
+        self.env.invalidate_all()
+        self.assertEqual(transit.state, 'sent')
+        self.assertEqual(delivered.state, 'rec')
+        self.assertEqual(returned.state, 'rec_ret')
+        self.assertEqual(damaged.state, 'rec_bad')
+
+    def test_poll_skips_final_and_unshipped_letters(self):
+        received = self._create_letter('TRK-RETURNED', state='rec')
+        cancelled = self._create_letter('TRK-DAMAGED', state='cancel')
+        draft = self._create_letter('TRK-DELIVERED', state='draft')
+        self._poll()
+        self.assertEqual(self.server.requested, [])
+        self.env.invalidate_all()
+        self.assertEqual(received.state, 'rec')
+        self.assertEqual(cancelled.state, 'cancel')
+        self.assertEqual(draft.state, 'draft')
+
+    def test_poll_errors_leave_letters_unchanged(self):
+        unknown = self._create_letter('TRK-UNKNOWN')
+        delivered = self._create_letter('TRK-DELIVERED')
+        batch_ids = self._poll()
+        self.env.invalidate_all()
+        self.assertEqual(unknown.state, 'validated')
+        self.assertEqual(delivered.state, 'rec')
+        batch = self.env['letter.tracking.batch'].browse(batch_ids)
+        self.assertEqual(batch.size, 2)
+        self.assertEqual(batch.updated_count, 1)
+        self.assertEqual(batch.error_count, 1)
+
+    def test_poll_records_batch_latency(self):
+        for dummy in range(5):
+            self._create_letter('TRK-DELIVERED')
+        batch_ids = self._poll(batch_size=2, workers=2)
+        batches = self.env['letter.tracking.batch'].browse(batch_ids)
+        self.assertEqual(
+            sorted(batches.mapped('size')), [1, 2, 2])
+        self.assertEqual(sum(batches.mapped('updated_count')), 5)
+        self.assertEqual(len(self.server.requested), 5)
+        for batch in batches:
+            self.assertEqual(batch.channel_id, self.channel)
+            self.assertGreater(batch.latency_avg, 0)
+            self.assertGreaterEqual(batch.latency_max, batch.latency_avg)
+            self.assertGreaterEqual(batch.duration, batch.latency_max)
+
+    def test_poll_default_timeout(self):
+        silent = self._create_letter('TRK-SILENT')
+        self.channel.write({'tracking_timeout': 0})
+        default_timeout = letter_tracking.TRACKING_TIMEOUT
+        letter_tracking.TRACKING_TIMEOUT = 1
+        try:
+            start = time.time()
+            batch_ids = self._poll()
+        finally:
+            letter_tracking.TRACKING_TIMEOUT = default_timeout
+        self.assertLess(time.time() - start, SILENT_DELAY)
+        self.env.invalidate_all()
+        self.assertEqual(silent.state, 'validated')
+        batch = self.env['letter.tracking.batch'].browse(batch_ids)
+        self.assertEqual(batch.error_count, 1)
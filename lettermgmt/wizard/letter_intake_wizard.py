@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import base64
+from io import BytesIO
+
+from openerp.osv import fields, orm
+from openerp.tools.translate import _
+
+
+class res_letter_intake_wizard(orm.TransientModel):
+    """Upload a CSV or JSON file of letters for bulk intake"""
+    _name = 'res.letter.intake.wizard'
+    _description = 'Letter Bulk Intake Wizard'
+    _columns = {
+        'data_file': fields.binary('File', required=True),
+        'file_format': fields.selection(
+            [('csv', 'CSV'), ('json', 'JSON')], 'Format', required=True),
+        'move': fields.selection(
+            [('in', 'IN'), ('out', 'OUT')], 'Move', required=True,
+            help="Move of the rows which do not specify one."),
+        'chunk_size': fields.integer(
+            'Chunk Size', required=True,
+            help="Number of letters inserted per statement."),
+        'route': fields.boolean(
+            'Route', help="Reassign the new letters with the routing rules."),
+        'state': fields.selection(
+            [('draft', 'Draft'), ('done', 'Done')], 'State', readonly=True),
+        'result': fields.text('Result', readonly=True),
+    }
+    _defaults = {
+        'file_format': 'csv',
+        'move': lambda self, cr, uid, context: (
+            context or {}).get('move', 'in'),
+        'chunk_size': 1000,
+        'state': 'draft',
+    }
+
+    def action_import(self, cr, uid, ids, context=None):
+        intake_pool = self.pool.get('res.letter.intake')
+        wizard = self.browse(cr, uid, ids[0], context=context)
+        stats = intake_pool.import_file(
+            cr, uid, BytesIO(base64.b64decode(wizard.data_file)),
+            file_format=wizard.file_format, move=wizard.move,
+            chunk_size=wizard.chunk_size, route=wizard.route,
+            context=context)
+        result = [
+            _('%d rows read, %d letters created, %d routed, %d errors '
+              'in %.1f seconds (%.1f rows/s).') % (
+                stats['rows'], stats['created'], stats['routed'],
+                stats['error_count'], stats['duration'],
+                stats['rows_per_second']),
+        ]
+        result.extend(
+            _('Line %d: %s') % error for error in stats['errors'])
+        self.write(
+            cr, uid, ids,
+            {'data_file': False, 'state': 'done',
+             'result': '\n'.join(result)},
+            context=context)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': ids[0],
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+###############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from datetime import datetime, time
+
+import pytz
+
+from openerp import SUPERUSER_ID
+from openerp.osv import fields, orm
+from openerp.tools import (
+    DEFAULT_SERVER_DATE_FORMAT, DEFAULT_SERVER_DATETIME_FORMAT)
+
+
+class res_letter_register_wizard(orm.TransientModel):
+    """Print the register of letters sent and received over a period"""
+    _name = 'res.letter.register.wizard'
+    _description = 'Letter Register Wizard'
+    _columns = {
+        'date_from': fields.datetime('From', required=True),
+        'date_to': fields.datetime('To', required=True),
+        'move': fields.selection([('in', 'IN'), ('out', 'OUT')], 'Move'),
+        'channel_id': fields.many2one('letter.channel', 'Channel'),
+    }
+
+    def _get_day_bound(self, cr, uid, day_time, context=None):
+        """Return day_time of the user's current day as a UTC datetime
+
+        The day and time are those of the timezone of the user."""
+        if context is None:
+            context = {}
+        today = datetime.strptime(
+            fields.date.context_today(self, cr, uid, context=context),
+            DEFAULT_SERVER_DATE_FORMAT)
+        bound = datetime.combine(today.date(), day_time)
+        tz_name = context.get('tz') or self.pool.get('res.users').read(
+            cr, SUPERUSER_ID, uid, ['tz'], context=context)['tz']
+        if tz_name:
+            try:
+                bound = pytz.timezone(tz_name).localize(
+                    bound, is_dst=False).astimezone(pytz.utc)
+            except pytz.UnknownTimeZoneError:
+                pass
+        return bound.strftime(DEFAULT_SERVER_DATETIME_FORMAT)
+
+    _defaults = {
+        'date_from': lambda self, cr, uid, context: self._get_day_bound(
+            cr, uid, time(0, 0, 0), context=context),
+        'date_to': lambda self, cr, uid, context: self._get_day_bound(
+            cr, uid, time(23, 59, 59), context=context),
+    }
+
+    def action_print(self, cr, uid, ids, context=None):
+        wizard = self.browse(cr, uid, ids[0], context=context)
+        url = '/lettermgmt/register?date_from=%s&date_to=%s' % (
+            wizard.date_from, wizard.date_to)
+        if wizard.move:
+            url += '&move=%s' % wizard.move
+        if wizard.channel_id:
+            url += '&channel_id=%d' % wizard.channel_id.id
+        return {
+            'type': 'ir.actions.act_url',
+            'url': url,
+            'target': 'self',
+        }
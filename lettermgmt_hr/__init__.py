@@ -20,5 +20,9 @@
 #
 ##############################################################################
 
+from . import letter_inbox
+from . import hr
 from . import res_letter
 from . import letter_reassignment
+from . import res_letter_archive
+from . import letter_sla
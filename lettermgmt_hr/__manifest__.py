@@ -36,6 +36,10 @@ Letter Management
 Using this module you can track Internal letters, parcels, registered documents
 or any other paper documents that are important for company to keep track of.
 
+The letters sent to an employee, directly, in copy, by reassignment or through
+a department, are indexed in ``letter.inbox`` so that *My Letters* opens with
+a single query.
+
 Contributors
 ------------
 * Sandy Carter <sandy.carter@savoirfairelinux.com>
@@ -49,6 +53,7 @@ Contributors
         "res_letter_view.xml",
         "letter_reassignment_view.xml",
         "letter_sequence.xml",
+        "security/ir.model.access.csv",
     ],
     'demo': [],
     'test': [],
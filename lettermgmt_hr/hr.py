@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp.osv import orm
+
+
+class hr_employee(orm.Model):
+    _inherit = 'hr.employee'
+
+    def create(self, cr, uid, vals, context=None):
+        employee_id = super(hr_employee, self).create(cr, uid, vals, context=context)
+        inbox_pool = self.pool.get('letter.inbox')
+        inbox_pool.clear_caches()
+        if vals.get('department_id'):
+            inbox_pool._refresh_employees(cr, uid, [employee_id], context=context)
+        return employee_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        if not set(vals) & set(['department_id', 'active']):
+            return super(hr_employee, self).write(cr, uid, ids, vals, context=context)
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        res = super(hr_employee, self).write(cr, uid, ids, vals, context=context)
+        inbox_pool = self.pool.get('letter.inbox')
+        inbox_pool.clear_caches()
+        inbox_pool._refresh_employees(cr, uid, ids, context=context)
+        return res
+
+    def unlink(self, cr, uid, ids, context=None):
+        res = super(hr_employee, self).unlink(cr, uid, ids, context=context)
+        self.pool.get('letter.inbox').clear_caches()
+        return res
+
+
+class hr_department(orm.Model):
+    _inherit = 'hr.department'
+
+    def create(self, cr, uid, vals, context=None):
+        department_id = super(hr_department, self).create(cr, uid, vals, context=context)
+        self.pool.get('letter.inbox').clear_caches()
+        return department_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        if 'parent_id' not in vals:
+            return super(hr_department, self).write(cr, uid, ids, vals, context=context)
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        res = super(hr_department, self).write(cr, uid, ids, vals, context=context)
+        inbox_pool = self.pool.get('letter.inbox')
+        inbox_pool.clear_caches()
+        # only the members of the moved departments see other parents
+        inbox_pool._refresh_employees(
+            cr, uid, inbox_pool._get_department_member_ids(cr, ids), context=context)
+        return res
+
+    def unlink(self, cr, uid, ids, context=None):
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+        inbox_pool = self.pool.get('letter.inbox')
+        employee_ids = inbox_pool._get_department_member_ids(cr, ids)
+        res = super(hr_department, self).unlink(cr, uid, ids, context=context)
+        inbox_pool.clear_caches()
+        inbox_pool._refresh_employees(cr, uid, employee_ids, context=context)
+        return res
@@ -0,0 +1,179 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp import SUPERUSER_ID, tools
+from openerp.osv import fields, orm
+
+# res.letter fields giving employees access to a letter, with their role
+EMPLOYEE_ROLES = [
+    ('recipient_intern_ids', 'recipient'),
+    ('cc_employee_ids', 'cc'),
+    ('reassignment_employee_ids', 'reassignment'),
+]
+# res.letter fields giving the members of departments and of their
+# children access to a letter, with their role
+DEPARTMENT_ROLES = [
+    ('department_id', 'department'),
+    ('cc_department_ids', 'cc_department'),
+    ('reassignment_department_ids', 'reassignment_department'),
+]
+INBOX_FIELDS = [field for field, role in EMPLOYEE_ROLES + DEPARTMENT_ROLES]
+
+
+class letter_inbox(orm.Model):
+    """One row per employee, letter and role the employee has on the letter
+
+    This is maintained by res.letter, hr.employee and hr.department so that
+    the inbox of an employee is read with one indexed query instead of
+    joining all the employee and department relations of letters."""
+    _name = 'letter.inbox'
+    _description = 'Letter Inbox'
+    _log_access = False
+    _columns = {
+        'employee_id': fields.many2one('hr.employee', 'Employee', required=True, ondelete='cascade',
+                                       readonly=True),
+        'letter_id': fields.many2one('res.letter', 'Letter', required=True, ondelete='cascade',
+                                     readonly=True),
+        'role': fields.selection([('recipient', 'Recipient'),
+                                  ('cc', 'Copy'),
+                                  ('reassignment', 'Reassignment'),
+                                  ('department', 'Department'),
+                                  ('cc_department', 'Copy to Department'),
+                                  ('reassignment_department', 'Reassignment to Department')],
+                                 'Role', required=True, readonly=True),
+    }
+    _sql_constraints = [
+        ('employee_letter_role_uniq', 'unique(employee_id, letter_id, role)',
+         'An employee has a role only once on a letter.'),
+    ]
+
+    def _auto_init(self, cr, context=None):
+        res = super(letter_inbox, self)._auto_init(cr, context=context)
+        cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'letter_inbox_employee_letter_index'")
+        if not cr.fetchone():
+            cr.execute('CREATE INDEX letter_inbox_employee_letter_index '
+                       'ON letter_inbox (employee_id, letter_id DESC, role)')
+            cr.execute('CREATE INDEX letter_inbox_letter_index ON letter_inbox (letter_id)')
+        return res
+
+    def init(self, cr):
+        cr.execute('SELECT 1 FROM letter_inbox LIMIT 1')
+        if not cr.fetchone():
+            cr.execute('SELECT id FROM res_letter')
+            self._refresh(cr, SUPERUSER_ID, [row[0] for row in cr.fetchall()])
+
+    @tools.ormcache(skiparg=3)
+    def _get_department_employee_ids(self, cr, uid, department_id):
+        """Return the active employees of a department and of its children
+
+        The expansion is cached per department, hr.employee and
+        hr.department clear the cache when members or hierarchy change."""
+        cr.execute('WITH RECURSIVE tree(id) AS ('
+                   '    SELECT %s UNION '
+                   '    SELECT department.id FROM hr_department department '
+                   '    JOIN tree ON department.parent_id = tree.id) '
+                   'SELECT id FROM tree', (department_id,))
+        department_ids = [row[0] for row in cr.fetchall()]
+        return tuple(self.pool.get('hr.employee').search(
+            cr, SUPERUSER_ID, [('department_id', 'in', department_ids)]))
+
+    def _refresh(self, cr, uid, letter_ids, context=None):
+        """Recompute the inbox rows of letters, 1000 letters at a time"""
+        letter_ids = sorted(letter_ids)
+        for index in range(0, len(letter_ids), 1000):
+            self._refresh_chunk(cr, uid, letter_ids[index:index + 1000], context=context)
+
+    def _refresh_chunk(self, cr, uid, letter_ids, context=None):
+        letter_pool = self.pool.get('res.letter')
+        ids = tuple(letter_ids)
+        cr.execute('DELETE FROM letter_inbox WHERE letter_id IN %s', (ids,))
+        for field, role in EMPLOYEE_ROLES:
+            relation, letter_column, employee_column = letter_pool._columns[field]._sql_names(letter_pool)
+            cr.execute('INSERT INTO letter_inbox (employee_id, letter_id, role) '
+                       'SELECT DISTINCT %s, %s, %%s FROM %s WHERE %s IN %%s' % (
+                           employee_column, letter_column, relation, letter_column),
+                       (role, ids))
+        rows = set()
+        for letter in letter_pool.read(cr, SUPERUSER_ID, list(ids),
+                                       [field for field, role in DEPARTMENT_ROLES], context=context):
+            for field, role in DEPARTMENT_ROLES:
+                department_ids = letter[field] or []
+                if field == 'department_id':
+                    department_ids = department_ids and [department_ids[0]]
+                for department_id in department_ids:
+                    rows.update((employee_id, letter['id'], role)
+                                for employee_id in self._get_department_employee_ids(cr, uid, department_id))
+        rows = list(rows)
+        for index in range(0, len(rows), 1000):
+            chunk = rows[index:index + 1000]
+            cr.execute('INSERT INTO letter_inbox (employee_id, letter_id, role) VALUES %s' % (
+                ', '.join(['(%s, %s, %s)'] * len(chunk))),
+                [value for row in chunk for value in row])
+
+    def _get_department_member_ids(self, cr, department_ids):
+        """Return the employees of departments and of their children,
+        active or not"""
+        if not department_ids:
+            return []
+        cr.execute('WITH RECURSIVE tree(id) AS ('
+                   '    SELECT id FROM hr_department WHERE id IN %s UNION '
+                   '    SELECT department.id FROM hr_department department '
+                   '    JOIN tree ON department.parent_id = tree.id) '
+                   'SELECT employee.id FROM hr_employee employee '
+                   'JOIN tree ON tree.id = employee.department_id', (tuple(department_ids),))
+        return [row[0] for row in cr.fetchall()]
+
+    def _refresh_employees(self, cr, uid, employee_ids, context=None):
+        """Recompute the department inbox rows of employees, after a change
+        of their department, of their activity or of the hierarchy above
+        them
+
+        Only the rows of these employees are rewritten: letters sent to
+        their department or to any of its parents are found from the
+        indexed letter and relation columns by one INSERT ... SELECT."""
+        if not employee_ids:
+            return
+        letter_pool = self.pool.get('res.letter')
+        ids = tuple(employee_ids)
+        roles = tuple(role for field, role in DEPARTMENT_ROLES)
+        cr.execute('DELETE FROM letter_inbox WHERE employee_id IN %s AND role IN %s', (ids, roles))
+        selects = []
+        for field, role in DEPARTMENT_ROLES:
+            column = letter_pool._columns[field]
+            if column._type == 'many2one':
+                selects.append("SELECT ancestor.employee_id, letter.id, '%s' FROM ancestor "
+                               "JOIN res_letter letter ON letter.%s = ancestor.department_id" % (role, field))
+            else:
+                relation, letter_column, department_column = column._sql_names(letter_pool)
+                selects.append("SELECT ancestor.employee_id, rel.%s, '%s' FROM ancestor "
+                               "JOIN %s rel ON rel.%s = ancestor.department_id" % (
+                                   letter_column, role, relation, department_column))
+        # members of a department also receive the letters of its parents
+        cr.execute('WITH RECURSIVE ancestor(employee_id, department_id) AS ('
+                   '    SELECT employee.id, employee.department_id FROM hr_employee employee '
+                   '    JOIN resource_resource resource ON resource.id = employee.resource_id '
+                   '    WHERE employee.id IN %s AND employee.department_id IS NOT NULL '
+                   '    AND resource.active UNION '
+                   '    SELECT ancestor.employee_id, department.parent_id FROM ancestor '
+                   '    JOIN hr_department department ON department.id = ancestor.department_id '
+                   '    WHERE department.parent_id IS NOT NULL) '
+                   'INSERT INTO letter_inbox (employee_id, letter_id, role) ' +
+                   ' UNION '.join(selects), (ids,))
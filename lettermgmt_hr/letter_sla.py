@@ -0,0 +1,40 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp.osv import fields, orm
+
+
+class letter_state_log(orm.Model):
+    _inherit = 'letter.state.log'
+    _columns = {
+        'department_id': fields.many2one('hr.department', string='Department', readonly=True),
+    }
+
+
+class letter_sla_stat(orm.Model):
+    _inherit = 'letter.sla.stat'
+    _columns = {
+        'department_id': fields.many2one('hr.department', string='Department', readonly=True, select=True,
+                                         ondelete='cascade'),
+    }
+
+    def _get_sla_dimensions(self):
+        return super(letter_sla_stat, self)._get_sla_dimensions() + [('department_id', 'department_id')]
@@ -20,24 +20,126 @@
 #
 ##############################################################################
 
+from openerp import SUPERUSER_ID
+from openerp.exceptions import AccessError
 from openerp.osv import fields, orm
+from openerp.tools.translate import _
+
+from .letter_inbox import INBOX_FIELDS
 
 
 class res_letter(orm.Model):
     _inherit = 'res.letter'
+
+    def _get_my_inbox(self, cr, uid, ids, field_name, arg, context=None):
+        cr.execute('SELECT DISTINCT inbox.letter_id FROM letter_inbox inbox '
+                   'JOIN hr_employee employee ON employee.id = inbox.employee_id '
+                   'JOIN resource_resource resource ON resource.id = employee.resource_id '
+                   'WHERE resource.user_id = %s AND inbox.letter_id IN %s', (uid, tuple(ids)))
+        inbox_ids = set(row[0] for row in cr.fetchall())
+        return dict((letter_id, letter_id in inbox_ids) for letter_id in ids)
+
+    def _search_my_inbox(self, cr, uid, obj, name, args, context=None):
+        query = ('SELECT inbox.letter_id FROM letter_inbox inbox '
+                 'JOIN hr_employee employee ON employee.id = inbox.employee_id '
+                 'JOIN resource_resource resource ON resource.id = employee.resource_id '
+                 'WHERE resource.user_id = %s')
+        result = []
+        for field_name, operator, value in args:
+            if bool(value) == (operator == '='):
+                result.append(('id', 'inselect', (query, (uid,))))
+            else:
+                result.append(('id', 'not inselect', (query, (uid,))))
+        return result
+
     _columns = {
         'move': fields.selection([('in', 'IN'), ('out', 'OUT'), ('intern', 'INTERN')], 'Move', readonly=True,
                                  help="Incoming, Outgoing or Internal Letter."),
-        'recipient_intern_ids': fields.many2many('hr.employee', string="Send to",
+        'recipient_intern_ids': fields.many2many('hr.employee', 'res_letter_recipient_intern_rel',
+                                                 'letter_id', 'employee_id', string="Send to",
                                                  help="Persons who will receive Letter."),
-        'department_id': fields.many2one('hr.department', string='Department',
+        'department_id': fields.many2one('hr.department', string='Department', select=True,
                                          help='Department who will receive letter.'),
-        'cc_employee_ids': fields.many2many('hr.employee', string='Employee',
+        'cc_employee_ids': fields.many2many('hr.employee', 'res_letter_cc_employee_rel',
+                                            'letter_id', 'employee_id', string='Employee',
                                             help='Send copies to these employees.'),
-        'cc_department_ids': fields.many2many('hr.department', string='Department',
+        'cc_department_ids': fields.many2many('hr.department', 'res_letter_cc_department_rel',
+                                              'letter_id', 'department_id', string='Department',
                                               help='Send copies to these departments.'),
-        'reassignment_employee_ids': fields.many2many('hr.employee', string='Reassignment',
+        'reassignment_employee_ids': fields.many2many('hr.employee', 'res_letter_reassignment_employee_rel',
+                                                      'letter_id', 'employee_id', string='Reassignment',
                                                       help='Reassign letter to these employees.'),
-        'reassignment_department_ids': fields.many2many('hr.department', string='Department',
+        'reassignment_department_ids': fields.many2many('hr.department',
+                                                        'res_letter_reassignment_department_rel',
+                                                        'letter_id', 'department_id', string='Department',
                                                         help='Reassign copies to these departments.'),
+        'inbox_ids': fields.one2many('letter.inbox', 'letter_id', string='Inbox', readonly=True),
+        'my_inbox': fields.function(_get_my_inbox, fnct_search=_search_my_inbox, type='boolean',
+                                    string='In My Inbox'),
     }
+
+    def _auto_init(self, cr, context=None):
+        # the employee and department fields used to share one relation
+        # table per comodel, so each of them showed the rows of all: copy
+        # those rows to the now distinct relation tables to keep them
+        shared = {}
+        for table, letter_column, column in [('hr_employee_res_letter_rel', 'res_letter_id', 'hr_employee_id'),
+                                             ('hr_department_res_letter_rel', 'res_letter_id', 'hr_department_id')]:
+            cr.execute("SELECT 1 FROM information_schema.tables WHERE table_name = %s", (table,))
+            if cr.fetchone():
+                shared[table] = (letter_column, column)
+        new_tables = []
+        for field in INBOX_FIELDS:
+            column = self._columns[field]
+            if column._type != 'many2many':
+                continue
+            relation = column._sql_names(self)[0]
+            cr.execute("SELECT 1 FROM information_schema.tables WHERE table_name = %s", (relation,))
+            if not cr.fetchone():
+                new_tables.append(field)
+        res = super(res_letter, self)._auto_init(cr, context=context)
+        for field in new_tables:
+            column = self._columns[field]
+            relation, letter_column, other_column = column._sql_names(self)
+            table = 'hr_employee_res_letter_rel' if column._obj == 'hr.employee' else 'hr_department_res_letter_rel'
+            if table in shared:
+                cr.execute('INSERT INTO %s (%s, %s) SELECT %s, %s FROM %s' % (
+                    relation, letter_column, other_column, shared[table][0], shared[table][1], table))
+        return res
+
+    def create(self, cr, uid, vals, context=None):
+        letter_id = super(res_letter, self).create(cr, uid, vals, context=context)
+        if set(vals) & set(INBOX_FIELDS):
+            self.pool.get('letter.inbox')._refresh(cr, uid, [letter_id], context=context)
+        return letter_id
+
+    def write(self, cr, uid, ids, vals, context=None):
+        res = super(res_letter, self).write(cr, uid, ids, vals, context=context)
+        if set(vals) & set(INBOX_FIELDS):
+            if not isinstance(ids, (list, tuple)):
+                ids = [ids]
+            self.pool.get('letter.inbox')._refresh(cr, uid, ids, context=context)
+        return res
+
+    def get_inbox_letter_ids(self, cr, uid, employee_id, roles=None, offset=0, limit=80, context=None):
+        """Return the letters of an employee's inbox, newest first, with
+        one query on the inbox index
+
+        The record rules of letters apply.
+
+        :param employee_id: an employee of the current user
+        :param roles: optional list of letter.inbox roles to restrict to
+        :raise AccessError: if the employee is not one of the current user
+        """
+        cr.execute('SELECT 1 FROM hr_employee employee '
+                   'JOIN resource_resource resource ON resource.id = employee.resource_id '
+                   'WHERE employee.id = %s AND resource.user_id = %s', (employee_id, uid))
+        if uid != SUPERUSER_ID and not cr.fetchone():
+            raise AccessError(_('You can only read the inbox of your own employees.'))
+        query = 'SELECT letter_id FROM letter_inbox WHERE employee_id = %s'
+        params = [employee_id]
+        if roles:
+            query += ' AND role IN %s'
+            params.append(tuple(roles))
+        return self.search(cr, uid, [('id', 'inselect', (query, params))], offset=offset, limit=limit,
+                           order='id desc', context=context)
@@ -0,0 +1,43 @@
+# -*- encoding: utf-8 -*-
+##############################################################################
+#
+#    OpenERP, Open Source Management Solution
+#    This module copyright (C) 2016 Odoo Community Association (OCA)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+##############################################################################
+
+from openerp.osv import fields, orm
+
+
+class res_letter_archive(orm.Model):
+    _inherit = 'res.letter.archive'
+    _columns = {
+        'move': fields.selection([('in', 'IN'), ('out', 'OUT'), ('intern', 'INTERN')], 'Move', readonly=True),
+        'recipient_intern_ids': fields.many2many('hr.employee', 'res_letter_archive_recipient_intern_rel',
+                                                 'letter_id', 'employee_id', string="Send to", readonly=True),
+        'department_id': fields.many2one('hr.department', string='Department', readonly=True),
+        'cc_employee_ids': fields.many2many('hr.employee', 'res_letter_archive_cc_employee_rel',
+                                            'letter_id', 'employee_id', string='Employee', readonly=True),
+        'cc_department_ids': fields.many2many('hr.department', 'res_letter_archive_cc_department_rel',
+                                              'letter_id', 'department_id', string='Department', readonly=True),
+        'reassignment_employee_ids': fields.many2many('hr.employee', 'res_letter_archive_reassignment_employee_rel',
+                                                      'letter_id', 'employee_id', string='Reassignment',
+                                                      readonly=True),
+        'reassignment_department_ids': fields.many2many('hr.department',
+                                                        'res_letter_archive_reassignment_department_rel',
+                                                        'letter_id', 'department_id', string='Department',
+                                                        readonly=True),
+    }
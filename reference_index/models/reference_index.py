@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+##############################################################################
+# For copyright and license notices, see __manifest__.py file in root directory
+##############################################################################
+
+from openerp import SUPERUSER_ID, api, fields, models
+
+# Default number of matches returned by a lookup
+LOOKUP_LIMIT = 20
+
+
+def _escape_like(value):
+    return (value.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+class ReferenceIndex(models.Model):
+    """One row per (reference, model, record) of the indexed models
+
+    References are matched on their lowercase prefix through an index using
+    text_pattern_ops, which also returns exact matches first, so resolving
+    any reference is one indexed query whatever the number of models."""
+    _name = 'reference.index'
+    _description = 'Business Reference'
+    _rec_name = 'reference'
+    _order = 'reference'
+    _log_access = False
+
+    reference = fields.Char(required=True, readonly=True)
+    res_model = fields.Char(
+        string='Model', required=True, readonly=True, index=True)
+    res_id = fields.Integer(string='Record ID', required=True, readonly=True)
+    field = fields.Char(readonly=True)
+    model_description = fields.Char(
+        string='Document Type', compute='_compute_model_description')
+    quick_search = fields.Char(
+        string='Reference', compute='_compute_quick_search',
+        search='_search_quick_search')
+
+    def init(self, cr):
+        for name, definition in [
+                ('reference_index_prefix_index',
+                 'lower(reference) text_pattern_ops'),
+                ('reference_index_record_index', 'res_model, res_id')]:
+            cr.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s", (name,))
+            if not cr.fetchone():
+                cr.execute('CREATE INDEX %s ON reference_index (%s)' % (
+                    name, definition))
+
+    @api.multi
+    def _compute_model_description(self):
+        for entry in self:
+            if entry.res_model in self.env:
+                entry.model_description = (
+                    self.env[entry.res_model]._description)
+
+    @api.multi
+    def _compute_quick_search(self):
+        for entry in self:
+            entry.quick_search = entry.reference
+
+    def _prefix_clause(self, reference):
+        """Return the WHERE clause and params matching a reference prefix"""
+        return ("lower(reference) LIKE lower(%s) || '%%'",
+                [_escape_like(reference.strip())])
+
+    @api.model
+    def _search_quick_search(self, operator, value):
+        clause, params = self._prefix_clause(value or '')
+        return [('id', 'inselect', (
+            'SELECT id FROM reference_index WHERE %s' % clause, params))]
+
+    @api.model
+    def _index(self, res_model, ids, field_names):
+        """Replace the references of records of res_model by the current
+        values of their field_names"""
+        if not ids:
+            return
+        self._remove(res_model, ids)
+        table = self.env[res_model]._table
+        for field_name in field_names:
+            self.env.cr.execute(
+                'INSERT INTO reference_index '
+                '(reference, res_model, res_id, field) '
+                'SELECT "%s", %%s, id, %%s FROM "%s" '
+                'WHERE id IN %%s AND "%s" IS NOT NULL '
+                "AND \"%s\" NOT IN ('', '/')" % (
+                    field_name, table, field_name, field_name),
+                (res_model, field_name, tuple(ids)))
+
+    @api.model
+    def _remove(self, res_model, ids):
+        if ids:
+            self.env.cr.execute(
+                'DELETE FROM reference_index '
+                'WHERE res_model = %s AND res_id IN %s',
+                (res_model, tuple(ids)))
+
+    @api.model
+    def _rebuild(self, res_model, field_names):
+        """Index again every record of res_model"""
+        self.env.cr.execute(
+            'DELETE FROM reference_index WHERE res_model = %s', (res_model,))
+        table = self.env[res_model]._table
+        for field_name in field_names:
+            self.env.cr.execute(
+                'INSERT INTO reference_index '
+                '(reference, res_model, res_id, field) '
+                'SELECT "%s", %%s, id, %%s FROM "%s" '
+                'WHERE "%s" IS NOT NULL '
+                "AND \"%s\" NOT IN ('', '/')" % (
+                    field_name, table, field_name, field_name),
+                (res_model, field_name))
+
+    @api.model
+    def lookup(self, reference, limit=LOOKUP_LIMIT):
+        """Resolve a reference, or the beginning of one, to records
+
+        Exact matches come first. Records the user cannot read are left
+        out.
+
+        :return: list of dicts with the matching reference, field, model,
+                 id and display name of the records
+        """
+        if not reference or not reference.strip():
+            return []
+        clause, params = self._prefix_clause(reference)
+        self.env.cr.execute(
+            'SELECT reference, field, res_model, res_id '
+            'FROM reference_index WHERE %s '
+            'ORDER BY lower(reference) USING ~<~ LIMIT %%s' % clause,
+            params + [limit])
+        rows = self.env.cr.fetchall()
+        names = {}
+        for res_model in set(row[2] for row in rows):
+            if res_model not in self.env:
+                continue
+            model = self.env[res_model]
+            if not model.check_access_rights('read', raise_exception=False):
+                continue
+            records = model.with_context(active_test=False).search(
+                [('id', 'in', [row[3] for row in rows
+                               if row[2] == res_model])])
+            for record_id, name in records.name_get():
+                names[(res_model, record_id)] = name
+        return [{
+            'reference': match,
+            'field': field,
+            'model': res_model,
+            'id': res_id,
+            'name': names[(res_model, res_id)],
+        } for match, field, res_model, res_id in rows
+            if (res_model, res_id) in names]
+
+    @api.multi
+    def action_open(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self.res_model,
+            'res_id': self.res_id,
+            'view_type': 'form',
+            'view_mode': 'form',
+        }
+
+
+class ReferenceIndexMixin(models.AbstractModel):
+    """Keep the references of a model in the reference index
+
+    Inheriting models list their reference fields in _reference_fields.
+    Code writing these fields with SQL calls _update_reference_index.
+    Existing records are indexed when their model is updated without any
+    reference in the index; modules filling reference fields of existing
+    records on installation call _rebuild_reference_index from their
+    post-init hook instead."""
+    _name = 'reference.index.mixin'
+    _description = 'Indexed Business References'
+    _reference_fields = []
+
+    def _auto_init(self, cr, context=None):
+        res = super(ReferenceIndexMixin, self)._auto_init(cr, context=context)
+        if self._auto and self._reference_fields and \
+                not self._is_module_installing(cr, context=context):
+            cr.execute(
+                'SELECT 1 FROM reference_index WHERE res_model = %s LIMIT 1',
+                (self._name,))
+            if not cr.fetchone():
+                self.pool['reference.index']._rebuild(
+                    cr, SUPERUSER_ID, self._name, self._reference_fields,
+                    context=context)
+        return res
+
+    def _is_module_installing(self, cr, context=None):
+        """Whether _auto_init runs for the installation of a module"""
+        module = (context or {}).get('module')
+        if not module:
+            return False
+        cr.execute(
+            "SELECT 1 FROM ir_module_module "
+            "WHERE name = %s AND state = 'to install'", (module,))
+        return bool(cr.fetchone())
+
+    @api.model
+    def _rebuild_reference_index(self):
+        self.env['reference.index'].sudo()._rebuild(
+            self._name, self._reference_fields)
+
+    @api.multi
+    def _update_reference_index(self):
+        self.env['reference.index'].sudo()._index(
+            self._name, self.ids, self._reference_fields)
+
+    @api.model
+    def create(self, vals):
+        record = super(ReferenceIndexMixin, self).create(vals)
+        record._update_reference_index()
+        return record
+
+    @api.multi
+    def write(self, vals):
+        res = super(ReferenceIndexMixin, self).write(vals)
+        if set(vals) & set(self._reference_fields):
+            self._update_reference_index()
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['reference.index'].sudo()._remove(self._name, self.ids)
+        return super(ReferenceIndexMixin, self).unlink()